@@ -1,21 +1,32 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+import contextlib
+import hashlib
 import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 from bodenauswertung import (
     humusvorrat,
     berechne_kalkbedarf,
-    gesamt_nfk,
     bodentyp_to_bg,
-    build_horizonte_list,
+    build_horizonte_tabelle,
+    gesamt_nfk,
+    Tiefenindex,
     kapillaraufstiegsrate,
-    # Für Rechenweg
-    zone_von_bd,
-    get_org_factor,
-    df_full,
-    _KAP_TABLE,
-    _KAP_DMS
+    lade_referenztabellen,
+    referenz_signatur,
 )
+from dateiauswertung import datei_teile
+from ergebnisexport import exportieren
+from ergebnisspeicher import ERGEBNIS_VERSION, Ergebnisspeicher
+from messung import Messung, messen, stufe
+from wasserhaushalt import bodenwasser_bilanz, wetter_lesen
+
+SPEICHER_PFAD = os.environ.get("BOHRSTOCK_SPEICHER", "ergebnisse.sqlite")
+# Verzeichnis für geparste Eingaben (Arrow, benötigt pyarrow); leer = kein Cache
+CACHE_PFAD = os.environ.get("BOHRSTOCK_CACHE") or None
 
 # — Seite konfigurieren —
 st.set_page_config(
@@ -25,21 +36,277 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# — Referenztabellen einmal je Prozess laden (neu bei geänderten CSVs) —
+@st.cache_resource(show_spinner=False)
+def referenztabellen(signatur):
+    return lade_referenztabellen()
+
+# — Hintergrund-Threads für die Stapelauswertung vieler Dateien, einmal je Prozess —
+@st.cache_resource(show_spinner=False)
+def arbeiter():
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="bohrstock")
+
+# — Ergebnisspeicher (SQLite) einmal je Prozess öffnen —
+@st.cache_resource(show_spinner=False)
+def ergebnisspeicher(pfad):
+    return Ergebnisspeicher(pfad)
+
+# — Auswertung als Stufengraph, jede Stufe zwischengespeichert nach ihren Eingaben —
+#
+#   lesen → Tiefen normalisieren → Horizonte parsen ─┬→ Humusvorrat
+#                                                    ├→ nFK (phyto)
+#                                                    ├→ Kalkbedarf (nutzung, Referenztabellen)
+#                                                    └→ Kapillaraufstieg (phyto)
+#   nFK + Kapillaraufstieg + Wetterreihe → Wasserhaushalt der Saison
+#
+# Eine Parameteränderung rechnet so nur die Stufen neu, die davon abhängen;
+# die Zusammenfassung in auswerten() setzt nur noch die Teilergebnisse zusammen.
+# Metadaten wie Bohrstock-Nr. oder Koordinaten sind keine Eingaben.
+@st.cache_data(max_entries=16, show_spinner=False)
+def datei_lesen(datei_hash, dateiname, _inhalt):
+    with stufe("datei_lesen"):
+        if dateiname.lower().endswith(("xls","xlsx")):
+            return pd.read_excel(io.BytesIO(_inhalt))
+        return pd.read_csv(io.BytesIO(_inhalt), sep=None, engine="python")
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def datei_einlesen(datei_hash, dateiname, _inhalt):
+    df = datei_lesen(datei_hash, dateiname, _inhalt)
+
+    # Tiefenangaben mit “+” normalisieren
+    with stufe("tiefen_normalisieren", horizonte=len(df)):
+        depth_col = [c for c in df.columns if "tiefe" in c.lower()][0]
+        df[depth_col] = (
+            df[depth_col]
+              .astype(str)
+              .str.replace(r"(\d+)\+", r"\1-", regex=True)
+        )
+    return df
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def horizonte_parsen(datei_hash, dateiname, _inhalt):
+    df = datei_einlesen(datei_hash, dateiname, _inhalt)
+    with stufe("horizonte_parsen", horizonte=len(df)):
+        return build_horizonte_tabelle(df)
+
+# — Tiefenindex je Datei: Humusvorrat und nFK für jede Tiefe ohne Neuberechnung —
+@st.cache_resource(max_entries=16, show_spinner=False)
+def tiefenindex(datei_hash, dateiname, _inhalt):
+    return Tiefenindex(horizonte_parsen(datei_hash, dateiname, _inhalt))
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def humus_stufe(datei_hash, dateiname, _inhalt):
+    tabelle = horizonte_parsen(datei_hash, dateiname, _inhalt)
+    with stufe("humus", horizonte=len(tabelle), bohrungen=1):
+        df_humus, total_hum = humusvorrat(tabelle, max_tiefe=100)
+        index = tiefenindex(datei_hash, dateiname, _inhalt)
+        humus_stufen = dict(zip((30, 60, 100), index.humusvorrat([30, 60, 100])[0] * 10))
+    return {"df_humus": df_humus, "total_hum": total_hum, "humus_stufen": humus_stufen}
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def nfk_stufe(datei_hash, dateiname, phyto, _inhalt):
+    tabelle = horizonte_parsen(datei_hash, dateiname, _inhalt)
+    with stufe("nfk", horizonte=len(tabelle), bohrungen=1):
+        nfk = tiefenindex(datei_hash, dateiname, _inhalt).nfk(phyto)[0]
+        # Rechenweg nFK aus dem Rechenkern
+        try:
+            _, df_nfk = gesamt_nfk(tabelle, phyto, rechenweg=True)
+            nfk_fehler = None
+        except KeyError as e:
+            df_nfk, nfk_fehler = None, f"Bodenart {e} nicht in der nFK-Tabelle"
+    return {"nfk": nfk, "df_nfk": df_nfk, "nfk_fehler": nfk_fehler}
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def kalk_stufe(datei_hash, dateiname, nutzung, signatur, _inhalt):
+    tabelle = horizonte_parsen(datei_hash, dateiname, _inhalt)
+
+    # Oberboden
+    ober = tabelle.sortierung()[0]
+    bodentyp    = tabelle.bodenart[ober]
+    bodentyp    = bodentyp.strip() if isinstance(bodentyp, str) else ""
+    bg          = bodentyp_to_bg.get(bodentyp)
+    ph_wert     = tabelle.pH[ober]
+    humus_wert  = tabelle.humus[ober]
+
+    tabellen = referenztabellen(signatur)
+    with stufe("kalk", bohrungen=1):
+        kalk, msg, df_kalk = berechne_kalkbedarf(
+            bg, ph_wert, humus_wert,
+            nutzungsart=nutzung.lower(),
+            df_acker=tabellen.df_acker, df_gruen=tabellen.df_gruen,
+            rechenweg=True,
+        )
+    return {
+        "bodentyp": bodentyp, "ph_wert": ph_wert, "humus_wert": humus_wert,
+        "kalk": kalk, "msg": msg, "df_kalk": df_kalk,
+    }
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def kapillar_stufe(datei_hash, dateiname, phyto, _inhalt):
+    tabelle = horizonte_parsen(datei_hash, dateiname, _inhalt)
+    try:
+        with stufe("kapillar", horizonte=len(tabelle), bohrungen=1):
+            kap, df_kap = kapillaraufstiegsrate(tabelle, phyto, rechenweg=True)
+        kap_fehler = None
+    except Exception as e:
+        kap, df_kap, kap_fehler = None, None, str(e)
+
+    # Aufstieg in 20 Tagen (ohne Gr-Horizont 0 mm), Untergrenze bei Tabellenwert ">x"
+    kap_mindestens = None
+    if df_kap is None:
+        gesamt_20 = None
+    elif len(df_kap):
+        gesamt_20 = df_kap["aufstieg_20d_mm"].iat[0]
+        if df_kap["untergrenze"].iat[0]:
+            kap_mindestens = float(df_kap["kap_rate"].iat[0])
+    else:
+        gesamt_20 = 0.0
+    return {"kap": kap, "kap_fehler": kap_fehler, "df_kap": df_kap, "gesamt_20": gesamt_20,
+            "kap_mindestens": kap_mindestens}
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def wasserhaushalt_stufe(datei_hash, dateiname, phyto, wetter_hash, _inhalt, _wetter):
+    nfk = nfk_stufe(datei_hash, dateiname, phyto, _inhalt)["nfk"]
+    kapillar = kapillar_stufe(datei_hash, dateiname, phyto, _inhalt)
+    kap, kap_mindestens = kapillar["kap"], kapillar["kap_mindestens"]
+    wetter = wetter_lesen(io.BytesIO(_wetter))
+    with stufe("wasserhaushalt", bohrungen=1):
+        bilanz = bodenwasser_bilanz(
+            [nfk], [np.nan if kap is None else kap],
+            wetter["Niederschlag"], wetter["ET"], verlauf=True,
+            kap_mindestens=[np.nan if kap_mindestens is None else kap_mindestens],
+        )
+    verlauf = wetter.assign(Bodenwasser=bilanz.pop("speicher")[0])
+    if "Datum" in verlauf:
+        verlauf = verlauf.set_index("Datum")
+    return {name: float(werte[0]) for name, werte in bilanz.items()} | {"verlauf": verlauf}
+
+def auswerten(datei_hash, dateiname, nutzung, phyto, signatur, _inhalt):
+    return {
+        "horizonte": horizonte_parsen(datei_hash, dateiname, _inhalt),
+        **humus_stufe(datei_hash, dateiname, _inhalt),
+        **nfk_stufe(datei_hash, dateiname, phyto, _inhalt),
+        **kalk_stufe(datei_hash, dateiname, nutzung, signatur, _inhalt),
+        **kapillar_stufe(datei_hash, dateiname, phyto, _inhalt),
+    }
+
 # — Sidebar für Inputs —
 with st.sidebar:
     st.header("Einstellungen")
     bohrnr    = st.text_input("Bohrstock-Nr.")
     rechts    = st.text_input("Rechtswert")
     hoch      = st.text_input("Hochwert")
-    uploaded  = st.file_uploader("Excel/CSV hochladen", type=["xlsx","csv"])
+    dateien   = st.file_uploader("Excel/CSV hochladen (mehrere möglich)", type=["xlsx","csv"],
+                                 accept_multiple_files=True) or []
+    uploaded  = dateien[0] if dateien else None
+    if len(dateien) > 1:
+        uploaded = st.selectbox("Detailansicht", dateien, format_func=lambda d: d.name)
     nutzung   = st.selectbox("Nutzungsart", ["Acker","Gruenland"])
     phyto     = st.number_input("Physio. Gründigkeit (cm)", min_value=10, max_value=500, value=100)
     bodenform = st.text_input("Bodenform")
+    wetter    = st.file_uploader("Wetterreihe für Wasserhaushalt (CSV: Datum, Niederschlag, ET)", type=["csv"])
     st.markdown("---")
     run       = st.button("Auswerten")
+    st.markdown("---")
+    suche     = st.text_input("Gespeicherte Ergebnisse (Bohrstock-Nr., * erlaubt)")
+    st.markdown("---")
+    diagnose  = st.checkbox("Diagnose (Laufzeit je Stufe)")
+    profil    = st.checkbox("mit cProfile", disabled=not diagnose)
 
 st.title("🌿 Bohrstock-Auswertung")
 
+# 0) Frühere Ergebnisse aus dem Speicher, ohne erneutes Hochladen
+if suche:
+    speicher = ergebnisspeicher(SPEICHER_PFAD)
+    gefunden = speicher.suchen(suche.strip(), grenze=500)
+    st.subheader("🗄️ Gespeicherte Ergebnisse")
+    if gefunden.empty:
+        st.info(f"Keine gespeicherten Ergebnisse für „{suche}“.")
+    else:
+        st.dataframe(gefunden.drop(columns="Schlüssel"), use_container_width=True)
+        zeile = st.selectbox(
+            "Horizonte anzeigen", gefunden.index,
+            format_func=lambda i: f"{gefunden.at[i, 'Bohrung']} – {gefunden.at[i, 'Datei']} ({gefunden.at[i, 'Gespeichert']:%d.%m.%Y %H:%M})",
+        )
+        st.dataframe(speicher.horizonte(gefunden.at[zeile, "Schlüssel"]), use_container_width=True)
+    st.markdown("---")
+
+# Stapelauswertung: bei mehreren Dateien startet "Auswerten" alle Dateien im
+# Hintergrund; die Anzeige aktualisiert sich, bis der letzte Auftrag fertig ist
+if run and len(dateien) > 1:
+    stapel_schluessel = (
+        tuple(hashlib.sha256(d.getvalue()).hexdigest() for d in dateien),
+        nutzung, phyto, bodenform, wetter.file_id if wetter is not None else None,
+    )
+    alt = st.session_state.get("stapel")
+    if alt is None or alt["schluessel"] != stapel_schluessel:
+        if alt is not None:
+            for _, auftrag in alt["auftraege"]:
+                auftrag.cancel()
+        try:
+            wetter_df = wetter_lesen(io.BytesIO(wetter.getvalue())) if wetter is not None else None
+        except Exception:
+            wetter_df = None
+        st.session_state["stapel"] = {
+            "schluessel": stapel_schluessel,
+            "auftraege": [
+                (d.name, arbeiter().submit(
+                    datei_teile, d.name, nutzungsart=nutzung.lower(), phyto_tiefe=phyto,
+                    bodenform=bodenform, speicher=SPEICHER_PFAD, wetter=wetter_df,
+                    inhalt=d.getvalue(), cache=CACHE_PFAD,
+                ))
+                for d in dateien
+            ],
+        }
+
+stapel = st.session_state.get("stapel")
+
+@st.fragment(run_every=1.0 if stapel and not all(a.done() for _, a in stapel["auftraege"]) else None)
+def stapel_anzeigen():
+    stapel = st.session_state["stapel"]
+    auftraege = stapel["auftraege"]
+    fertig = [auftrag.result() for _, auftrag in auftraege if auftrag.done() and not auftrag.cancelled()]
+    st.subheader("📦 Stapelauswertung")
+    st.progress(len(fertig) / len(auftraege), text=f"{len(fertig)} von {len(auftraege)} Dateien ausgewertet")
+    if fertig:
+        ergebnisse = pd.concat([teil["ergebnisse"] for teil in fertig], ignore_index=True)
+        fehler = ergebnisse["Fehler"].notna()
+        st.dataframe(ergebnisse[~fehler].drop(columns="Fehler"), use_container_width=True)
+        if fehler.any():
+            st.warning(f"⚠️ {fehler.sum()} Datei(en) mit Fehlern")
+            st.dataframe(ergebnisse.loc[fehler, ["Datei", "Fehler"]], use_container_width=True)
+    if len(fertig) < len(auftraege):
+        return
+    if st.session_state.get("stapel_angezeigt") is not stapel:
+        # Alle fertig: einmal die ganze Seite neu aufbauen, damit die Aktualisierung endet
+        st.session_state["stapel_angezeigt"] = stapel
+        st.rerun()
+    buf = io.BytesIO()
+    exportieren(buf, fertig)
+    st.download_button(
+        "Stapelergebnis als Excel herunterladen",
+        data=buf.getvalue(),
+        file_name="stapel.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+if stapel:
+    stapel_anzeigen()
+    st.markdown("---")
+
+# 2) Auf Datei warten
+if not uploaded:
+    st.info("Bitte lade eine Datei in der Sidebar hoch.")
+    st.stop()
+
+# Inhalts-Hash der Datei; nach "Auswerten" bleibt die Auswertung für diese
+# Datei sichtbar, auch wenn danach nur Metadaten geändert werden
+inhalt     = uploaded.getvalue()
+datei_hash = hashlib.sha256(inhalt).hexdigest()
+if run:
+    st.session_state["ausgewertet"] = datei_hash
+run = st.session_state.get("ausgewertet") == datei_hash
+
 # 1) Meta-Werte anzeigen
 if run:
     st.markdown("**Eingegebene Metadaten**")
@@ -47,40 +314,56 @@ if run:
     st.write(f"- **Rechtswert**: {rechts or '–'}")
     st.write(f"- **Hochwert**: {hoch or '–'}")
 
-# 2) Auf Datei warten
-if not uploaded:
-    st.info("Bitte lade eine Datei in der Sidebar hoch.")
-    st.stop()
-
 # 3) Datei einlesen
 try:
-    if uploaded.name.lower().endswith(("xls","xlsx")):
-        df = pd.read_excel(uploaded)
-    else:
-        df = pd.read_csv(uploaded, sep=None, engine="python")
+    df = datei_einlesen(datei_hash, uploaded.name, inhalt)
 except Exception as e:
     st.error(f"❌ Fehler beim Einlesen der Datei: {e}")
     st.stop()
 
-# 3.1) Tiefenangaben mit “+” normalisieren
-depth_col = [c for c in df.columns if "tiefe" in c.lower()][0]
-df[depth_col] = (
-    df[depth_col]
-      .astype(str)
-      .str.replace(r"(\d+)\+", r"\1-", regex=True)
-)
-
 if run:
-    # 4) Horizonte verarbeiten
     try:
-        horizonte = build_horizonte_list(df)
-    except KeyError as e:
-        st.error(f"❌ Spalte nicht gefunden: {e} → bitte Eingabedatei prüfen.")
-        st.stop()
+        signatur = referenz_signatur()
+        referenztabellen(signatur)
     except Exception as e:
-        st.error(f"❌ Fehler bei Verarbeitung der Horizonte: {e}")
+        st.error(f"❌ Kalkbedarf-Tabellen nicht gefunden: {e}")
         st.stop()
 
+    # Nur mit "Diagnose" messen; zwischengespeicherte Schritte tauchen nicht auf
+    messung = Messung()
+    messen_an = messen(profil, messung) if diagnose else contextlib.nullcontext()
+
+    # 4) Horizonte verarbeiten
+    with messen_an:
+        try:
+            horizonte_parsen(datei_hash, uploaded.name, inhalt)
+        except KeyError as e:
+            st.error(f"❌ Spalte nicht gefunden: {e} → bitte Eingabedatei prüfen.")
+            st.stop()
+        except Exception as e:
+            st.error(f"❌ Fehler bei Verarbeitung der Horizonte: {e}")
+            st.stop()
+
+        erg = auswerten(datei_hash, uploaded.name, nutzung, phyto, signatur, inhalt)
+
+        # Wasserhaushalt der Saison (nur mit Wetterreihe)
+        bilanz, bilanz_fehler = None, None
+        if wetter is not None:
+            wetter_inhalt = wetter.getvalue()
+            try:
+                bilanz = wasserhaushalt_stufe(
+                    datei_hash, uploaded.name, phyto,
+                    hashlib.sha256(wetter_inhalt).hexdigest(), inhalt, wetter_inhalt,
+                )
+            except Exception as e:
+                bilanz_fehler = f"{type(e).__name__}: {e}"
+    horizonte  = erg["horizonte"]
+    bodentyp   = erg["bodentyp"]
+    ph_wert    = erg["ph_wert"]
+    total_hum  = erg["total_hum"]
+    nfk        = erg["nfk"]
+    gesamt_20  = erg["gesamt_20"]
+
     # 5) Tabs aufbauen
     tab1, tab2, tab3, tab4 = st.tabs([
         "Rohdaten","Horizonte","Rechenweg","Ergebnisse"
@@ -94,49 +377,32 @@ if run:
     # Tab 2
     with tab2:
         st.subheader("🔍 Verarbeitete Horizonte")
-        st.dataframe(pd.DataFrame(horizonte), use_container_width=True)
+        st.dataframe(horizonte.to_frame(), use_container_width=True)
 
     # Oberboden
-    ober = min(horizonte, key=lambda h: h["z_top"])
-    bodentyp    = (ober.get("Bodenart") or "").strip()
-    bg          = bodentyp_to_bg.get(bodentyp)
-    ph_wert     = ober.get("pH")
-    humus_wert  = ober.get("humus")
     if pd.isna(ph_wert):
         st.warning("⚠️ pH im Oberboden fehlt → Kalkbedarf übersprungen.")
-    if pd.isna(humus_wert):
+    if pd.isna(erg["humus_wert"]):
         st.warning("⚠️ Humus im Oberboden fehlt → Kalkbedarf übersprungen.")
 
     # Kalkbedarf
-    try:
-        df_acker = pd.read_csv("kalkbedarf_acker.csv")
-        df_gruen = pd.read_csv("kalkbedarf_gruen.csv")
-    except Exception as e:
-        st.error(f"❌ Kalkbedarf-Tabellen nicht gefunden: {e}")
-        st.stop()
-    kalk, msg = berechne_kalkbedarf(
-        bg, ph_wert, humus_wert,
-        nutzungsart=nutzung.lower(),
-        df_acker=df_acker, df_gruen=df_gruen
-    )
+    msg = erg["msg"]
     if msg:
         st.warning(f"⚠️ {msg}")
         kalk_value = "" if "Kein pH-Wert" in msg else "Kein Bedarf"
     else:
-        kalk_value = f"{kalk:.1f}"
+        kalk_value = f"{erg['kalk']:.1f}"
 
     # Kapillar-Aufstiegsrate
-    try:
-        kap = kapillaraufstiegsrate(horizonte, phyto)
-        kap_text = f"{kap:.2f}" if kap is not None else "N/A"
-    except Exception as e:
-        st.warning(f"⚠️ Kapillar-Aufstiegsrate: {e}")
+    if erg["kap_fehler"] is not None:
+        st.warning(f"⚠️ Kapillar-Aufstiegsrate: {erg['kap_fehler']}")
         kap_text = "Fehler"
+    else:
+        kap = erg["kap"]
+        kap_text = f"{kap:.2f}" if kap is not None else "N/A"
 
     # Humusvorrat & nFK
-    df_humus, total_hum = humusvorrat(horizonte, max_tiefe=100)
     hum_text = f"{total_hum*10:.1f}"
-    nfk = gesamt_nfk(horizonte, phyto)
     nfk_text = f"{nfk:.0f}"
 
     # Tab 3: Rechenweg
@@ -145,94 +411,40 @@ if run:
 
         # 1) Humusvorrat
         st.markdown("**Humusvorrat bis 100 cm**")
-        st.dataframe(df_humus[[
+        st.dataframe(erg["df_humus"][[
             "hz","z_top","z_bot","z_bot_filled","eff_z_bot","eff_dicke_cm",
             "bd","humus","humus_g_cm2","humus_kg_m2"
         ]], use_container_width=True)
         st.write(f"→ Summe = **{total_hum*10:.1f} Mg/ha**")
+        st.write(" · ".join(
+            f"bis {t} cm: {wert:.1f} Mg/ha" for t, wert in erg["humus_stufen"].items()
+        ))
 
         # 2) nFK
         st.markdown("**nFK-Berechnung bis physiogr. Tiefe**")
-        rows = []
-        max_z_top = max(h["z_top"] for h in horizonte if h["z_top"] is not None)
-        for h in horizonte:
-            # 1) z_bot_filled bis physiogr extrapolieren, falls letzter Horizont oder NaN
-            if h["z_top"] == max_z_top or pd.isna(h["z_bot"]):
-                z_bot_f = phyto
-            else:
-                z_bot_f = h["z_bot"]
-            eff_bot = min(z_bot_f, phyto)
-            eff_d   = max(eff_bot - h["z_top"], 0)
-
-            zone    = zone_von_bd(h["bd"])
-            bod_key = str(h["Bodenart"]).split("/",1)[0].strip()
-            base_fk = df_full.at[bod_key, f"nutzbareFK_{zone}"]
-            korr    = get_org_factor(bod_key, h["humus"])           # in mm
-            wert    = (base_fk + korr) * (1 - h["skelett"]/100)
-            beitrag = wert * eff_d/100*10
-
-            rows.append({
-                "hz":                  h["hz"],
-                "z_top":               h["z_top"],
-                "eff_dicke_cm":        eff_d,
-                "Zone":                zone,
-                "Basis nFK in Vol%":       base_fk,
-                "Humus-Zuschlag in Vol%": f"{korr:.2f}",
-                "Skelett-Abzug":       f"{h['skelett']}%",
-                "korregierte nFK in Vol%":       f"{wert:.2f}",
-                "nFK [mm]":        f"{beitrag:.1f}"
-            })
-        df_nfk = pd.DataFrame(rows)
-        df_nfk.columns = [
-            "hz",
-            "z_top",
-            "eff_dicke_cm",
-            "Zone",
-            "Basis nFK in Vol%",
-            "Humus-Zuschlag in Vol%",
-            "Skelett-Abzug",
-            "korregierte nFK in Vol%",
-            "nFK [mm]"
-        ]
-        st.dataframe(df_nfk, use_container_width=True)
+        if erg["df_nfk"] is None:
+            st.warning(f"⚠️ nFK: {erg['nfk_fehler']}")
+        else:
+            st.dataframe(erg["df_nfk"], use_container_width=True)
         st.write(f"→ Summe = **{nfk:.0f} mm**")
 
         # 3) Kapillar-Aufstiegsrate
         st.markdown("**Kapillar-Aufstiegsrate**")
-        gr_h = next(
-            (h for h in horizonte if isinstance(h.get("hz"), str) and "gr" in h["hz"].lower()),
-            None
-        )
-        if not gr_h:
+        df_kap = erg["df_kap"]
+        if df_kap is None:
+            st.write(f"→ Fehler: {erg['kap_fehler']}")
+        elif not len(df_kap):
             st.write("→ Kein Gr-Horizont → 0 mm/d")
         else:
-            start_cm = gr_h["z_top"]
-            dist_cm  = start_cm - phyto
-        
-            # wenn Abstand ≤ 0, fix 5 mm/d
-            if dist_cm <= 0:
-                rate = 5.0
-                st.write(f"- Abstand = {dist_cm} cm ≤ 0 → **{rate:.1f} mm/d**")
-            else:
-                dist_dm = dist_cm / 10
-                dm_sel  = min(_KAP_DMS, key=lambda x: abs(x - dist_dm))
-                val     = _KAP_TABLE.loc[
-                    _KAP_TABLE["Bodenart"]
-                        .str.lower()
-                        .str.contains(gr_h["Bodenart"].split()[0].lower(), na=False),
-                    str(dm_sel)
-                ].iat[0]
-                if isinstance(val, str) and val.strip().startswith(">"):
-                    rate = float(val.strip()[1:].replace(",", "."))
-                    st.write(f"- Tabellen-Wert = `{val}` → **> {rate:.1f} mm/d**")
-                else:
-                    rate = float(str(val).replace(",", "."))
-                    st.write(f"- Tabellen-Wert = `{val}` → **{rate:.2f} mm/d**")
-        
-            # aufsummiert für 20 Tage
-            gesamt_20 = rate * 20
+            st.dataframe(df_kap, use_container_width=True)
+            if df_kap["untergrenze"].iat[0]:
+                st.write(f"→ Tabellenwert > {df_kap['kap_rate'].iat[0]:.1f} mm/d (keine verwertbare Rate)")
             st.write(f"→ **In 20 Tagen: {gesamt_20:.1f} mm**")
-            
+
+        # 4) Kalkbedarf
+        st.markdown("**Kalkbedarf**")
+        st.dataframe(erg["df_kalk"], use_container_width=True)
+
     # Tab 4: Ergebnisse
     with tab4:
         st.subheader("✅ Zusammenfassung")
@@ -260,9 +472,65 @@ if run:
         }])
         st.dataframe(result_df, use_container_width=True)
 
+        # Wasserhaushalt der Saison
+        if bilanz_fehler:
+            st.warning(f"⚠️ Wetterreihe: {bilanz_fehler}")
+        elif bilanz is not None:
+            st.markdown("---")
+            st.subheader("💧 Wasserhaushalt der Saison")
+            kennzahlen = {
+                "Defizittage":                  "defizit_tage",
+                "Defizit (mm)":                 "defizit_mm",
+                "Kapillare Nachlieferung (mm)": "kapillar_mm",
+                "Sickerung (mm)":               "sickerung_mm",
+            }
+            for spalte, (titel, name) in zip(st.columns(len(kennzahlen)), kennzahlen.items()):
+                spalte.metric(titel, f"{bilanz[name]:.0f}" if pd.notna(bilanz[name]) else "N/A")
+            st.line_chart(bilanz["verlauf"]["Bodenwasser"])
+
+        # Ergebnis dauerhaft ablegen (gleiche Eingaben ersetzen den Eintrag)
+        schluessel = horizonte.fingerabdruecke(
+            bohrnr or uploaded.name, nutzung.lower(), phyto,
+            referenztabellen(signatur).inhalts_hash, ERGEBNIS_VERSION
+        )[0]
+        if st.session_state.get("gespeichert") != (schluessel, rechts, hoch, bodenform):
+            gespeichert = pd.DataFrame([{
+                "Schlüssel":                       schluessel,
+                "Datei":                           uploaded.name,
+                "Bohrung":                         bohrnr or os.path.splitext(uploaded.name)[0],
+                "Rechtswert":                      pd.to_numeric(rechts.replace(",", "."), errors="coerce"),
+                "Hochwert":                        pd.to_numeric(hoch.replace(",", "."), errors="coerce"),
+                "Bodenform":                       bodenform,
+                "Nutzungsart":                     nutzung.lower(),
+                "Bodentyp":                        bodentyp,
+                "Physiologische Gründigkeit (cm)": phyto,
+                "Humusvorrat bis 1 m (Mg/ha)":     total_hum*10,
+                "pH Oberboden":                    ph_wert,
+                "Kalkbedarf (dt CaO/ha)":          erg["kalk"],
+                "nFK (mm)":                        nfk,
+                "Kapillar-Rate (mm/d)":            erg["kap"],
+                "Kapillar-Rate mindestens (mm/d)": erg["kap_mindestens"],
+                "Meldung":                         msg,
+            }])
+            gespeichert_h = horizonte.to_frame()
+            gespeichert_h.insert(0, "Schlüssel", schluessel)
+            try:
+                ergebnisspeicher(SPEICHER_PFAD).speichern(gespeichert, gespeichert_h)
+                st.session_state["gespeichert"] = (schluessel, rechts, hoch, bodenform)
+            except Exception as e:
+                st.warning(f"⚠️ Ergebnis konnte nicht gespeichert werden: {e}")
+
+        # Ergebnis und Rechenweg als eigene Blätter (openpyxl write-only)
         buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as w:
-            result_df.to_excel(w, index=False)
+        with messen(messung=messung) if diagnose else contextlib.nullcontext():
+            exportieren(buf, [{
+                "ergebnisse": result_df,
+                "humus":      erg["df_humus"],
+                "nfk":        erg["df_nfk"] if erg["df_nfk"] is not None else pd.DataFrame(),
+                "kapillar":   erg["df_kap"] if erg["df_kap"] is not None else pd.DataFrame(),
+                "kalk":       erg["df_kalk"],
+                **({"wasserhaushalt": bilanz["verlauf"].reset_index()} if bilanz is not None else {}),
+            }])
         buf.seek(0)
         st.download_button(
             "Ergebnis als Excel herunterladen",
@@ -270,3 +538,15 @@ if run:
             file_name="ergebnis.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
+
+    # Diagnose: Laufzeiten dieses Durchlaufs je Stufe
+    if diagnose:
+        with st.expander("⏱️ Diagnose", expanded=True):
+            if not len(messung):
+                st.info("Alle Schritte kamen aus dem Zwischenspeicher – nichts gemessen.")
+            else:
+                st.dataframe(messung.als_frame(), use_container_width=True)
+            if messung.profil is not None:
+                st.code(messung.profil_text(), language="text")
+                st.download_button("Profil herunterladen (.prof)", data=messung.profil_daten(),
+                                   file_name="bohrstock.prof", mime="application/octet-stream")
@@ -0,0 +1,264 @@
+"""
+Benchmark der Auswertungsschritte mit synthetischen Bohrstock-Profilen.
+
+Aufruf:
+    python benchmark.py                      # 1, 1k, 100k, 1M Horizonte
+    python benchmark.py --groessen 1000 100000 --ausgabe bench.jsonl
+    python benchmark.py --groessen 1000000 --speicherbericht   # kompakte Typen
+
+Je Schritt und Größe wird eine JSON-Zeile ausgegeben (Laufzeit, Durchsatz in
+Horizonten/s und Spitzenspeicher laut tracemalloc), so dass Ergebnisse
+verschiedener Stände maschinell verglichen werden können.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from bodenauswertung import (
+    humusvorrat,
+    gesamt_nfk,
+    berechne_kalkbedarf,
+    kapillaraufstiegsrate,
+    build_horizonte_list,
+    build_horizonte_frame,
+    build_horizonte_tabelle,
+    auswertung_batch,
+    unsicherheit_batch,
+    kalkbedarf_bulk,
+    rechenweg_batch,
+    bodentyp_to_bg,
+    df_full,
+    lade_referenztabellen,
+    kompakt_frame,
+    speicherbericht,
+)
+from ergebnisexport import exportieren
+from raumindex import idw_raster
+from wasserhaushalt import bodenwasser_bilanz
+
+# Bodenarten, die sowohl in df_full als auch in bodentyp_to_bg vorkommen
+BODENARTEN = [b for b in df_full.index if b in bodentyp_to_bg]
+OBERBODEN_HZ = ["Ap", "Ah", "rAp"]
+UNTERBODEN_HZ = ["Bv", "Bt", "Sw", "Sd", "Go", "Cv", "M"]
+
+
+def _wert_oder_bereich(rng, lo, hi, stellen, anteil_bereich, komma=True):
+    """Zahl als String, manchmal als Bereich "a-b" und mit Dezimalkomma."""
+    a = round(rng.uniform(lo, hi), stellen)
+    if rng.random() < anteil_bereich:
+        b = round(min(a + rng.uniform(0.1, (hi - lo) / 3), hi), stellen)
+        s = f"{a}-{b}"
+    else:
+        s = f"{a}"
+    return s.replace(".", ",") if komma and rng.random() < 0.5 else s
+
+
+def synthetische_profile(anzahl_horizonte, seed=0):
+    """
+    Erzeugt reproduzierbar einen Laborexport mit anzahl_horizonte Zeilen
+    (Spalten wie in den Feldblättern plus "Bohrung"). Enthält unordentliche
+    Tiefen ("70+", "30–60"), Humus-Bereiche ("<1", "2-4"), optionale
+    Gr-Horizonte sowie Dichte- und Skelettangaben als Bereiche.
+    """
+    rng = random.Random(seed)
+    zeilen = []
+    bohrung = 0
+    while len(zeilen) < anzahl_horizonte:
+        n = min(rng.randint(3, 7), anzahl_horizonte - len(zeilen))
+        grenzen = sorted(rng.sample(range(10, 200, 5), n - 1)) if n > 1 else []
+        tops = [0] + grenzen
+        mit_gr = rng.random() < 0.3
+        for i, top in enumerate(tops):
+            letzter = i == n - 1
+            if letzter:
+                tiefe = rng.choice([f"{top}+", f"{top}-", f"{top}-{top + 30}"])
+            else:
+                strich = rng.choice(["-", "-", "–"])
+                tiefe = f"{top}{strich}{tops[i + 1]}"
+
+            if i == 0:
+                hz = rng.choice(OBERBODEN_HZ)
+                humus = rng.choice([_wert_oder_bereich(rng, 1, 6, 1, 0.3), "2-4", "<1"])
+            else:
+                hz = "Gr" if (mit_gr and letzter) else rng.choice(UNTERBODEN_HZ)
+                humus = rng.choice(["<1", "<0,5", "0", _wert_oder_bereich(rng, 0, 2, 1, 0.2)])
+
+            zeilen.append({
+                "Bohrung":                  f"B{bohrung:07d}",
+                "Horizont":                 hz,
+                "Tiefe (cm)":               tiefe,
+                "Trockenrohdichte (g/cm³)": _wert_oder_bereich(rng, 1.1, 1.8, 2, 0.2),
+                "Skelett (%)":              rng.choice(["0", "<5", "5-10", _wert_oder_bereich(rng, 0, 30, 0, 0.1, komma=False)]),
+                "Humus (%)":                humus,
+                "pH":                       _wert_oder_bereich(rng, 3.5, 7.5, 1, 0.05),
+                "Bodenart":                 rng.choice(BODENARTEN),
+            })
+        bohrung += 1
+    return pd.DataFrame(zeilen)
+
+
+def _profile(horizonte_df):
+    """Langes Horizont-DataFrame → Liste von Horizont-Listen je Bohrung."""
+    return [
+        gruppe.drop(columns="bohrung").to_dict("records")
+        for _, gruppe in horizonte_df.groupby("bohrung", sort=False)
+    ]
+
+
+def _einzeln(funktion, profile, budget_s):
+    """Ruft funktion je Profil auf, bis alle Profile oder budget_s erreicht sind."""
+    horizonte = aufrufe = 0
+    start = time.perf_counter()
+    for profil in profile:
+        funktion(profil)
+        horizonte += len(profil)
+        aufrufe += 1
+        if time.perf_counter() - start > budget_s:
+            break
+    return aufrufe, horizonte
+
+
+def _schritte(roh, budget_s, ablage):
+    """
+    Liste (name, modus, funktion) – funktion gibt (aufrufe, horizonte) zurück.
+    ablage: Verzeichnis für geschriebene Dateien.
+    """
+    tabellen = lade_referenztabellen()
+    horizonte_df = build_horizonte_frame(roh, id_spalte="Bohrung")
+    kompakt_df = kompakt_frame(horizonte_df)
+    profile = _profile(horizonte_df)
+    ober = horizonte_df.groupby("bohrung", sort=False).first()
+    mit_bereichen = build_horizonte_tabelle(roh, id_spalte="Bohrung", bereiche=True)
+    bg = ober["Bodenart"].map(bodentyp_to_bg).to_numpy()
+    n = len(roh)
+    # Bohrpunkte zufällig auf einem 50-ha-Schlag, Raster mit 1 m Weite
+    punkte = np.random.default_rng(0).uniform(0, np.sqrt(500_000), (2, len(ober)))
+    bbox = (0.0, 0.0, np.sqrt(500_000), np.sqrt(500_000))
+    # Saison mit 365 Tagen: nFK und Kapillar-Rate je Bohrung, Regen an 45 % der Tage
+    rng = np.random.default_rng(0)
+    nfk_mm = rng.uniform(40, 250, len(ober))
+    kap_rate = np.where(rng.random(len(ober)) < 0.3, rng.uniform(0, 3, len(ober)), np.nan)
+    regen = rng.exponential(4, 365) * (rng.random(365) < 0.45)
+    et = 2.5 + 1.5 * np.sin(np.arange(365) * 2 * np.pi / 365)
+
+    def kalk_einzeln(profil):
+        o = profil[0]
+        return berechne_kalkbedarf(
+            bodentyp_to_bg.get(o["Bodenart"]), o["pH"], o["humus"], "acker",
+            tabellen.df_acker, tabellen.df_gruen
+        )
+
+    return [
+        ("build_horizonte_list", "einzeln", lambda: (1, len(build_horizonte_list(roh)))),
+        ("humusvorrat", "einzeln", lambda: _einzeln(humusvorrat, profile, budget_s)),
+        ("gesamt_nfk", "einzeln", lambda: _einzeln(lambda p: gesamt_nfk(p, 100), profile, budget_s)),
+        ("berechne_kalkbedarf", "einzeln", lambda: _einzeln(kalk_einzeln, profile, budget_s)),
+        ("kapillaraufstiegsrate", "einzeln", lambda: _einzeln(lambda p: kapillaraufstiegsrate(p, 100), profile, budget_s)),
+        ("build_horizonte_frame", "batch", lambda: (1, len(build_horizonte_frame(roh, id_spalte="Bohrung")))),
+        ("build_horizonte_tabelle", "batch", lambda: (1, len(build_horizonte_tabelle(roh, id_spalte="Bohrung")))),
+        ("kalkbedarf_bulk", "batch", lambda: (1, len(kalkbedarf_bulk(
+            bg, ober["pH"].to_numpy(), ober["humus"].to_numpy(), "acker",
+            tabellen.df_acker, tabellen.df_gruen
+        )[0]))),
+        ("auswertung_batch", "batch", lambda: (1, n if len(auswertung_batch(
+            horizonte_df, tabellen.df_acker, tabellen.df_gruen
+        )) else 0)),
+        ("kompakt_frame", "batch", lambda: (1, len(kompakt_frame(horizonte_df)))),
+        ("auswertung_batch_kompakt", "batch", lambda: (1, n if len(auswertung_batch(
+            kompakt_df, tabellen.df_acker, tabellen.df_gruen
+        )) else 0)),
+        ("unsicherheit_batch", "batch", lambda: (1, n if len(unsicherheit_batch(
+            mit_bereichen, tabellen.df_acker, tabellen.df_gruen, stichproben=100, seed=0
+        )) else 0)),
+        ("rechenweg_batch", "batch", lambda: (1, len(rechenweg_batch(horizonte_df)["nfk"]))),
+        ("export_csv", "batch", lambda: (1, n if exportieren(
+            os.path.join(ablage, "rechenweg.csv"), [rechenweg_batch(horizonte_df)]
+        ) else 0)),
+        ("idw_raster", "batch", lambda: (1, n if idw_raster(
+            punkte[0], punkte[1], ober["pH"].to_numpy(), bbox
+        ).size else 0)),
+        ("wasserhaushalt_365d", "batch", lambda: (1, n if len(bodenwasser_bilanz(
+            nfk_mm, kap_rate, regen, et
+        )["defizit_tage"]) else 0)),
+    ]
+
+
+def benchmark(groessen, seed=0, budget_s=5.0, speicher=True):
+    """Führt alle Schritte für alle Größen aus und liefert die Ergebnisse als dicts."""
+    umgebung = {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "seed": seed,
+    }
+    for groesse in groessen:
+        roh = synthetische_profile(groesse, seed=seed)
+        with tempfile.TemporaryDirectory() as ablage:
+            for name, modus, schritt in _schritte(roh, budget_s, ablage):
+                start = time.perf_counter()
+                aufrufe, horizonte = schritt()
+                sekunden = time.perf_counter() - start
+
+                peak = None
+                if speicher:
+                    tracemalloc.start()
+                    schritt()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                yield {
+                    "benchmark": name,
+                    "modus": modus,
+                    "groesse": groesse,
+                    "aufrufe": aufrufe,
+                    "horizonte": horizonte,
+                    "sekunden": round(sekunden, 6),
+                    "horizonte_pro_s": round(horizonte / sekunden, 1) if sekunden > 0 else None,
+                    "peak_bytes": peak,
+                    **umgebung,
+                }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groessen", type=int, nargs="+", default=[1, 1_000, 100_000, 1_000_000],
+                        help="Anzahl Horizonte je Lauf")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=5.0,
+                        help="Zeitbudget (s) für die Schleifen über Einzelprofile")
+    parser.add_argument("--ohne-speicher", action="store_true",
+                        help="keinen zweiten Lauf mit tracemalloc für den Spitzenspeicher")
+    parser.add_argument("--ausgabe", help="JSON-Lines-Datei (Standard: stdout)")
+    parser.add_argument("--speicherbericht", action="store_true",
+                        help="nur den Speicherbedarf der Horizont-Tabelle vor und nach "
+                             "kompakt_frame() je Größe ausgeben")
+    args = parser.parse_args(argv)
+
+    if args.speicherbericht:
+        for groesse in args.groessen:
+            horizonte_df = build_horizonte_frame(synthetische_profile(groesse, seed=args.seed), id_spalte="Bohrung")
+            print(f"{groesse} Horizonte:")
+            print(speicherbericht(horizonte_df, kompakt_frame(horizonte_df)).to_string())
+        return
+
+    out = open(args.ausgabe, "a", encoding="utf-8") if args.ausgabe else sys.stdout
+    try:
+        for zeile in benchmark(args.groessen, args.seed, args.budget, not args.ohne_speicher):
+            out.write(json.dumps(zeile, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Manifest für die Ordnerbeobachtung: welche Eingabedateien mit welchem
+Inhalt (SHA-256) schon ausgewertet sind.
+
+Eine Datei gilt als neu, wenn sie im Manifest fehlt oder sich ihr Inhalt
+geändert hat. Größe und Änderungszeit dienen als schnelle Vorprüfung, so
+dass bei jedem Durchlauf nur neue oder angefasste Dateien gelesen werden.
+Das Manifest ist ein Journal (JSON-Zeilen, je Datei gilt die letzte):
+vor dem Schreiben wird die Datei mit dem Stand der Ausgabe (Größe je
+Ausgabedatei) als "in_arbeit" vermerkt, danach als "fertig" oder
+"fehler". Nach einem Absturz liefert unterbrochene() die Stände, auf die
+die Ausgabe gekürzt wird; die Dateien sind dann "abgebrochen" und werden
+erneut ausgewertet. Dateien mit Fehlern gelten nicht als fertig und
+werden nach einer Änderung oder beim nächsten Start wiederholt.
+
+    manifest = Manifest("ergebnis.csv.manifest.jsonl")
+    for pfad, kennung in manifest.neue(dateien):
+        manifest.beginnen(pfad, kennung, stand)
+        ...                                  # auswerten und Ergebnis schreiben
+        manifest.eintragen(pfad, kennung, zeilen=12)
+"""
+import hashlib
+import json
+import os
+import time
+
+_BLOCK = 1 << 20
+
+
+def inhalts_hash(pfad):
+    """SHA-256 des Dateiinhalts (blockweise gelesen)."""
+    h = hashlib.sha256()
+    with open(pfad, "rb") as f:
+        for block in iter(lambda: f.read(_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    """
+    JSON-Lines-Datei mit {pfad (absolut), hash, groesse, mtime_ns, status,
+    zeit, …} je Zeile. ruhezeit: Dateien, die jünger sind (noch im
+    Kopieren), erst im nächsten Durchlauf berücksichtigen.
+    """
+    __slots__ = ("pfad", "eintraege", "ruhezeit", "zurueckgestellt")
+
+    def __init__(self, pfad, ruhezeit=2.0):
+        self.pfad = pfad
+        self.ruhezeit = ruhezeit
+        self.eintraege = {}
+        # in diesem Lauf mit Fehlern vermerkte Dateien, erst nach einer Änderung wiederholen
+        self.zurueckgestellt = set()
+        zeilen, defekt = 0, False
+        if os.path.exists(pfad):
+            with open(pfad, encoding="utf-8") as f:
+                for zeile in f:
+                    try:
+                        eintrag = json.loads(zeile)
+                    except ValueError:
+                        defekt = True  # beim Absturz halb geschriebene letzte Zeile
+                        continue
+                    self.eintraege[eintrag.pop("pfad")] = eintrag
+                    zeilen += 1
+        # Defekte und überholte Zeilen entfernen
+        if defekt or zeilen > 2 * len(self.eintraege) + 100:
+            self.verdichten()
+
+    def __len__(self):
+        return len(self.eintraege)
+
+    def neue(self, dateien):
+        """Liste (pfad, kennung) der neuen oder geänderten Dateien."""
+        jetzt = time.time()
+        neu = []
+        for pfad in dateien:
+            schluessel = os.path.abspath(pfad)
+            try:
+                st = os.stat(pfad)
+            except OSError:
+                continue
+            if jetzt - st.st_mtime < self.ruhezeit:
+                continue
+            eintrag = self.eintraege.get(schluessel)
+            if eintrag and not self._abgeschlossen(schluessel, eintrag):
+                eintrag = None
+            if eintrag and (eintrag["groesse"], eintrag["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+                continue
+            kennung = {"hash": inhalts_hash(pfad), "groesse": st.st_size, "mtime_ns": st.st_mtime_ns}
+            if eintrag and eintrag["hash"] == kennung["hash"]:
+                # Nur angefasst, Inhalt gleich: Vorprüfung aktualisieren, nicht neu auswerten
+                self.eintragen(pfad, {**eintrag, **kennung})
+                continue
+            neu.append((pfad, kennung))
+        return neu
+
+    def _abgeschlossen(self, schluessel, eintrag):
+        status = eintrag.get("status", "fertig")
+        return status == "fertig" or (status == "fehler" and schluessel in self.zurueckgestellt)
+
+    def unterbrochene(self):
+        """
+        {pfad: Eintrag (Kopie)} der Dateien, deren Auswertung nicht
+        abgeschlossen wurde; "stand" ist der Stand aus beginnen().
+        """
+        return {
+            pfad: dict(eintrag) for pfad, eintrag in self.eintraege.items()
+            if eintrag.get("status") == "in_arbeit"
+        }
+
+    def beginnen(self, pfad, kennung, stand):
+        """
+        Vor dem Schreiben vermerken, dass pfad ausgewertet wird; stand
+        ({Ausgabedatei: Größe in Bytes}) ist der Stand, auf den die Ausgabe
+        nach einem Abbruch zurückgesetzt wird.
+        """
+        self.eintragen(pfad, kennung, status="in_arbeit", stand=stand)
+
+    def eintragen(self, pfad, kennung, **zusatz):
+        """Datei als ausgewertet vermerken (sofort auf die Platte), Standard: status="fertig"."""
+        schluessel = os.path.abspath(pfad)
+        self.eintraege[schluessel] = eintrag = {"status": "fertig", **kennung, **zusatz, "zeit": time.time()}
+        if eintrag["status"] == "fehler":
+            self.zurueckgestellt.add(schluessel)
+        with open(self.pfad, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"pfad": schluessel, **eintrag}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def verdichten(self):
+        """Journal mit nur einer Zeile je Datei neu schreiben (atomar)."""
+        tmp = f"{self.pfad}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for pfad, eintrag in self.eintraege.items():
+                f.write(json.dumps({"pfad": pfad, **eintrag}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.pfad)
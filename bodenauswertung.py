@@ -1,532 +1,1750 @@
-import pandas as pd
-import re
-
-
-# (1) Humusvorrat
-def humusvorrat(horizonte, max_tiefe=100):
-    """
-    Berechnet den Humusvorrat bis max_tiefe (cm).
-    Wenn der unterste Horizont weniger als max_tiefe abdeckt,
-    wird sein unteres Ende künstlich auf max_tiefe gesetzt.
-    """
-    # 1) DataFrame aufbauen und nach z_top sortieren
-    df = pd.DataFrame(horizonte).sort_values("z_top").reset_index(drop=True)
-
-    # 2) z_bot_filled: NaNs auffüllen mit max_tiefe
-    df["z_bot_filled"] = df["z_bot"].fillna(max_tiefe)
-
-    # 3) Wenn der unterste Horizont nicht bis max_tiefe reicht, 
-    #    setze sein z_bot_filled ebenfalls auf max_tiefe
-    if df.loc[df.index[-1], "z_bot_filled"] < max_tiefe:
-        df.loc[df.index[-1], "z_bot_filled"] = max_tiefe
-
-    # 4) eff_z_bot: auf max_tiefe clippen (sicherheitshalber)
-    df["eff_z_bot"] = df["z_bot_filled"].clip(upper=max_tiefe)
-
-    # 5) effektive Dicke
-    df["eff_dicke_cm"] = (df["eff_z_bot"] - df["z_top"]).clip(lower=0)
-
-    # 6) Humusmasse pro cm² (g/cm²)
-    df["humus_g_cm2"] = (df["humus"] / 100) * df["bd"] * df["eff_dicke_cm"]
-
-    # 7) Umrechnung in kg/m²
-    df["humus_kg_m2"] = df["humus_g_cm2"] * 10
-
-    # 8) Summe über alle Horizonte mit eff_dicke_cm > 0
-    total = df.loc[df["eff_dicke_cm"] > 0, "humus_kg_m2"].sum()
-
-    return df, total
-
-
-# (2) Bodenart → Bodenartengruppe
-bodentyp_to_bg = {
-    "S":1, "Su2":1, "Ss":1,
-    "Su3":2,"Su4":2, "Sl2":2,"l'S":2, "Sl3":2, "St2":2,
-    "Sl4":3, "Slu":3, "lS":3, "St3":3, 
-    "sL":4, "uL":4, "Lu":4, "Ls2":4,"Ls3":4,"Ls4":4,"Ts4":4,"UU":4, "Us":4,"Uls":4,"Ut2":4,"Ut3":4,"Ut4":4,
-    "t'L":5, "tL":5, "lT":5, "T":5,"Lt2":5,"Lt3":5,"Lts":5,"Ts3":5,"Ts2":5,"Tl":5,"Tu2":5,"Tu3":5,"Tu4":5,"Tt":5,
-    "Mo":6
-}
-
-def humuskategorie(humus, nutzungsart="acker"):
-    """
-    Gibt die Humuskategorie zurück, abhängig von der Nutzungsart.
-    Für Acker:     <4, 4.1-8.0, 8.1-15.0, 15.1-30.0, >30.0
-    Für Grünland:  ≤15.0, 15.1-30.0, >30.0
-    """
-    if nutzungsart.lower() in ("gruenland", "grünland"):
-        if humus <= 15.0:
-            return "≤15.0"
-        if humus <= 30.0:
-            return "15.1-30.0"
-        return ">30.0"
-    else:
-        # Acker-Einteilung
-        if humus < 4.1:
-            return "<4"
-        if humus <= 8.0:
-            return "4.1-8.0"
-        if humus <= 15.0:
-            return "8.1-15.0"
-        if humus <= 30.0:
-            return "15.1-30.0"
-        return ">30.0"
-
-
-
-def ph_klasse_bestimmen(bg, kat, pH):
-    for lo, hi, cls in ph_klassengrenzen[bg][kat]:
-        if (lo is None or pH >= lo) and (hi is None or pH <= hi):
-            return cls
-    return None
-
-
-def berechne_kalkbedarf(bg, pH, humus, nutzungsart, df_acker, df_gruen):
-    """
-    bg: Bodenartgruppe (1–6)
-    pH: numerischer pH-Wert oder NaN
-    humus: numerischer Humus-Anteil
-    nutzungsart: "acker" oder "gruen"
-    df_acker, df_gruen: die DataFrames aus den CSVs
-    """
-    if pd.isna(pH):
-        return None, "Kein pH-Wert im Oberboden angegeben."
-
-    df = df_acker if nutzungsart == "acker" else df_gruen
-
-    # Humuskategorie jetzt mit Nutzungsart
-    kat = humuskategorie(humus, nutzungsart)
-
-    mask = (
-        (df.bg == bg) &
-        (df.humus_kat == kat) &
-        ((df.pH_lo.isna()) | (df.pH_lo <= pH)) &
-        ((df.pH_hi.isna()) | (pH <= df.pH_hi))
-    )
-    sub = df.loc[mask, "CaO"]
-    if sub.empty:
-        return None, f"Kein Kalkbedarf für bg={bg}, Humus={kat}, pH={pH} gefunden."
-    return float(sub.iloc[0]), None
-
-
-# (6) nFK
-data_full = {
-    "Bodenart": ["Ss", "Sl2", "Sl3", "Sl4", "Slu", "St2", "St3", "Su2", "Su3", "Su4", "Ls2", "Ls3", "Ls4", "Lt2", "Lt3", "Lts", "Lu", "Uu", "Uls", "Us", "Ut2", "Ut3", "Ut4", "Tt", "Tl", "Tu2", "Tu3", "Tu4", "Ts2", "Ts3", "Ts4", "fS", "fSms", "fSgs", "mS", "mSfs", "mSgs", "gS"],
-    "nutzbareFK_pt1+2": [9,20,22,22,23,18,18,20,25,27,21,21,20,18,17,17,21,30,24,28,28,26,23,15,15,16,17,19,16,16,17,10,10,10,9,9,9,8],
-    "nutzbareFK_pt3":   [7,18,18,18,21,16,15,18,21,23,16,16,16,14,12,14,17,26,22,25,26,25,21,13,13,12,13,17,13,13,14,9,9,9,6,6,6,5],
-    "nutzbareFK_pt4+5": [7,17,17,15,19,13,12,17,20,21,14,14,13,11,10,11,15,23,21,22,23,23,19,12,11,10,10,16,12,11,11,8,8,8,5,5,5,4]
-}
-df_full = pd.DataFrame(data_full).set_index("Bodenart")
-
-org_korrektur = {
-    "Sand":  {(1,2):2, (2,4):4, (4,8):5, (8,15):6},
-    "LUT":   {(1,2):1, (2,4):2, (4,8):4, (8,15):8}
-}
-
-def get_org_factor(bodenart, humus):
-    """
-    Gibt den Humuskorrekturfaktor (Multiplikator) zurück.
-    """
-    if humus <= 1:
-        return 1.0
-    key = "Sand" if bodenart.startswith("S") else "LUT"
-    for (low, high), perc in org_korrektur[key].items():
-        if low <= humus < high:
-            return perc
-    return 1.0
-
-def nfk_horizont(bodenart, skelett, humus, zone):
-    """
-    Berechnet die nutzbare Feldkapazität für einen Horizont.
-    """
-    base = df_full.at[bodenart, f"nutzbareFK_{zone}"]
-    # Humuskorrektur
-    base = base + get_org_factor(bodenart, humus)
-    # Abzug Skelettanteil
-    return base * (1 - skelett / 100)
-
-def zone_von_bd(bd):
-    if bd < 1.4:
-        return "pt1+2"
-    elif bd < 1.6:
-        return "pt3"
-    else:
-        return "pt4+5"
-
-def gesamt_nfk(horizonte, phyto_tiefe=100):
-    df = pd.DataFrame(horizonte).sort_values("z_top")
-
-    # Wenn z_bot fehlt, so tun, als ginge der Horizont bis mindestens physiogr
-    df["z_bot_filled"] = df["z_bot"].fillna(phyto_tiefe)
-
-    # Effektiver Untergrund bis physiologischen Grenzwert
-    df["eff_z_bot"]    = df["z_bot_filled"].clip(upper=phyto_tiefe)
-    df["eff_dicke_cm"] = df["eff_z_bot"] - df["z_top"]
-
-    # Nur echte Dicken > 0 behalten (NaN und ≤0 fliegen raus)
-    df = df[df["eff_dicke_cm"] > 0].copy()
-
-    total_mm = 0.0
-    for _, row in df.iterrows():
-        zone = zone_von_bd(row["bd"])
-        wert = nfk_horizont(
-            row["Bodenart"],
-            row.get("skelett", 0),
-            row["humus"],
-            zone
-        )
-        # wert [mm pro 100 cm] → mm für eff_dicke_cm
-        total_mm += wert * row["eff_dicke_cm"] / 100 * 10
-
-    return total_mm
-
-import pandas as pd
-import re
-
-def build_horizonte_list(df):
-    cols = df.columns.tolist()
-    def find_col(*keys):
-        for c in cols:
-            if all(k.lower() in c.lower() for k in keys):
-                return c
-        raise KeyError(f"Keine Spalte mit {keys!r} gefunden.")
-
-    col_tiefe    = find_col("tiefe")
-    col_bd       = find_col("trocken", "dichte")
-    col_skelett  = find_col("skelett")
-    col_humus    = find_col("humus")
-    col_ph       = find_col("ph")
-    col_bodenart = find_col("bodenart")
-    col_horizont = find_col("horizont")
-
-    df = df.copy()
-
-    # — Tiefen splitten (Normalisierung aller Dash‐Varianten) —
-        # — Tiefen normalisieren (Bindestriche, '+' und fehlende Obergrenzen) —
-    depth = (
-        df[col_tiefe]
-          .astype(str)
-          .str.strip()
-          # Unicode‐Striche → normaler Bindestrich
-          .str.replace("–", "-", regex=False)
-          .str.replace("—", "-", regex=False)
-          # "70+" → "70-"
-          .str.replace(r"(\d+)\+", r"\1-", regex=True)
-          # alles, was nach Zahl- endet, auf Zahl-100 setzen
-          .str.replace(r"^(\d+)-\s*$", r"\1-100", regex=True)
-    )
-
-    # jetzt splitten und in numerische Spalten überführen
-    splits = depth.str.split("-", expand=True)
-    df["z_top"] = pd.to_numeric(splits[0], errors="coerce")
-    df["z_bot"] = pd.to_numeric(splits[1], errors="coerce")
-
-
-    # — Parser für Zahlen, Ranges und Prozentangaben —
-    def parse_number_or_range(val):
-        s = str(val).strip()
-        # normalize dashes, comma→dot, strip percent, normalize ≥
-        s = (
-            s.replace("–", "-")
-             .replace("—", "-")
-             .replace(",", ".")
-             .replace("%", "")
-             .replace("≥", ">")
-        )
-    
-        # 1) "<X-Y" → unterer Wert X halbieren
-        if s.startswith("<") and "-" in s:
-            # entferne führendes '<', splitte an '-', nimm unteren Wert
-            lo = s.lstrip("<").split("-", 1)[0]
-            try:
-                return float(lo) / 2
-            except:
-                pass
-    
-        # 2) "<X" → X/2
-        m = re.match(r"<\s*(\d+(\.\d+)?)$", s)
-        if m:
-            return float(m.group(1)) / 2
-    
-        # 3) ">X" → X
-        m2 = re.match(r">\s*(\d+(\.\d+)?)$", s)
-        if m2:
-            return float(m2.group(1))
-    
-        # 4) "X-Y" → Mittelwert
-        if "-" in s:
-            lo, hi = s.split("-", 1)
-            try:
-                return (float(lo) + float(hi)) / 2
-            except:
-                pass
-    
-        # 5) Einzelner Wert
-        try:
-            return float(s)
-        except:
-            return None
-    
-
-    # — Dichte (bd) —
-    df[col_bd] = df[col_bd].apply(parse_number_or_range)
-
-    # — Skelett (%) —> Null ersetzt, falls leer oder unparsebar
-    df[col_skelett] = df[col_skelett].apply(lambda v: parse_number_or_range(v) or 0.0)
-
-    # — pH — mit demselben Parser für Ranges, aber hier einfacher:
-    df[col_ph] = df[col_ph].apply(lambda v: parse_number_or_range(v))
-
-    # — Humus —
-    df["humus_num"] = df[col_humus].apply(parse_number_or_range)
-
-    # — Liste bauen —
-    horizonte = []
-    for _, row in df.iterrows():
-        horizonte.append({
-            "hz":       row[col_horizont],
-            "z_top":    row["z_top"],
-            "z_bot":    row["z_bot"],
-            "bd":       row[col_bd],
-            "humus":    row["humus_num"],
-            "pH":       row[col_ph],
-            "Bodenart": row[col_bodenart],
-            "skelett":  row[col_skelett]
-        })
-    return horizonte
-
-
-
-
-_KAP_TABLE = pd.DataFrame([
-    ["X",           "",   "",    "",   "",   "",    "",    "",    "",    "",    "",    ""],
-    ["Sl2, Sl3, Sl4", ">5", ">5", "3", "1,5","1", "0,4",  "0,2",  "0,1",  "",     "",    ""],
-    ["Su",          ">5", "5",   "3", "2",  "1,2","0,6",  "0,2",  "0,1",  "",     "",    ""],
-    ["Ls2, Ls3, Ls4",">5", ">5", "2,3","1,4","1,1","0,5",  "0,3",  "0,1",  "",     "",    ""],
-    ["Lu",          ">5", ">5", ">5", "5",  "3",  "1,5",  "0,8",  "0,4",  "0,2",  "",    ""],
-    ["Ut2, Ut3, Ut4",">5",">5", ">5", ">5", ">5", "4,5",  "3,5",  "2,3",  "1,5", "1,0","0,6"],
-    ["Lts, Lt2, Lt3","5", "2,8", "1,4","0,9","0,5","0,3",  "0,1",  "",     "",    "",    ""],
-    ["Tu3, Tu4",    ">5","5",   "3,6","2,5","1,7","0,6",  "0,4",  "0,1",  "0,1", "",    ""],
-    ["Tu2, Tl, Tt", "5", "3",   "1,3","0,5","0,3","0,2",  "0,1",  "",     "",    "",    ""],
-], columns=["Bodenart","2","3","4","5","6","8","10","12","14","17","20"])
-
-# — Spaltenbreiten in dm für die Suche —
-_KAP_DMS = [2,3,4,5,6,8,10,12,14,17,20]
-def kapillaraufstiegsrate(horizonte: list[dict], physiogr: float) -> float | None:
-     # 1) Gr-Horizont finden (case-insensitive)
-    gr_horizont = next(
-        (h for h in horizonte if isinstance(h.get("hz"), str) and "gr" in h["hz"].lower()),
-        None
-    )
-    if gr_horizont is None:
-        return None
-
-    start_cm = gr_horizont.get("z_top")
-    if start_cm is None:
-        return None
-
-    # 2) Abstand zur physiologischen Gründigkeit
-    dist_cm = start_cm - physiogr
-    if dist_cm <= 0:
-        # liegt der Gr-Horizont in oder oberhalb der physiologischen Tiefe,
-        # geben wir eine Rate von 5 mm/d zurück
-        return 5.0
-
-    # 3) Abstand in dm und nächste Spalte wählen
-    dist_dm = dist_cm / 10
-    dm = min(_KAP_DMS, key=lambda x: abs(x - dist_dm))
-
-    # 4) Tabellenwert auslesen
-    bod = str(gr_horizont.get("Bodenart", ""))
-    row = _KAP_TABLE[
-        _KAP_TABLE["Bodenart"].str.lower()
-                  .str.contains(bod.split()[0].lower(), na=False)
-    ]
-    if row.empty:
-        return None
-
-    val = row[str(dm)].iloc[0]
-    if not isinstance(val, str) or not val.strip():
-        return None
-
-    # 5) Komma → Punkt, dann float
-    try:
-        return float(val.replace(",", "."))
-    except ValueError:
-        return None
-# ——————————————————————————————————————————
-# Hauptprogramm
-# ——————————————————————————————————————————
-def main():
-    # 1) Pfad zur Eingabedatei
-    eingabe = input("Pfad zur Eingabe-Excel-Datei: ").strip().strip('"').strip("'")
-    df_in = pd.read_excel(eingabe)
-
-    # 2) Nutzungsart abfragen
-    nutzungsart = input("Nutzungsart (Acker / Grünland): ").strip().lower()
-    if nutzungsart not in ("acker", "grünland", "gruenland"):
-        print("Ungültige Eingabe – verwende 'acker'.")
-        nutzungsart = "acker"
-    if nutzungsart == "grünland":
-        nutzungsart = "gruenland"
-
-    # 3) Kalkbedarf-Tabellen laden
-    kalk_df_acker = pd.read_csv("kalkbedarf_acker.csv")
-    kalk_df_gruen = pd.read_csv("kalkbedarf_gruen.csv")
-
-    # 4) Vorschau der Eingabedaten
-    print("\nEingelesene Daten (Vorschau):")
-    print(df_in.head(10).to_string(index=False))
-    if len(df_in) > 10:
-        print(f"... und noch {len(df_in) - 10} weitere Zeilen")
-
-    # 5) Spalten finden
-    cols = df_in.columns.tolist()
-    def find_col(*keys):
-        for c in cols:
-            if all(k.lower() in c.lower() for k in keys):
-                return c
-        raise KeyError(f"Keine Spalte mit {keys!r} gefunden. Verfügbare: {cols}")
-
-    col_tiefe    = find_col("tiefe")
-    col_bd       = find_col("trocken", "dichte")
-    col_skelett  = find_col("skelett")
-    col_humus    = find_col("humus")
-    col_ph       = find_col("ph")
-    col_bodenart = find_col("bodenart")
-    col_horizont = find_col("horizont")
-
-    # 6) Tiefenbereich in z_top/z_bot aufsplitten
-    depth_str     = df_in[col_tiefe].astype(str).str.strip()
-    z_split       = depth_str.str.split("-", expand=True)
-    df_in["z_top"] = pd.to_numeric(z_split[0], errors="coerce")
-    df_in["z_bot"] = pd.to_numeric(z_split[1], errors="coerce")
-
-    # 7) Dichte & Skelett in float
-    for col in (col_bd, col_skelett):
-        df_in[col] = pd.to_numeric(df_in[col], errors="coerce")
-
-    # 8) Humus in numerisch (Mittelwert, <-Werte halbieren)
-    def parse_range(val):
-        s = str(val).strip()
-        m = re.match(r'<\s*(\d+(\.\d+)?)', s)
-        if m:
-            return float(m.group(1)) / 2
-        s = s.replace('<','').replace('>','').strip()
-        if '-' in s:
-            lo, hi = s.split('-', 1)
-            try: return (float(lo)+float(hi))/2
-            except: return None
-        try: return float(s)
-        except: return None
-
-    df_in["humus_num"] = df_in[col_humus].apply(parse_range)
-    df_in[col_ph]      = pd.to_numeric(df_in[col_ph], errors="coerce")
-
-    # 9) Weitere Eingaben
-    bodenform = input("Bodenform: ")
-    try:
-        physiogr = int(input("Physiologische Gründigkeit (cm): "))
-    except ValueError:
-        physiogr = 100
-        print("Ungültig, verwende 100 cm als Standard.")
-
-    # 10) Liste der Horizonte
-    horizonte = []
-    for _, r in df_in.iterrows():
-        horizonte.append({
-            "hz":       r[col_horizont],
-            "z_top":    r["z_top"],
-            "z_bot":    r["z_bot"],
-            "bd":       r[col_bd],
-            "humus":    r["humus_num"],
-            "pH":       r[col_ph],
-            "Bodenart": r[col_bodenart],
-            "skelett":  r[col_skelett]
-        })
-
-    # 11) Oberboden–Horizont
-    ober      = min(horizonte, key=lambda h: h["z_top"])
-    ph_ob     = ober["pH"]
-    humus_ob  = ober["humus"]
-    bodentyp  = ober["Bodenart"]
-    bg        = bodentyp_to_bg.get(bodentyp)
-
-    # 12) Kalkbedarf nur einmal korrekt berechnen
-    if bg is None:
-        print(f"Warnung: Unbekannter Bodentyp '{bodentyp}'.")
-        kalkb, msg = None, None
-    else:
-        kalkb, msg = berechne_kalkbedarf(
-            bg, ph_ob, humus_ob,
-            nutzungsart,
-            kalk_df_acker,
-            kalk_df_gruen
-        )
-        if msg:
-            print("→", msg)
-
-    # 13) Humusvorrat bis 1 m und Umrechnung in Mg/ha
-    _, total_hum    = humusvorrat(horizonte, max_tiefe=100)
-    total_hum_Mg_ha = total_hum * 10
-
-    # 14) nFK bis zur physiologischen Gründigkeit
-    nfk_mm = gesamt_nfk(horizonte, physiogr)
-
-    # 15) Ergebnis-DataFrame und Ausgabe
-    df_sum = pd.DataFrame([{
-        "Bodentyp, Bodenform":             f"{bodentyp}, {bodenform}",
-        "Physiologische Gründigkeit (cm)": physiogr,
-        "Humusvorrat bis 1 m (Mg/ha)":     total_hum_Mg_ha,
-        "pH Oberboden":                    ph_ob,
-        "Kalkbedarf (dt CaO/ha)":          kalkb,
-        "nFK (mm)":                        nfk_mm
-    }])
-    print("\nErgebnisse:")
-    print(df_sum.to_string(index=False))
-
-    # 16) Speichern
-    out = input("Dateiname für Ausgabedatei (z.B. output.xlsx): ").strip()
-    if not out.lower().endswith(('.xls','.xlsx')):
-        out += '.xlsx'
-    df_sum.to_excel(out, index=False)
-    print(f"→ '{out}' wurde erzeugt.")
-
-if __name__ == "__main__":
-    main()
-
-    # ——— Debug für Kalkbedarf ———
-    import pandas as pd
-    from bodenauswertung import build_horizonte_list, bodentyp_to_bg, humuskategorie, berechne_kalkbedarf
-
-    # 1) Lies dieselbe Eingabedatei nochmal ein (oder gib hier den Pfad hartkodiert an)
-    df = pd.read_excel("Pfad/zu/deiner_Eingabe.xlsx")
-
-    # 2) Baue die Horizonte-Liste
-    horizonte = build_horizonte_list(df)
-
-    # 3) Nimm den obersten Horizont
-    ober = min(horizonte, key=lambda h: h["z_top"])
-
-    # 4) Ermittle bg, humus-Kategorie und pH
-    bodenart     = ober["Bodenart"].strip()
-    bg           = bodentyp_to_bg.get(bodenart)
-    ph_wert      = ober["pH"]
-    humus_wert   = ober["humus"]
-    humus_kat    = humuskategorie(humus_wert)
-
-    print("DEBUG: bg=", bg)
-    print("DEBUG: Bodenart =>", repr(bodenart))
-    print("DEBUG: pH =", ph_wert)
-    print("DEBUG: humus =", humus_wert, "=> kat", humus_kat)
-
-    # 5) Schau dir die Tabellen-Spalten an
-    df_acker = pd.read_csv("kalkbedarf_acker.csv")
-    print("DEBUG: Verfügbare Humuskategorien in CSV:", df_acker["humus_kat"].unique())
-
-    # 6) Suche simulieren und Ergebnis zeigen
-    kalk, msg = berechne_kalkbedarf(
-        bg, ph_wert, humus_wert, "acker",
-        df_acker, pd.read_csv("kalkbedarf_gruen.csv")
-    )
-    print("DEBUG: berechne_kalkbedarf ->", kalk, msg)
+import functools
+import hashlib
+import os
+import threading
+import warnings
+import weakref
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import re
+
+from messung import stufe
+
+
+# (1) Humusvorrat
+def humusvorrat(horizonte, max_tiefe=100, rechenweg=True):
+    """
+    Berechnet den Humusvorrat bis max_tiefe (cm).
+    Wenn der unterste Horizont weniger als max_tiefe abdeckt,
+    wird sein unteres Ende künstlich auf max_tiefe gesetzt.
+    horizonte: Horizont-Liste oder HorizontTabelle mit einer Bohrung.
+    Gibt (Rechenweg je Horizont nach z_top sortiert, Summe in kg/m²) zurück;
+    mit rechenweg=False nur die Summe, ohne den Rechenweg aufzubauen.
+    """
+    if isinstance(horizonte, HorizontTabelle):
+        t = horizonte.einzelprofil()
+        if not rechenweg:
+            order = np.argsort(t.z_top, kind="stable")
+            return _humus_kern(t.z_top[order], t.z_bot[order], t.bd[order], t.humus[order],
+                               np.array([0]), max_tiefe)[1][0]
+        horizonte = t.to_frame()
+    # DataFrame aufbauen und nach z_top sortieren, Rechnung im Batch-Kern
+    df = pd.DataFrame(horizonte).sort_values("z_top", kind="stable").reset_index(drop=True)
+    spalten, total = _humus_kern(
+        _float_array(df["z_top"]), _float_array(df["z_bot"]),
+        _float_array(df["bd"]), _float_array(df["humus"]),
+        np.array([0]), max_tiefe
+    )
+    if not rechenweg:
+        return total[0]
+    for name, werte in spalten.items():
+        df[name] = werte
+    return df, total[0]
+
+
+def _humus_kern(z_top, z_bot, bd, humus, starts, max_tiefe):
+    """
+    Vektorisierter Kern von humusvorrat() für viele Profile auf einmal.
+    Die Arrays sind nach Profil und z_top sortiert, starts enthält den
+    ersten Index jedes Profils. max_tiefe: Skalar oder ein Wert je Profil.
+    Gibt (Zwischenspalten je Horizont, Summe in kg/m² je Profil) zurück.
+    """
+    n = len(z_top)
+    laengen = np.diff(np.append(starts, n))
+    mt = np.broadcast_to(np.asarray(max_tiefe, dtype=float), laengen.shape)
+    mt_h = np.repeat(mt, laengen)
+
+    # z_bot_filled: NaNs auffüllen mit max_tiefe
+    z_bot_filled = np.where(np.isnan(z_bot), mt_h, z_bot)
+
+    # Wenn der unterste Horizont nicht bis max_tiefe reicht,
+    # setze sein z_bot_filled ebenfalls auf max_tiefe
+    letzte = starts + laengen - 1
+    kurz = z_bot_filled[letzte] < mt
+    z_bot_filled[letzte[kurz]] = mt[kurz]
+
+    eff_z_bot = np.minimum(z_bot_filled, mt_h)
+    eff_dicke = np.maximum(eff_z_bot - z_top, 0)
+
+    # Humusmasse pro cm² (g/cm²) und in kg/m²
+    humus_g_cm2 = (humus / 100) * bd * eff_dicke
+    humus_kg_m2 = humus_g_cm2 * 10
+
+    # Summe über alle Horizonte mit eff_dicke_cm > 0 (NaN zählt nicht)
+    beitrag = np.where((eff_dicke > 0) & ~np.isnan(humus_kg_m2), humus_kg_m2, 0.0)
+    total = np.add.reduceat(beitrag, starts) if n else np.zeros(len(starts))
+
+    spalten = {
+        "z_bot_filled": z_bot_filled,
+        "eff_z_bot":    eff_z_bot,
+        "eff_dicke_cm": eff_dicke,
+        "humus_g_cm2":  humus_g_cm2,
+        "humus_kg_m2":  humus_kg_m2,
+    }
+    return spalten, total
+
+
+def _float_array(werte):
+    """Wandelt eine Spalte (auch mit None) in ein float-Array um."""
+    return pd.to_numeric(pd.Series(werte), errors="coerce").to_numpy(dtype=float)
+
+
+# (2) Bodenart → Bodenartengruppe
+bodentyp_to_bg = {
+    "S":1, "Su2":1, "Ss":1,
+    "Su3":2,"Su4":2, "Sl2":2,"l'S":2, "Sl3":2, "St2":2,
+    "Sl4":3, "Slu":3, "lS":3, "St3":3, 
+    "sL":4, "uL":4, "Lu":4, "Ls2":4,"Ls3":4,"Ls4":4,"Ts4":4,"UU":4, "Us":4,"Uls":4,"Ut2":4,"Ut3":4,"Ut4":4,
+    "t'L":5, "tL":5, "lT":5, "T":5,"Lt2":5,"Lt3":5,"Lts":5,"Ts3":5,"Ts2":5,"Tl":5,"Tu2":5,"Tu3":5,"Tu4":5,"Tt":5,
+    "Mo":6
+}
+
+def humuskategorie(humus, nutzungsart="acker"):
+    """
+    Gibt die Humuskategorie zurück, abhängig von der Nutzungsart.
+    Für Acker:     <4, 4.1-8.0, 8.1-15.0, 15.1-30.0, >30.0
+    Für Grünland:  ≤15.0, 15.1-30.0, >30.0
+    """
+    if nutzungsart.lower() in ("gruenland", "grünland"):
+        if humus <= 15.0:
+            return "≤15.0"
+        if humus <= 30.0:
+            return "15.1-30.0"
+        return ">30.0"
+    else:
+        # Acker-Einteilung
+        if humus < 4.1:
+            return "<4"
+        if humus <= 8.0:
+            return "4.1-8.0"
+        if humus <= 15.0:
+            return "8.1-15.0"
+        if humus <= 30.0:
+            return "15.1-30.0"
+        return ">30.0"
+
+
+
+def ph_klasse_bestimmen(bg, kat, pH):
+    for lo, hi, cls in ph_klassengrenzen[bg][kat]:
+        if (lo is None or pH >= lo) and (hi is None or pH <= hi):
+            return cls
+    return None
+
+
+def berechne_kalkbedarf(bg, pH, humus, nutzungsart, df_acker, df_gruen, rechenweg=False):
+    """
+    bg: Bodenartgruppe (1–6)
+    pH: numerischer pH-Wert oder NaN
+    humus: numerischer Humus-Anteil
+    nutzungsart: "acker" oder "gruen"
+    df_acker, df_gruen: die DataFrames aus den CSVs
+    Gibt (CaO, Meldung) zurück; mit rechenweg=True zusätzlich ein
+    DataFrame mit Eingaben, Humuskategorie und der gefundenen Tabellenzeile.
+    """
+    if pd.isna(pH):
+        cao, meldung, kat = None, "Kein pH-Wert im Oberboden angegeben.", None
+    else:
+        # Humuskategorie jetzt mit Nutzungsart
+        kat = humuskategorie(humus, nutzungsart)
+
+        # Suche im vorkompilierten Intervall-Index der Tabelle
+        cao, meldung = None, f"Kein Kalkbedarf für bg={bg}, Humus={kat}, pH={pH} gefunden."
+        eintrag = kalk_index(df_acker, df_gruen).get((nutzungsart == "acker", bg, kat))
+        if eintrag is not None:
+            werte, gefunden = _kalk_suche(eintrag, np.array([pH], dtype=float))
+            if gefunden[0]:
+                cao, meldung = float(werte[0]), None
+    if not rechenweg:
+        return cao, meldung
+    return cao, meldung, _kalk_rechenweg(bg, pH, humus, nutzungsart, kat, cao, df_acker, df_gruen)
+
+def _kalk_rechenweg(bg, pH, humus, nutzungsart, kat, cao, df_acker, df_gruen):
+    """Eine Zeile mit den Schritten von berechne_kalkbedarf() (erste passende Tabellenzeile)."""
+    df = df_acker if nutzungsart == "acker" else df_gruen
+    zeile = pd.Series({"pH_lo": np.nan, "pH_hi": np.nan})
+    if cao is not None:
+        lo, hi = df["pH_lo"].astype(float), df["pH_hi"].astype(float)
+        passt = (df["bg"] == bg) & (df["humus_kat"] == kat) & (lo.isna() | (lo <= pH)) & (hi.isna() | (pH <= hi))
+        zeile = df.loc[passt.idxmax(), ["pH_lo", "pH_hi"]]
+    return pd.DataFrame([{
+        "Nutzungsart":   nutzungsart,
+        "Tabelle":       "acker" if nutzungsart == "acker" else "gruenland",
+        "bg":            bg,
+        "pH":            pH,
+        "humus":         humus,
+        "Humuskategorie": kat,
+        "pH_lo":         zeile["pH_lo"],
+        "pH_hi":         zeile["pH_hi"],
+        "CaO_dt_ha":     cao,
+    }])
+
+
+# — Vorkompilierter Intervall-Index der Kalkbedarf-Tabellen —
+# Statuscodes von kalkbedarf_bulk()
+KALK_OK = 0
+KALK_KEIN_PH = 1
+KALK_KEIN_TREFFER = 2
+
+_HUMUS_KAT_ACKER = np.array(["<4", "4.1-8.0", "8.1-15.0", "15.1-30.0", ">30.0"], dtype=object)
+_HUMUS_KAT_GRUEN = np.array(["≤15.0", "15.1-30.0", ">30.0"], dtype=object)
+
+def _humuskategorie_codes(humus, gruen):
+    """Index der Humuskategorie in _HUMUS_KAT_GRUEN (gruen) bzw. _HUMUS_KAT_ACKER."""
+    acker = np.select([humus < 4.1, humus <= 8.0, humus <= 15.0, humus <= 30.0], [0, 1, 2, 3], 4)
+    gruenland = np.select([humus <= 15.0, humus <= 30.0], [0, 1], 2)
+    return np.where(gruen, gruenland, acker)
+
+def _humuskategorien(humus, gruen):
+    """Vektorisierte humuskategorie() (gruen: bool-Array für Grünland-Einteilung)."""
+    codes = _humuskategorie_codes(humus, gruen)
+    return np.where(gruen, _HUMUS_KAT_GRUEN[np.minimum(codes, 2)], _HUMUS_KAT_ACKER[codes])
+
+def _nutzungsart_normalisieren(wert, standard="acker"):
+    wert = str(wert).strip().lower()
+    if wert == "grünland":
+        return "gruenland"
+    return wert if wert in ("acker", "gruenland") else standard
+
+def _ist_gruenland(nutzungsart):
+    """Maske der Elemente mit Grünland-Einteilung der Humuskategorien."""
+    return pd.Series(nutzungsart, dtype=object).str.lower().isin(["gruenland", "grünland"]).to_numpy()
+
+def _kalk_gruppe(lo, hi, cao):
+    """
+    Kompiliert die Zeilen einer (bg, humus_kat)-Gruppe.
+    Die pH-Achse wird an allen Intervallgrenzen p_0 < … < p_m-1 in 2m+1
+    Bereiche zerlegt: Bereich 2i liegt unterhalb von p_i (bzw. oberhalb
+    der letzten Grenze), Bereich 2i+1 ist die Grenze p_i selbst. Für jeden
+    Bereich wird die erste passende Tabellenzeile vorab bestimmt, so dass
+    die Suche dasselbe Ergebnis liefert wie die Maske über die Tabelle.
+    """
+    punkte = np.unique(np.concatenate([lo[~np.isnan(lo)], hi[~np.isnan(hi)]]))
+    m = len(punkte)
+    if m:
+        mitten = (punkte[:-1] + punkte[1:]) / 2
+        offen = np.concatenate([[punkte[0] - 1], mitten, [punkte[-1] + 1]])
+    else:
+        offen = np.zeros(1)
+    vertreter = np.empty(2 * m + 1)
+    vertreter[0::2] = offen
+    vertreter[1::2] = punkte
+
+    passt = (
+        (np.isnan(lo) | (lo <= vertreter[:, None])) &
+        (np.isnan(hi) | (vertreter[:, None] <= hi))
+    )
+    gefunden = passt.any(axis=1)
+    werte = np.where(gefunden, cao[passt.argmax(axis=1)], np.nan)
+    return punkte, werte, gefunden
+
+def _kalk_suche(eintrag, pH):
+    """Binäre Suche der pH-Werte im kompilierten Eintrag → (CaO, gefunden)."""
+    punkte, werte, gefunden = eintrag
+    i = np.searchsorted(punkte, pH, side="left")
+    auf_grenze = np.zeros(len(pH), dtype=bool)
+    if len(punkte):
+        auf_grenze = (i < len(punkte)) & (punkte[np.minimum(i, len(punkte) - 1)] == pH)
+    bereich = 2 * i + auf_grenze
+    return werte[bereich], gefunden[bereich] & ~np.isnan(pH)
+
+def _kompiliere_kalktabelle(df, acker):
+    index = {}
+    for (bg, kat), gruppe in df.groupby(["bg", "humus_kat"], sort=False):
+        index[acker, bg, kat] = _kalk_gruppe(
+            gruppe["pH_lo"].to_numpy(dtype=float),
+            gruppe["pH_hi"].to_numpy(dtype=float),
+            gruppe["CaO"].to_numpy(dtype=float),
+        )
+    return index
+
+_KALK_INDEX_CACHE = {}
+
+def _kalk_index_entfernen(key):
+    # Aufgerufen, wenn eine der Tabellen freigegeben wird; neuere Einträge unter derselben id bleiben
+    treffer = _KALK_INDEX_CACHE.get(key)
+    if treffer is not None and (treffer[0]() is None or treffer[1]() is None):
+        del _KALK_INDEX_CACHE[key]
+
+def kalk_index(df_acker, df_gruen):
+    """
+    Kompilierter Index {(acker, bg, humus_kat): Eintrag} der beiden
+    Kalkbedarf-Tabellen. Wird je Tabellenpaar nur einmal aufgebaut; die
+    DataFrames dürfen danach nicht mehr verändert werden.
+    """
+    key = (id(df_acker), id(df_gruen))
+    treffer = _KALK_INDEX_CACHE.get(key)
+    if treffer is not None and treffer[0]() is df_acker and treffer[1]() is df_gruen:
+        return treffer[2]
+    index = {**_kompiliere_kalktabelle(df_acker, True), **_kompiliere_kalktabelle(df_gruen, False)}
+    _KALK_INDEX_CACHE[key] = (weakref.ref(df_acker), weakref.ref(df_gruen), index)
+    for df in (df_acker, df_gruen):
+        weakref.finalize(df, _kalk_index_entfernen, key)
+    return index
+
+def kalkbedarf_bulk(bg, pH, humus, nutzungsart, df_acker, df_gruen):
+    """
+    Kalkbedarf für viele Oberböden auf einmal, wie berechne_kalkbedarf().
+    bg, pH, humus: Arrays gleicher Länge (bg NaN/None = unbekannt)
+    nutzungsart: String oder Array von Strings
+    Gibt (CaO-Array, Statuscode-Array mit KALK_OK / KALK_KEIN_PH /
+    KALK_KEIN_TREFFER) zurück.
+    """
+    pH = np.asarray(pH, dtype=float)
+    humus = np.asarray(humus, dtype=float)
+    n = len(pH)
+    bg = pd.to_numeric(pd.Series(bg, dtype=object), errors="coerce").to_numpy(dtype=float)
+    nutzung = np.broadcast_to(np.asarray(nutzungsart, dtype=object), (n,))
+    acker = nutzung == "acker"
+    kat = _humuskategorien(humus, _ist_gruenland(nutzung))
+
+    cao = np.full(n, np.nan)
+    status = np.where(np.isnan(pH), KALK_KEIN_PH, KALK_KEIN_TREFFER)
+
+    # Elemente nach (Tabelle, bg, Kategorie) gruppieren und je Gruppe suchen
+    gruppen = pd.DataFrame({"acker": acker, "bg": bg, "kat": kat}).groupby(
+        ["acker", "bg", "kat"], sort=False
+    ).indices
+    index = kalk_index(df_acker, df_gruen)
+    for key, pos in gruppen.items():
+        eintrag = index.get(key)
+        if eintrag is None:
+            continue
+        werte, gefunden = _kalk_suche(eintrag, pH[pos])
+        cao[pos[gefunden]] = werte[gefunden]
+        status[pos[gefunden]] = KALK_OK
+    return cao, status
+
+
+# (6) nFK
+data_full = {
+    "Bodenart": ["Ss", "Sl2", "Sl3", "Sl4", "Slu", "St2", "St3", "Su2", "Su3", "Su4", "Ls2", "Ls3", "Ls4", "Lt2", "Lt3", "Lts", "Lu", "Uu", "Uls", "Us", "Ut2", "Ut3", "Ut4", "Tt", "Tl", "Tu2", "Tu3", "Tu4", "Ts2", "Ts3", "Ts4", "fS", "fSms", "fSgs", "mS", "mSfs", "mSgs", "gS"],
+    "nutzbareFK_pt1+2": [9,20,22,22,23,18,18,20,25,27,21,21,20,18,17,17,21,30,24,28,28,26,23,15,15,16,17,19,16,16,17,10,10,10,9,9,9,8],
+    "nutzbareFK_pt3":   [7,18,18,18,21,16,15,18,21,23,16,16,16,14,12,14,17,26,22,25,26,25,21,13,13,12,13,17,13,13,14,9,9,9,6,6,6,5],
+    "nutzbareFK_pt4+5": [7,17,17,15,19,13,12,17,20,21,14,14,13,11,10,11,15,23,21,22,23,23,19,12,11,10,10,16,12,11,11,8,8,8,5,5,5,4]
+}
+df_full = pd.DataFrame(data_full).set_index("Bodenart")
+
+org_korrektur = {
+    "Sand":  {(1,2):2, (2,4):4, (4,8):5, (8,15):6},
+    "LUT":   {(1,2):1, (2,4):2, (4,8):4, (8,15):8}
+}
+
+def get_org_factor(bodenart, humus):
+    """
+    Gibt den Humuskorrekturfaktor (Multiplikator) zurück.
+    """
+    if humus <= 1:
+        return 1.0
+    key = "Sand" if bodenart.startswith("S") else "LUT"
+    for (low, high), perc in org_korrektur[key].items():
+        if low <= humus < high:
+            return perc
+    return 1.0
+
+def nfk_horizont(bodenart, skelett, humus, zone):
+    """
+    Berechnet die nutzbare Feldkapazität für einen Horizont.
+    """
+    base = df_full.at[bodenart, f"nutzbareFK_{zone}"]
+    # Humuskorrektur
+    base = base + get_org_factor(bodenart, humus)
+    # Abzug Skelettanteil
+    return base * (1 - skelett / 100)
+
+def zone_von_bd(bd):
+    if bd < 1.4:
+        return "pt1+2"
+    elif bd < 1.6:
+        return "pt3"
+    else:
+        return "pt4+5"
+
+def gesamt_nfk(horizonte, phyto_tiefe=100, beitraege=False, rechenweg=False):
+    """
+    Summe der nFK (mm) bis phyto_tiefe.
+    Mit beitraege=True wird zusätzlich ein Array mit dem Beitrag jedes
+    Horizonts (mm, in der Reihenfolge von horizonte) zurückgegeben, mit
+    rechenweg=True zuletzt ein DataFrame mit den Zwischenwerten je Horizont
+    (nach z_top sortiert).
+    horizonte: Horizont-Liste oder HorizontTabelle mit einer Bohrung.
+    """
+    if isinstance(horizonte, HorizontTabelle):
+        t = horizonte.einzelprofil()
+        spalten = (t.z_top, t.z_bot, t.bd, t.humus, t.skelett, t.bodenart)
+        hz = t.hz
+    else:
+        df = pd.DataFrame(horizonte)
+        skelett = df["skelett"] if "skelett" in df else np.zeros(len(df))
+        spalten = (
+            _float_array(df["z_top"]), _float_array(df["z_bot"]),
+            _float_array(df["bd"]), _float_array(df["humus"]),
+            _float_array(skelett), df["Bodenart"].to_numpy(dtype=object),
+        )
+        hz = df["hz"].to_numpy(dtype=object) if "hz" in df else np.full(len(df), None, dtype=object)
+    order = np.argsort(spalten[0], kind="stable")
+
+    sortiert = [werte[order] for werte in spalten]
+    beitrag, total = _nfk_kern(*sortiert, np.array([0]), phyto_tiefe, strikt=True)
+    ergebnis = (total[0],)
+    if beitraege:
+        je_horizont = np.empty_like(beitrag)
+        je_horizont[order] = beitrag
+        ergebnis += (je_horizont,)
+    if rechenweg:
+        z_top, z_bot, bd, humus, skelett, bodenart = sortiert
+        ergebnis += (pd.DataFrame({
+            "hz": hz[order], "z_top": z_top, "z_bot": z_bot, "Bodenart": bodenart,
+            **_nfk_rechenweg(z_top, z_bot, bd, humus, skelett, bodenart_codes(bodenart),
+                             np.array([0]), phyto_tiefe, beitrag),
+        }),)
+    return ergebnis if len(ergebnis) > 1 else ergebnis[0]
+
+
+# — Array-Form der nFK-Tabellen —
+# Feste Kodierung aller bekannten Bodenarten: zuerst df_full, dann die
+# übrigen Bodenarten aus bodentyp_to_bg (Code -1 = unbekannt)
+_BODENARTEN = list(df_full.index) + [b for b in bodentyp_to_bg if b not in df_full.index]
+_BODENART_INDEX = pd.Index(_BODENARTEN, dtype=object)
+
+def bodenart_codes(bodenart):
+    """Bodenarten (Strings) → Integer-Codes in _BODENARTEN, -1 für unbekannte."""
+    return _BODENART_INDEX.get_indexer(pd.Index(bodenart, dtype=object))
+
+# nutzbare FK als dichte Matrix (Bodenart-Code × Zone), NaN außerhalb von df_full;
+# die letzte Zeile ist eine NaN-Zeile für Code -1
+_NFK_MATRIX = np.vstack([df_full.reindex(_BODENARTEN).to_numpy(dtype=float), np.full(3, np.nan)])
+_SAND_JE_CODE = np.array([b.startswith("S") for b in _BODENARTEN] + [False])
+
+# Grenzen der Rohdichte-Zonen und der Humusstufen für die Array-Rechnung
+_NFK_BD_GRENZEN = np.array([1.4, 1.6])
+_NFK_ZONEN = ["pt1+2", "pt3", "pt4+5"]
+
+def _org_stufen(key):
+    """Humusgrenzen und Zuschläge aus org_korrektur als Arrays (mit 1.0 außerhalb)."""
+    stufen = sorted(org_korrektur[key].items())
+    grenzen = np.array([lo for (lo, _), _ in stufen] + [stufen[-1][0][1]], dtype=float)
+    werte = np.array([1.0] + [perc for _, perc in stufen] + [1.0])
+    return grenzen, werte
+
+_ORG_GRENZEN, _ORG_SAND = _org_stufen("Sand")
+_, _ORG_LUT = _org_stufen("LUT")
+
+def _nfk_teile(bd, humus, codes):
+    """
+    Rohdichte-Zone (Index), Basis-nFK und Humuszuschlag (Vol%) je Horizont
+    nach Bodenart-Code. Gibt (zone, basis, faktor, bekannt) zurück.
+    """
+    # Basiswert aus der nFK-Matrix nach Bodenart-Code und Rohdichte-Zone
+    zone = np.searchsorted(_NFK_BD_GRENZEN, bd, side="right")
+    bekannt = ~np.isnan(_NFK_MATRIX[codes, 0])
+    basis = _NFK_MATRIX[codes, zone]
+
+    # Humuskorrektur wie get_org_factor()
+    stufe = np.searchsorted(_ORG_GRENZEN, humus, side="right")
+    faktor = np.where(_SAND_JE_CODE[codes], _ORG_SAND[stufe], _ORG_LUT[stufe])
+    faktor = np.where(humus <= 1, 1.0, faktor)
+    return zone, basis, faktor, bekannt
+
+def _nfk_wert(bd, humus, skelett, codes):
+    """
+    Korrigierte nFK je Horizont (Vol% = mm je dm) nach Bodenart-Code,
+    Rohdichte-Zone, Humuszuschlag und Skelettabzug.
+    Gibt (wert, bekannt) zurück; unbekannte Bodenarten ergeben NaN.
+    """
+    _, basis, faktor, bekannt = _nfk_teile(bd, humus, codes)
+    # Abzug Skelettanteil
+    return (basis + faktor) * (1 - skelett / 100), bekannt
+
+def _nfk_dicken(z_top, z_bot, starts, phyto_tiefe):
+    """Effektive Dicke je Horizont bis phyto_tiefe (fehlendes z_bot → phyto_tiefe)."""
+    laengen = np.diff(np.append(starts, len(z_top)))
+    pt = np.broadcast_to(np.asarray(phyto_tiefe, dtype=float), laengen.shape)
+    pt_h = np.repeat(pt, laengen)
+    z_bot_filled = np.where(np.isnan(z_bot), pt_h, z_bot)
+    return np.minimum(z_bot_filled, pt_h) - z_top
+
+def _nfk_kern(z_top, z_bot, bd, humus, skelett, bodenart, starts, phyto_tiefe, strikt=False):
+    """
+    Vektorisierter Kern von gesamt_nfk() für viele Profile auf einmal.
+    Die Arrays sind nach Profil und z_top sortiert, starts enthält den
+    ersten Index jedes Profils. bodenart: Strings oder Codes aus
+    bodenart_codes(). phyto_tiefe: Skalar oder ein Wert je Profil.
+    Unbekannte Bodenarten ergeben NaN (bzw. KeyError bei strikt=True).
+    Gibt (nFK-Beitrag in mm je Horizont, Summe in mm je Profil) zurück.
+    """
+    n = len(z_top)
+    bodenart = np.asarray(bodenart)
+    codes = bodenart if bodenart.dtype.kind in "iu" else bodenart_codes(bodenart)
+
+    # Effektiver Untergrund bis physiologischen Grenzwert, nur Dicken > 0
+    eff_dicke = _nfk_dicken(z_top, z_bot, starts, phyto_tiefe)
+    aktiv = eff_dicke > 0
+
+    wert, bekannt = _nfk_wert(bd, humus, skelett, codes)
+    if strikt and (aktiv & ~bekannt).any():
+        raise KeyError(bodenart[np.flatnonzero(aktiv & ~bekannt)[0]])
+
+    # wert [mm pro 100 cm] → mm für eff_dicke_cm
+    beitrag = np.where(aktiv, wert * eff_dicke / 100 * 10, 0.0)
+    total = np.add.reduceat(beitrag, starts) if n else np.zeros(len(starts))
+    return beitrag, total
+
+def _nfk_rechenweg(z_top, z_bot, bd, humus, skelett, codes, starts, phyto_tiefe, beitrag):
+    """Zwischenwerte von _nfk_kern() je Horizont als Spalten für den Rechenweg."""
+    zone, basis, faktor, _ = _nfk_teile(bd, humus, codes)
+    wert, _ = _nfk_wert(bd, humus, skelett, codes)
+    return {
+        "eff_dicke_cm":       np.maximum(_nfk_dicken(z_top, z_bot, starts, phyto_tiefe), 0),
+        "Zone":               np.array(_NFK_ZONEN, dtype=object)[zone],
+        "basis_vol":          basis,
+        "humus_zuschlag_vol": faktor,
+        "skelett":            skelett,
+        "nfk_vol":            wert,
+        "nfk_mm":             beitrag,
+    }
+
+def parse_number_or_range(val):
+    """
+    Skalarer Parser für Zahlen, Ranges und Prozentangaben (None, wenn
+    unparsebar). Referenz für parse_number_or_range_vec().
+    """
+    s = str(val).strip()
+    # normalize dashes, comma→dot, strip percent, normalize ≥
+    s = (
+        s.replace("–", "-")
+         .replace("—", "-")
+         .replace(",", ".")
+         .replace("%", "")
+         .replace("≥", ">")
+    )
+
+    # 1) "<X-Y" → unterer Wert X halbieren
+    if s.startswith("<") and "-" in s:
+        # entferne führendes '<', splitte an '-', nimm unteren Wert
+        lo = s.lstrip("<").split("-", 1)[0]
+        try:
+            return float(lo) / 2
+        except:
+            pass
+
+    # 2) "<X" → X/2
+    m = re.match(r"<\s*(\d+(\.\d+)?)$", s)
+    if m:
+        return float(m.group(1)) / 2
+
+    # 3) ">X" → X
+    m2 = re.match(r">\s*(\d+(\.\d+)?)$", s)
+    if m2:
+        return float(m2.group(1))
+
+    # 4) "X-Y" → Mittelwert
+    if "-" in s:
+        lo, hi = s.split("-", 1)
+        try:
+            return (float(lo) + float(hi)) / 2
+        except:
+            pass
+
+    # 5) Einzelner Wert
+    try:
+        return float(s)
+    except:
+        return None
+
+# — Vektorisierter Parser (ein str.extract-Durchlauf je Spalte) —
+_NUM = r"[0-9]+(?:\.[0-9]+)?"
+_ZAHL_MUSTER = (
+    rf"^(?:(?P<zahl>{_NUM})\s*"
+    rf"|<\s*(?P<kleiner>{_NUM})"
+    rf"|>\s*(?P<groesser>{_NUM})"
+    rf"|<+\s*(?P<kl_von>{_NUM})\s*-[\s\S]*"
+    rf"|(?P<von>{_NUM})\s*-\s*(?P<bis>{_NUM})\s*"
+    rf"|(?P<nan>nan))$"
+)
+
+_ZAHL_ERSATZ = str.maketrans({"–": "-", "—": "-", ",": ".", "%": None, "≥": ">"})
+
+def parse_number_or_range_vec(werte, unparsbar=np.nan):
+    """
+    Vektorisierte Form von parse_number_or_range() für eine ganze Spalte.
+    Gibt eine float-Series mit demselben Index zurück; was der skalare
+    Parser mit None beantwortet, wird zu unparsbar (Standard NaN).
+    Jede verschiedene Zeichenkette wird nur einmal geparst. Seltene Formen,
+    die das Muster nicht abdeckt (z. B. "1e-05", ".5"), laufen über den
+    skalaren Parser und liefern daher dasselbe Ergebnis.
+    """
+    unten, oben = parse_bereich_vec(werte, unparsbar)
+    return (unten + oben) / 2
+
+def parse_bereich_vec(werte, unparsbar=np.nan):
+    """
+    Wie parse_number_or_range_vec(), behält aber die Grenzen: gibt zwei
+    float-Series (unten, oben) zurück, deren Mittel der Punktwert ist.
+    "X-Y" → (X, Y), "<X" und "<X-Y" → (0, X), Einzelwerte, ">X" und
+    Formen aus dem skalaren Parser → (Wert, Wert).
+    """
+    werte = pd.Series(werte)
+    if pd.api.types.is_float_dtype(werte) or (
+        pd.api.types.is_integer_dtype(werte) and not pd.api.types.is_bool_dtype(werte)
+    ):
+        werte = werte.astype(float)
+        return werte, werte.copy()
+
+    # Wie im skalaren Parser wird str(val) geparst, jede Form nur einmal
+    codes, formen = pd.factorize(werte.to_numpy(dtype=object).astype(str))
+    s = pd.Series(formen, dtype=object).str.strip().str.translate(_ZAHL_ERSATZ)
+    teile = s.str.extract(_ZAHL_MUSTER)
+
+    def num(name):
+        return teile[name].to_numpy(dtype=object).astype(float)
+
+    null = np.zeros(len(s))
+    unten = np.full(len(s), np.nan)
+    oben = np.full(len(s), np.nan)
+    for name, u, o in (
+        ("zahl", num("zahl"), num("zahl")),
+        ("kleiner", null, num("kleiner")),
+        ("groesser", num("groesser"), num("groesser")),
+        ("kl_von", null, num("kl_von")),
+        ("von", num("von"), num("bis")),
+    ):
+        treffer = teile[name].notna().to_numpy()
+        unten[treffer] = u[treffer]
+        oben[treffer] = o[treffer]
+
+    # Rest über den skalaren Parser
+    for i in np.flatnonzero(teile.isna().all(axis=1).to_numpy()):
+        wert = parse_number_or_range(formen[i])
+        unten[i] = oben[i] = unparsbar if wert is None else wert
+    return (
+        pd.Series(unten[codes], index=werte.index),
+        pd.Series(oben[codes], index=werte.index),
+    )
+
+
+def _find_col(cols, *keys):
+    for c in cols:
+        if all(k.lower() in str(c).lower() for k in keys):
+            return c
+    raise KeyError(f"Keine Spalte mit {keys!r} gefunden.")
+
+def _spalten_finden(cols):
+    """Ordnet den Horizont-Feldern die Spalten der Eingabedatei zu."""
+    return {
+        "tiefe":    _find_col(cols, "tiefe"),
+        "bd":       _find_col(cols, "trocken", "dichte"),
+        "skelett":  _find_col(cols, "skelett"),
+        "humus":    _find_col(cols, "humus"),
+        "pH":       _find_col(cols, "ph"),
+        "Bodenart": _find_col(cols, "bodenart"),
+        "hz":       _find_col(cols, "horizont"),
+    }
+
+# Bei jeder Änderung am Einlesen/Parsen erhöhen, die Einträge im
+# Eingabe-Cache (eingabecache.py) gelten dann nicht mehr
+PARSER_VERSION = 1
+
+def build_horizonte_frame(df, id_spalte=None, spalten=None, bereiche=False, kompakt=False):
+    """
+    Wie build_horizonte_list(), liefert aber ein DataFrame mit einer Zeile
+    je Horizont (Spalten hz, z_top, z_bot, bd, humus, pH, Bodenart, skelett).
+    Mit id_spalte wird die Bohrungs-ID als Spalte "bohrung" übernommen,
+    so dass das Ergebnis direkt an auswertung_batch() gehen kann.
+    Mit bereiche=True kommen die Grenzen aus parse_bereich_vec() als
+    Spalten bd_min, bd_max, humus_min, … hinzu (für unsicherheit_batch()).
+    Mit kompakt=True sparsame Spaltentypen, siehe kompakt_frame().
+    """
+    spalten = spalten or _spalten_finden(df.columns.tolist())
+
+    # — Tiefen normalisieren (Bindestriche, '+' und fehlende Obergrenzen) —
+    depth = (
+        df[spalten["tiefe"]]
+          .astype(str)
+          .str.strip()
+          # Unicode‐Striche → normaler Bindestrich
+          .str.replace("–", "-", regex=False)
+          .str.replace("—", "-", regex=False)
+          # "70+" → "70-"
+          .str.replace(r"(\d+)\+", r"\1-", regex=True)
+          # alles, was nach Zahl- endet, auf Zahl-100 setzen
+          .str.replace(r"^(\d+)-\s*$", r"\1-100", regex=True)
+    )
+
+    # jetzt splitten und in numerische Spalten überführen
+    splits = depth.str.split("-", expand=True).reindex(columns=[0, 1])
+
+    frame = pd.DataFrame({
+        "hz":       df[spalten["hz"]],
+        "z_top":    pd.to_numeric(splits[0], errors="coerce"),
+        "z_bot":    pd.to_numeric(splits[1], errors="coerce"),
+        # — Dichte (bd) —
+        "bd":       parse_number_or_range_vec(df[spalten["bd"]]),
+        # — Humus —
+        "humus":    parse_number_or_range_vec(df[spalten["humus"]]),
+        # — pH — mit demselben Parser für Ranges
+        "pH":       parse_number_or_range_vec(df[spalten["pH"]]),
+        "Bodenart": df[spalten["Bodenart"]],
+        # — Skelett (%) —> Null ersetzt, falls leer oder unparsebar
+        "skelett":  parse_number_or_range_vec(df[spalten["skelett"]], unparsbar=0.0),
+    }, index=df.index)
+    if bereiche:
+        for name in HorizontTabelle.BEREICHE:
+            unten, oben = parse_bereich_vec(df[spalten[name]], unparsbar=0.0 if name == "skelett" else np.nan)
+            frame[f"{name}_min"], frame[f"{name}_max"] = unten, oben
+    if id_spalte is not None:
+        frame.insert(0, "bohrung", df[id_spalte])
+    return kompakt_frame(frame) if kompakt else frame
+
+def build_horizonte_list(df):
+    # — Liste bauen —
+    return build_horizonte_frame(df).to_dict("records")
+
+
+def iter_csv_bloecke(pfad, id_spalte, chunksize=100_000, **read_csv_kwargs):
+    """
+    Liest einen großen CSV-Export blockweise und liefert die Rohzeilen
+    (DataFrame, Bohrungs-ID als str) in Blöcken, die nur vollständige
+    Bohrungen enthalten. Ein Vorlauf über die ID-Spalte zählt die Zeilen je
+    Bohrung; Zeilen angefangener Bohrungen warten in einem Puffer, bis die
+    Bohrung komplett ist. Bei nach Bohrung sortierten Dateien liegt so nur
+    ein Block plus eine Bohrung im Speicher und die Reihenfolge bleibt die
+    der Datei. Verstreute Bohrungen sind erlaubt, erscheinen aber erst im
+    Block ihrer letzten Zeile, und der Puffer wächst mit der Streuung.
+    Ein dtype in read_csv_kwargs wird übernommen, id_spalte bleibt str.
+    """
+    dtype = {**(read_csv_kwargs.pop("dtype", None) or {}), id_spalte: str}
+    zaehler = [
+        teil[id_spalte].value_counts(dropna=False, sort=False)
+        for teil in pd.read_csv(pfad, usecols=[id_spalte], dtype={id_spalte: str},
+                                chunksize=chunksize, **read_csv_kwargs)
+    ]
+    if not zaehler:
+        return
+    offen = pd.concat(zaehler).groupby(level=0, sort=False, dropna=False).sum()
+    if offen.index.hasnans:
+        raise ValueError(f"Bohrungs-ID fehlt in Spalte {id_spalte!r}.")
+
+    puffer = None
+    reader = pd.read_csv(pfad, chunksize=chunksize, dtype=dtype, **read_csv_kwargs)
+    for block in reader:
+        anzahl = block[id_spalte].value_counts(sort=False)
+        offen.loc[anzahl.index] -= anzahl.to_numpy()
+        if puffer is not None:
+            block = pd.concat([puffer, block])
+        fertig = (block[id_spalte].map(offen) == 0).to_numpy()
+        puffer = None if fertig.all() else block[~fertig]
+        if fertig.any():
+            yield block[fertig]
+    if puffer is not None:
+        # Datei hat sich zwischen Vorlauf und Lesen geändert
+        raise ValueError(f"{pfad} wurde während des Lesens verändert.")
+
+def iter_horizonte_csv(pfad, id_spalte=None, chunksize=100_000, **read_csv_kwargs):
+    """
+    Liest einen großen CSV-Export blockweise und liefert je Bohrung ein
+    Paar (bohrung_id, horizonte) wie build_horizonte_list().
+    id_spalte: Spalte mit der Bohrungs-ID (Standard: erste Spalte mit "bohr").
+    Bohrungen über Blockgrenzen hinweg werden zusammengeführt, auch wenn
+    ihre Zeilen nicht zusammenhängend stehen (siehe iter_csv_bloecke()).
+    """
+    cols = pd.read_csv(pfad, nrows=0, **read_csv_kwargs).columns.tolist()
+    spalten = _spalten_finden(cols)
+    id_spalte = id_spalte or _find_col(cols, "bohr")
+
+    for block in iter_csv_bloecke(pfad, id_spalte, chunksize, **read_csv_kwargs):
+        frame = build_horizonte_frame(block, id_spalte=id_spalte, spalten=spalten)
+        for bohrung, teil in frame.groupby("bohrung", sort=False):
+            yield bohrung, teil.drop(columns="bohrung").to_dict("records")
+
+
+# ——————————————————————————————————————————
+# Spaltenweise Horizont-Tabelle
+# ——————————————————————————————————————————
+def _kategorisch(werte, feste=()):
+    """Werte → (int32-Codes, Kategorien als object-Array); fehlende Werte → -1."""
+    werte = pd.Series(werte, dtype=object)
+    feste_menge = set(feste)
+    neu = [w for w in pd.unique(werte.dropna()) if w not in feste_menge]
+    kategorien = pd.Index(list(feste) + neu, dtype=object)
+    codes = kategorien.get_indexer(werte).astype(np.int32)
+    return codes, kategorien.to_numpy(dtype=object)
+
+def _dekodieren(codes, kategorien):
+    """Codes → Werte (object-Array), -1 ergibt NaN."""
+    return np.append(kategorien, np.nan).astype(object)[codes]
+
+
+class HorizontTabelle:
+    """
+    Spaltenweise Darstellung von Horizonten einer oder vieler Bohrungen.
+    z_top, z_bot, bd, humus, pH und skelett sind float-Arrays, Bodenart und
+    hz werden als int32-Codes in bodenart_kategorien bzw. hz_kategorien
+    gespeichert (-1 = fehlt). Die Codes der Bodenart stimmen für bekannte
+    Bodenarten mit bodenart_codes() überein.
+    Die Zeilen einer Bohrung stehen zusammenhängend in Eingabereihenfolge;
+    offsets enthält den ersten Index jeder Bohrung plus die Gesamtlänge.
+    bohrung(i) liefert eine Sicht ohne Kopie der Daten.
+    bereiche: {Feld: (unten, oben)} für Felder mit Spalten <Feld>_min/_max.
+    """
+    __slots__ = (
+        "ids", "offsets", "z_top", "z_bot", "bd", "humus", "pH", "skelett",
+        "bodenart_codes", "bodenart_kategorien", "hz_codes", "hz_kategorien",
+        "bereiche", "_sortierung",
+    )
+    ZAHLEN = ("z_top", "z_bot", "bd", "humus", "pH", "skelett")
+    BEREICHE = ("bd", "humus", "pH", "skelett")
+
+    @classmethod
+    def aus_frame(cls, df, id_spalte=None):
+        """
+        Aus einem Horizont-DataFrame wie build_horizonte_frame().
+        Mit id_spalte werden die Zeilen je Bohrung zusammengefasst
+        (Reihenfolge wie das erste Auftreten), sonst ist alles eine Bohrung.
+        Frames aus kompakt_frame() werden mit _aus_kompakt() eingelesen.
+        """
+        n = len(df)
+        zahlen = _aus_kompakt if df.attrs.get(KOMPAKT_MARKE) else _float_array
+        if id_spalte is None:
+            codes = np.zeros(n, dtype=np.intp)
+            ids = np.array([None] if n else [], dtype=object)
+        else:
+            codes, ids = pd.factorize(df[id_spalte], sort=False)
+            if (codes < 0).any():
+                raise ValueError(f"Bohrungs-ID fehlt in Spalte {id_spalte!r}.")
+            ids = np.asarray(ids, dtype=object)
+
+        # Zeilen je Bohrung zusammenziehen (stabil, nur wenn nötig)
+        reihen = slice(None)
+        if (np.diff(codes) < 0).any():
+            reihen = np.argsort(codes, kind="stable")
+
+        t = object.__new__(cls)
+        t.ids = ids
+        t.offsets = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(ids)))]
+        for name in cls.ZAHLEN:
+            standard = 0.0 if name == "skelett" else np.nan
+            werte = zahlen(df[name])[reihen] if name in df else np.full(n, standard)
+            setattr(t, name, werte)
+        bodenart = df["Bodenart"].to_numpy(dtype=object)[reihen] if "Bodenart" in df else [np.nan] * n
+        t.bodenart_codes, t.bodenart_kategorien = _kategorisch(bodenart, _BODENARTEN)
+        hz = df["hz"].to_numpy(dtype=object)[reihen] if "hz" in df else [np.nan] * n
+        t.hz_codes, t.hz_kategorien = _kategorisch(hz)
+        t.bereiche = {
+            name: (zahlen(df[f"{name}_min"])[reihen], zahlen(df[f"{name}_max"])[reihen])
+            for name in cls.BEREICHE if f"{name}_min" in df and f"{name}_max" in df
+        }
+        t._sortierung = None
+        return t
+
+    @classmethod
+    def aus_spalten(cls, ids, laengen, spalten, kategorien):
+        """Gegenstück zu als_spalten(); die Arrays werden ohne Kopie übernommen."""
+        t = object.__new__(cls)
+        t.ids = np.asarray(ids, dtype=object)
+        t.offsets = np.r_[0, np.cumsum(laengen)]
+        for name in cls.ZAHLEN + ("bodenart_codes", "hz_codes"):
+            setattr(t, name, spalten[name])
+        t.bodenart_kategorien = pd.Index(kategorien["bodenart"], dtype=object).to_numpy()
+        t.hz_kategorien = pd.Index(kategorien["hz"], dtype=object).to_numpy()
+        t.bereiche = {
+            name: (spalten[f"{name}_min"], spalten[f"{name}_max"])
+            for name in cls.BEREICHE if f"{name}_min" in spalten
+        }
+        t._sortierung = None
+        return t
+
+    def als_spalten(self):
+        """({Name: Array je Horizont}, {"bodenart": [...], "hz": [...]}) für den Eingabe-Cache."""
+        spalten = {name: getattr(self, name) for name in self.ZAHLEN + ("bodenart_codes", "hz_codes")}
+        for name, (unten, oben) in self.bereiche.items():
+            spalten[f"{name}_min"], spalten[f"{name}_max"] = unten, oben
+        kategorien = {"bodenart": self.bodenart_kategorien.tolist(), "hz": self.hz_kategorien.tolist()}
+        return spalten, kategorien
+
+    @classmethod
+    def aus_liste(cls, horizonte):
+        """Aus einer Horizont-Liste wie build_horizonte_list() (eine Bohrung)."""
+        return cls.aus_frame(pd.DataFrame(list(horizonte)))
+
+    def __len__(self):
+        return len(self.z_top)
+
+    def __repr__(self):
+        return f"<HorizontTabelle: {len(self)} Horizonte, {self.anzahl_bohrungen} Bohrungen>"
+
+    @property
+    def anzahl_bohrungen(self):
+        return len(self.ids)
+
+    @property
+    def starts(self):
+        """Erster Index jeder Bohrung (wie für die Batch-Kerne)."""
+        return self.offsets[:-1]
+
+    @property
+    def laengen(self):
+        return np.diff(self.offsets)
+
+    @property
+    def bodenart(self):
+        return _dekodieren(self.bodenart_codes, self.bodenart_kategorien)
+
+    @property
+    def hz(self):
+        return _dekodieren(self.hz_codes, self.hz_kategorien)
+
+    @property
+    def nbytes(self):
+        """Speicherbedarf der Spalten-Arrays in Bytes (ohne Kategorien)."""
+        return sum(getattr(self, name).nbytes for name in
+                   self.ZAHLEN + ("bodenart_codes", "hz_codes", "offsets")) + sum(
+            unten.nbytes + oben.nbytes for unten, oben in self.bereiche.values()
+        )
+
+    def bohrung(self, i):
+        """Sicht auf die i-te Bohrung; die Arrays teilen den Speicher."""
+        a, b = self.offsets[i], self.offsets[i + 1]
+        t = object.__new__(type(self))
+        t.ids = self.ids[i:i + 1]
+        t.offsets = np.array([0, b - a])
+        for name in self.ZAHLEN + ("bodenart_codes", "hz_codes"):
+            setattr(t, name, getattr(self, name)[a:b])
+        t.bodenart_kategorien = self.bodenart_kategorien
+        t.hz_kategorien = self.hz_kategorien
+        t.bereiche = {name: (unten[a:b], oben[a:b]) for name, (unten, oben) in self.bereiche.items()}
+        t._sortierung = None
+        return t
+
+    def profile(self):
+        """Liefert je Bohrung ein Paar (bohrung_id, Sicht)."""
+        for i in range(self.anzahl_bohrungen):
+            yield self.ids[i], self.bohrung(i)
+
+    def einzelprofil(self):
+        """Die Tabelle selbst, wenn sie genau eine Bohrung enthält."""
+        if self.anzahl_bohrungen != 1:
+            raise ValueError(
+                f"Tabelle enthält {self.anzahl_bohrungen} Bohrungen; "
+                f"bitte einzeln über bohrung(i) oder profile() auswerten."
+            )
+        return self
+
+    def sortierung(self):
+        """Indizes nach Bohrung und z_top (stabil, NaN-Tiefen ans Ende)."""
+        if self._sortierung is None:
+            gruppe = np.repeat(np.arange(self.anzahl_bohrungen), self.laengen)
+            self._sortierung = np.lexsort((self.z_top, gruppe))
+        return self._sortierung
+
+    def ist_gr(self):
+        """True für Horizonte, deren Bezeichnung 'gr' enthält (ohne Groß-/Kleinschreibung)."""
+        treffer = [isinstance(h, str) and "gr" in h.lower() for h in self.hz_kategorien]
+        return np.array(treffer + [False], dtype=bool)[self.hz_codes]
+
+    def nfk_codes(self):
+        """Bodenart-Codes für die nFK-Matrix (-1 für unbekannte Bodenarten)."""
+        return np.where(self.bodenart_codes < len(_BODENARTEN), self.bodenart_codes, -1)
+
+    def fingerabdruecke(self, *parameter):
+        """
+        SHA-256 (hex) je Bohrung über ID, Horizontwerte und parameter.
+        Jeder Parameter ist ein Wert für alle Bohrungen oder eine pd.Series,
+        ein Array bzw. eine Liste mit einem Wert je Bohrung.
+        """
+        zahlen = np.column_stack([getattr(self, name) for name in self.ZAHLEN]).astype("<f8")
+        texte = [repr(t) for t in zip(self.hz.tolist(), self.bodenart.tolist())]
+        parameter = [
+            [float(w) if isinstance(w, (int, float, np.number)) else str(w) for w in (
+                p.reindex(self.ids) if isinstance(p, pd.Series)
+                else p if isinstance(p, (np.ndarray, list))
+                else [p] * self.anzahl_bohrungen
+            )]
+            for p in parameter
+        ]
+        schluessel = []
+        for i, (a, b) in enumerate(zip(self.offsets[:-1], self.offsets[1:])):
+            h = hashlib.sha256(repr((str(self.ids[i]),) + tuple(p[i] for p in parameter)).encode())
+            h.update(zahlen[a:b].tobytes())
+            h.update("\n".join(texte[a:b]).encode())
+            schluessel.append(h.hexdigest())
+        return schluessel
+
+    def to_frame(self, mit_id=False):
+        """Als DataFrame wie build_horizonte_frame(), optional mit Spalte "bohrung"."""
+        frame = pd.DataFrame({
+            "hz":       self.hz,
+            "z_top":    self.z_top,
+            "z_bot":    self.z_bot,
+            "bd":       self.bd,
+            "humus":    self.humus,
+            "pH":       self.pH,
+            "Bodenart": self.bodenart,
+            "skelett":  self.skelett,
+        })
+        for name, (unten, oben) in self.bereiche.items():
+            frame[f"{name}_min"], frame[f"{name}_max"] = unten, oben
+        if mit_id:
+            frame.insert(0, "bohrung", np.repeat(self.ids, self.laengen))
+        return frame
+
+    def to_list(self):
+        """Als Horizont-Liste wie build_horizonte_list() (ohne Grenzen)."""
+        spalten = ["hz", "z_top", "z_bot", "bd", "humus", "pH", "Bodenart", "skelett"]
+        return self.to_frame()[spalten].to_dict("records")
+
+
+def build_horizonte_tabelle(df, id_spalte=None, bereiche=False):
+    """Wie build_horizonte_frame(), liefert aber direkt eine HorizontTabelle."""
+    frame = build_horizonte_frame(df, id_spalte=id_spalte, bereiche=bereiche)
+    return HorizontTabelle.aus_frame(frame, "bohrung" if id_spalte is not None else None)
+
+
+# ——————————————————————————————————————————
+# Kompakte Spaltentypen für große Horizont-Tabellen
+# ——————————————————————————————————————————
+# Feste Kategorien je Spalte (weitere Werte der Daten werden angehängt)
+_KOMPAKT_KATEGORIEN = {
+    "Bodenart":  _BODENARTEN,
+    "hz":        (),
+    "humus_kat": list(dict.fromkeys([*_HUMUS_KAT_ACKER, *_HUMUS_KAT_GRUEN])),
+}
+_KOMPAKT_TIEFEN = ("z_top", "z_bot")
+# Eintrag in DataFrame.attrs, an dem HorizontTabelle.aus_frame() kompakte Frames erkennt
+KOMPAKT_MARKE = "kompakt"
+
+def _tiefe_kompakt(werte):
+    """int16, wenn alle Tiefen ganzzahlig und gefüllt sind, sonst float32, falls verlustfrei."""
+    x = _float_array(werte)
+    grenze = np.iinfo(np.int16).max
+    if np.isfinite(x).all() and (x == np.round(x)).all() and (np.abs(x) <= grenze).all():
+        return x.astype(np.int16)
+    x32 = x.astype(np.float32)
+    return x32 if np.array_equal(x32.astype(np.float64), x, equal_nan=True) else x
+
+def _aus_kompakt(werte):
+    """
+    Zahlen-Spalte aus kompakt_frame() → float64. float32 wird auf 6
+    signifikante Stellen gerundet, so dass z. B. 7.3 wieder genau 7.3
+    ergibt und nicht 7.3000002.
+    """
+    werte = pd.Series(werte)
+    if werte.dtype != np.float32:
+        return _float_array(werte)
+    x = werte.to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stellen = 5 - np.floor(np.log10(np.abs(x)))
+    endlich = np.isfinite(stellen)
+    skala = 10.0 ** np.where(endlich, stellen, 0.0)
+    return np.where(endlich, np.round(x * skala) / skala, x)
+
+def kompakt_frame(horizonte):
+    """
+    Horizont-DataFrame mit sparsamen Spaltentypen für große Datenmengen:
+    Bodenart, hz und humus_kat (falls vorhanden) als Categorical, die
+    Bodenart mit den Codes aus _BODENARTEN (wie bodenart_codes()); z_top
+    und z_bot verlustfrei als int16 bzw. float32; bd, humus, pH, skelett
+    und ihre Bereichsgrenzen als float32.
+    Der Frame ist in attrs[KOMPAKT_MARKE] markiert; HorizontTabelle.aus_frame()
+    (und damit alle Batch-Auswertungen) rundet float32 dann auf 6
+    signifikante Stellen zurück. Die Marke geht bei Auswahl und Kopie mit,
+    bei pd.concat nur, wenn alle Teile markiert sind. Toleranz gegenüber float64: Eingaben
+    weichen um höchstens 5e-6 relativ ab (Werte mit bis zu 6 Stellen gar
+    nicht), Humusvorrat und nFK um Rundungsfehler (< 1e-12 relativ). Nur
+    Tabellen-Nachschläge direkt an einer Klassengrenze können abweichen,
+    z. B. ergibt die Bereichsmitte von "5,1-5,3" in float64 5.199999999999999,
+    hier aber 5.2.
+    """
+    frame = horizonte.copy(deep=False)
+    for name, feste in _KOMPAKT_KATEGORIEN.items():
+        if name in frame:
+            codes, kategorien = _kategorisch(frame[name].to_numpy(dtype=object), feste)
+            frame[name] = pd.Categorical.from_codes(codes, categories=pd.Index(kategorien, dtype=object))
+    for name in frame.columns:
+        if name in _KOMPAKT_TIEFEN:
+            frame[name] = _tiefe_kompakt(frame[name])
+        elif name in HorizontTabelle.ZAHLEN or name.endswith(("_min", "_max")):
+            frame[name] = _float_array(frame[name]).astype(np.float32)
+    frame.attrs[KOMPAKT_MARKE] = True
+    return frame
+
+def speicherbericht(vorher, nachher):
+    """
+    Speicherbedarf je Spalte vor und nach kompakt_frame() (Bytes inklusive
+    der Strings in object-Spalten), letzte Zeile "gesamt".
+    """
+    bytes_vorher = vorher.memory_usage(index=False, deep=True)
+    bytes_nachher = nachher.memory_usage(index=False, deep=True).reindex(bytes_vorher.index)
+    bericht = pd.DataFrame({
+        "Typ vorher":    vorher.dtypes.astype(str),
+        "Bytes vorher":  bytes_vorher,
+        "Typ nachher":   nachher.dtypes.reindex(bytes_vorher.index).astype(str),
+        "Bytes nachher": bytes_nachher,
+    })
+    bericht.loc["gesamt"] = ["", bytes_vorher.sum(), "", bytes_nachher.sum()]
+    bericht["Anteil"] = (bericht["Bytes nachher"] / bericht["Bytes vorher"]).round(3)
+    return bericht
+
+
+# ——————————————————————————————————————————
+# Tiefenindex: Humusvorrat und nFK bis zu beliebigen Tiefen
+# ——————————————————————————————————————————
+class _Kumuliert:
+    """
+    Summe stückweise linearer Beiträge r · clamp(T − a, 0, L) je Bohrung.
+    Jeder Horizont ergibt die Knicke (a, +r) und (a + L, −r); x enthält die
+    Knicke je Bohrung sortiert, w und wx die Präfixsummen von ±r und ±r·x
+    innerhalb der Bohrung. Mit dem letzten Knick x ≤ T ist die Summe
+    T·w − wx, also linear interpoliert im angeschnittenen Horizont.
+    nan_ab: Tiefe je Bohrung, ab der ein NaN-Beitrag mitzählt (sonst inf).
+    """
+    __slots__ = ("offsets", "x", "w", "wx", "nan_ab")
+
+    def __init__(self, a, laenge, r, gruppe, anzahl):
+        gueltig = ~np.isnan(a) & (laenge > 0)
+        nan_r = gueltig & np.isnan(r)
+        self.nan_ab = np.full(anzahl, np.inf)
+        np.minimum.at(self.nan_ab, gruppe[nan_r], a[nan_r])
+
+        ok = gueltig & ~nan_r
+        a, laenge, r, gruppe = a[ok], laenge[ok], r[ok], gruppe[ok]
+        # unbegrenzte Horizonte haben keinen zweiten Knick
+        ende = np.isfinite(laenge)
+        x = np.concatenate([a, (a + laenge)[ende]])
+        dr = np.concatenate([r, -r[ende]])
+        g = np.concatenate([gruppe, gruppe[ende]])
+
+        order = np.lexsort((x, g))
+        self.x, dr, g = x[order], dr[order], g[order]
+        laengen = np.bincount(g, minlength=anzahl)
+        self.offsets = np.r_[0, np.cumsum(laengen)]
+
+        # Präfixsummen je Bohrung: Rang für Rang, jeweils für alle Bohrungen zugleich
+        self.w, self.wx = dr.copy(), dr * self.x
+        rang = np.arange(len(self.x)) - np.repeat(self.offsets[:-1], laengen)
+        je_rang = np.argsort(rang, kind="stable")
+        grenzen = np.searchsorted(rang[je_rang], np.arange(1, laengen.max(initial=0) + 1))
+        for von, bis in zip(grenzen[:-1], grenzen[1:]):
+            i = je_rang[von:bis]
+            self.w[i] += self.w[i - 1]
+            self.wx[i] += self.wx[i - 1]
+
+    def werte(self, bohrung, tiefe):
+        """Summe je Paar (bohrung, tiefe) per binärer Suche, O(log n) je Abfrage."""
+        erster = self.offsets[bohrung]
+        lo, hi = erster.copy(), self.offsets[bohrung + 1].copy()
+        x = np.r_[self.x, np.inf]
+        while (offen := lo < hi).any():
+            mitte = (lo + hi) // 2
+            rechts = offen & (x[mitte] <= tiefe)
+            lo = np.where(rechts, mitte + 1, lo)
+            hi = np.where(offen & ~rechts, mitte, hi)
+        # lo − 1 ist der letzte Knick ≤ tiefe
+        k = np.maximum(lo - 1, 0)
+        summe = np.where(lo > erster, tiefe * np.r_[self.w, 0.0][k] - np.r_[self.wx, 0.0][k], 0.0)
+        return np.where(tiefe > self.nan_ab[bohrung], np.nan, summe)
+
+
+class Tiefenindex:
+    """
+    Kumulierter Tiefenindex je Bohrung, einmal aus einer HorizontTabelle
+    aufgebaut. humusvorrat(T) und nfk(T) liefern für beliebige Tiefen
+    dieselben Summen wie humusvorrat(max_tiefe=T) bzw. gesamt_nfk(phyto_tiefe=T),
+    ohne das Profil je Tiefe neu zu beschneiden. Unbekannte Bodenarten
+    ergeben wie in auswertung_batch() NaN statt KeyError.
+    """
+    __slots__ = ("ids", "_humus", "_nfk")
+
+    def __init__(self, horizonte):
+        t = horizonte if isinstance(horizonte, HorizontTabelle) else HorizontTabelle.aus_liste(horizonte)
+        self.ids = t.ids
+        order = t.sortierung()
+        anzahl = t.anzahl_bohrungen
+        gruppe = np.repeat(np.arange(anzahl), t.laengen)
+        z_top, z_bot = t.z_top[order], t.z_bot[order]
+        dicke = np.where(np.isnan(z_bot), np.inf, z_bot - z_top)
+
+        # Humus in kg/m² je cm; der unterste Horizont reicht immer bis zur Tiefe
+        r_humus = t.humus[order] / 100 * t.bd[order] * 10
+        r_humus[np.isnan(r_humus)] = 0.0
+        dicke_humus = dicke.copy()
+        dicke_humus[t.offsets[1:] - 1] = np.inf
+        self._humus = _Kumuliert(z_top, dicke_humus, r_humus, gruppe, anzahl)
+
+        # nFK in mm je cm
+        wert, _ = _nfk_wert(t.bd[order], t.humus[order], t.skelett[order], t.nfk_codes()[order])
+        self._nfk = _Kumuliert(z_top, dicke, wert / 100 * 10, gruppe, anzahl)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _abfrage(self, summen, tiefen):
+        """Skalar → ein Wert je Bohrung, Folge von Tiefen → Matrix (Bohrung × Tiefe)."""
+        tiefen = np.asarray(tiefen, dtype=float)
+        bohrung = np.arange(len(self.ids))[:, None]
+        werte = summen.werte(
+            np.broadcast_to(bohrung, (len(self.ids), tiefen.size)).ravel(),
+            np.broadcast_to(tiefen.ravel(), (len(self.ids), tiefen.size)).ravel(),
+        ).reshape(len(self.ids), tiefen.size)
+        return werte[:, 0] if tiefen.ndim == 0 else werte
+
+    def humusvorrat(self, tiefen=100):
+        """Humusvorrat in kg/m² bis zu den Tiefen (cm)."""
+        return self._abfrage(self._humus, tiefen)
+
+    def nfk(self, tiefen=100):
+        """nFK in mm bis zu den Tiefen (cm)."""
+        return self._abfrage(self._nfk, tiefen)
+
+    def als_frame(self, humus_tiefen=(30, 60, 100), nfk_tiefen=(), id_spalte="bohrung"):
+        """Tabelle mit einer Zeile je Bohrung und einer Spalte je Tiefe."""
+        frame = pd.DataFrame({id_spalte: self.ids})
+        for tiefe, werte in zip(humus_tiefen, self.humusvorrat(humus_tiefen).T):
+            frame[f"humusvorrat_Mg_ha_{tiefe:g}"] = werte * 10
+        for tiefe, werte in zip(nfk_tiefen, self.nfk(nfk_tiefen).T):
+            frame[f"nfk_mm_{tiefe:g}"] = werte
+        return frame
+
+
+
+
+_KAP_TABLE = pd.DataFrame([
+    ["X",           "",   "",    "",   "",   "",    "",    "",    "",    "",    "",    ""],
+    ["Sl2, Sl3, Sl4", ">5", ">5", "3", "1,5","1", "0,4",  "0,2",  "0,1",  "",     "",    ""],
+    ["Su",          ">5", "5",   "3", "2",  "1,2","0,6",  "0,2",  "0,1",  "",     "",    ""],
+    ["Ls2, Ls3, Ls4",">5", ">5", "2,3","1,4","1,1","0,5",  "0,3",  "0,1",  "",     "",    ""],
+    ["Lu",          ">5", ">5", ">5", "5",  "3",  "1,5",  "0,8",  "0,4",  "0,2",  "",    ""],
+    ["Ut2, Ut3, Ut4",">5",">5", ">5", ">5", ">5", "4,5",  "3,5",  "2,3",  "1,5", "1,0","0,6"],
+    ["Lts, Lt2, Lt3","5", "2,8", "1,4","0,9","0,5","0,3",  "0,1",  "",     "",    "",    ""],
+    ["Tu3, Tu4",    ">5","5",   "3,6","2,5","1,7","0,6",  "0,4",  "0,1",  "0,1", "",    ""],
+    ["Tu2, Tl, Tt", "5", "3",   "1,3","0,5","0,3","0,2",  "0,1",  "",     "",    "",    ""],
+], columns=["Bodenart","2","3","4","5","6","8","10","12","14","17","20"])
+
+# — Spaltenbreiten in dm für die Suche —
+_KAP_DMS = [2,3,4,5,6,8,10,12,14,17,20]
+def kapillaraufstiegsrate(horizonte: "list[dict] | HorizontTabelle", physiogr: float,
+                          rechenweg: bool = False):
+    """
+    Kapillare Aufstiegsrate (mm/d) aus dem ersten Gr-Horizont oder None.
+    Mit rechenweg=True wird (rate, DataFrame) zurückgegeben; das DataFrame
+    hat eine Zeile je ausgewertetem Gr-Horizont (ohne Gr-Horizont keine).
+    """
+    ohne = (None, _kap_rechenweg([], [], [], physiogr, [], [])) if rechenweg else None
+     # 1) Gr-Horizont finden (case-insensitive)
+    if isinstance(horizonte, HorizontTabelle):
+        t = horizonte.einzelprofil()
+        gr = np.flatnonzero(t.ist_gr())
+        if not len(gr):
+            return ohne
+        hz, start_cm, bodenart = t.hz[gr[0]], t.z_top[gr[0]], t.bodenart[gr[0]]
+    else:
+        gr_horizont = next(
+            (h for h in horizonte if isinstance(h.get("hz"), str) and "gr" in h["hz"].lower()),
+            None
+        )
+        if gr_horizont is None:
+            return ohne
+
+        start_cm = gr_horizont.get("z_top")
+        if start_cm is None:
+            return ohne
+        hz, bodenart = gr_horizont["hz"], gr_horizont.get("Bodenart", "")
+
+    # 2) – 5) Abstand, Spalte und Tabellenwert im Batch-Kern
+    gr_top = np.array([start_cm], dtype=float)
+    rate, untergrenze = _kap_kern(
+        gr_top, np.array([str(bodenart)], dtype=object), physiogr, strikt=True
+    )
+    # '>'-Werte sind keine verwertbare Rate
+    ergebnis = None if untergrenze[0] or np.isnan(rate[0]) else float(rate[0])
+    if rechenweg:
+        return ergebnis, _kap_rechenweg([hz], gr_top, [bodenart], physiogr, rate, untergrenze)
+    return ergebnis
+
+def _kap_rechenweg(hz, gr_top, gr_bodenart, physiogr, rate, untergrenze):
+    """Rechenweg der Aufstiegsrate, eine Zeile je Gr-Horizont (Werte aus _kap_kern())."""
+    gr_top = np.asarray(gr_top, dtype=float)
+    phyto = np.broadcast_to(np.asarray(physiogr, dtype=float), gr_top.shape)
+    abstand = gr_top - phyto
+    rate = np.asarray(rate, dtype=float)
+    return pd.DataFrame({
+        "hz":                  np.asarray(hz, dtype=object),
+        "gr_z_top":            gr_top,
+        "gr_Bodenart":         np.asarray(gr_bodenart, dtype=object),
+        "phyto_tiefe":         phyto,
+        "abstand_cm":          abstand,
+        "tabellen_abstand_dm": np.where(abstand > 0, _KAP_ABSTAENDE[_kap_spalte(abstand / 10)], np.nan),
+        "kap_rate":            rate,
+        "untergrenze":         np.asarray(untergrenze, dtype=bool),
+        "aufstieg_20d_mm":     rate * 20,
+    })
+
+
+def kapillaraufstiegsrate_batch(gr_top, gr_bodenart, physiogr):
+    """
+    Kapillar-Aufstiegsrate für viele Bohrungen auf einmal.
+    gr_top: Oberkante des Gr-Horizonts je Bohrung (cm)
+    gr_bodenart: Bodenart des Gr-Horizonts je Bohrung
+    physiogr: Skalar oder ein Wert je Bohrung
+    Gibt (rate in mm/d, untergrenze) zurück; untergrenze ist True, wo der
+    Tabellenwert ein '>x' ist (rate = x). Ohne Tabellenwert ist rate NaN.
+    """
+    gr_bodenart = pd.Series(gr_bodenart, dtype=object).astype(str).to_numpy(dtype=object)
+    return _kap_kern(np.asarray(gr_top, dtype=float), gr_bodenart, physiogr)
+
+
+@functools.lru_cache(maxsize=1024)
+def _kap_zeile_suchen(key):
+    """
+    Index der ersten _KAP_TABLE-Zeile, deren Bodenart-Feld den Schlüssel
+    (Regex) enthält, oder -1.
+    """
+    for i, feld in enumerate(_KAP_TABLE["Bodenart"].str.lower()):
+        if re.search(key, feld):
+            return i
+    return -1
+
+def _kap_zeile(bodenart):
+    """Tabellenzeile zum ersten Wort von bodenart; direkt aus _KAP_ZEILEN, wenn möglich."""
+    key = bodenart.split()[0].lower()
+    zeile = _KAP_ZEILEN.get(key)
+    return _kap_zeile_suchen(key) if zeile is None else zeile
+
+def _kap_feld(val):
+    """Tabellenfeld → (Wert, Untergrenze); leere Felder ergeben (NaN, False)."""
+    if not isinstance(val, str) or not val.strip():
+        return np.nan, False
+    val = val.strip()
+    untergrenze = val.startswith(">")
+    try:
+        return float(val.lstrip(">").replace(",", ".")), untergrenze
+    except ValueError:
+        return np.nan, False
+
+# — Tabelle einmal beim Import kompilieren —
+# Werte als float-Matrix (Zeile × Abstandsspalte), '>x'-Felder als x mit
+# gesetztem Untergrenzen-Flag, und jede einzelne Bodenart → Tabellenzeile
+_KAP_FELDER = [[_kap_feld(v) for v in zeile] for zeile in _KAP_TABLE[[str(dm) for dm in _KAP_DMS]].to_numpy()]
+_KAP_WERTE = np.array([[w for w, _ in zeile] for zeile in _KAP_FELDER], dtype=float)
+_KAP_UNTERGRENZE = np.array([[u for _, u in zeile] for zeile in _KAP_FELDER], dtype=bool)
+_KAP_ABSTAENDE = np.array(_KAP_DMS, dtype=float)
+_KAP_ZEILEN = {}
+_KAP_ZEILEN.update(
+    (art.strip().lower(), _kap_zeile_suchen(art.strip().lower()))
+    for feld in _KAP_TABLE["Bodenart"] for art in feld.split(",")
+)
+
+def _kap_spalte(dist_dm):
+    """Index der nächstgelegenen Abstandsspalte (bei Gleichstand die kleinere, NaN → 0)."""
+    i = np.searchsorted(_KAP_ABSTAENDE, dist_dm, side="left")
+    i = np.clip(i, 1, len(_KAP_ABSTAENDE) - 1)
+    links = dist_dm - _KAP_ABSTAENDE[i - 1] <= _KAP_ABSTAENDE[i] - dist_dm
+    spalte = np.where(links, i - 1, i)
+    return np.where(np.isnan(dist_dm), 0, spalte)
+
+def _kap_kern(gr_top, gr_bodenart, physiogr, strikt=False):
+    """
+    Vektorisierter Kern von kapillaraufstiegsrate() für viele Bohrungen.
+    gr_top: Oberkante des Gr-Horizonts je Bohrung (NaN ergibt wie im
+    Einzelfall die erste Spalte), gr_bodenart: dessen Bodenart als str.
+    Gibt (rate, untergrenze) zurück; ohne Tabellenwert ist rate NaN.
+    Leere Bodenarten lösen mit strikt=True wie bisher einen IndexError aus.
+    """
+    n = len(gr_top)
+    dist_cm = gr_top - np.broadcast_to(np.asarray(physiogr, dtype=float), (n,))
+    rate = np.full(n, np.nan)
+    untergrenze = np.zeros(n, dtype=bool)
+
+    # Gr-Horizont in oder oberhalb der physiologischen Tiefe → 5 mm/d
+    nah = dist_cm <= 0
+    rate[nah] = 5.0
+
+    # Abstand in dm und nächste Spalte
+    spalte = _kap_spalte(dist_cm / 10)
+
+    # Tabellenzeile je verschiedener Bodenart
+    fern = np.flatnonzero(~nah)
+    codes, arten = pd.factorize(pd.Series(gr_bodenart[fern], dtype=object))
+    zeilen = np.empty(len(arten) + 1, dtype=int)
+    zeilen[-1] = -1
+    for k, art in enumerate(arten):
+        try:
+            zeilen[k] = _kap_zeile(art)
+        except IndexError:
+            if strikt:
+                raise
+            zeilen[k] = -1
+
+    zeile = zeilen[codes]
+    ok = zeile >= 0
+    rate[fern[ok]] = _KAP_WERTE[zeile[ok], spalte[fern[ok]]]
+    untergrenze[fern[ok]] = _KAP_UNTERGRENZE[zeile[ok], spalte[fern[ok]]]
+    return rate, untergrenze
+
+
+# ——————————————————————————————————————————
+# Referenztabellen
+# ——————————————————————————————————————————
+class Referenztabellen(NamedTuple):
+    df_acker: pd.DataFrame
+    df_gruen: pd.DataFrame
+    df_full: pd.DataFrame
+    kap_tabelle: pd.DataFrame
+    bodentyp_to_bg: dict
+    kalk_index: dict
+    # SHA-256 über den Inhalt der CSVs, für dauerhafte Schlüssel (fingerabdruecke)
+    inhalts_hash: str
+
+_REFERENZ_VERZEICHNIS = os.path.dirname(os.path.abspath(__file__))
+_REFERENZ_DATEIEN = ("kalkbedarf_acker.csv", "kalkbedarf_gruen.csv")
+_REFERENZ_CACHE = {}
+_REFERENZ_LOCK = threading.Lock()
+
+def referenz_signatur(verzeichnis=None):
+    """
+    Änderungsmerkmal (mtime, Größe) der Kalkbedarf-CSVs. Ändert sich eine
+    Datei, ändert sich die Signatur und die Tabellen werden neu geladen.
+    Nur zum Erkennen von Änderungen; für gespeicherte Schlüssel den
+    inhaltsbasierten Referenztabellen.inhalts_hash verwenden.
+    """
+    verzeichnis = verzeichnis or _REFERENZ_VERZEICHNIS
+    signatur = []
+    for name in _REFERENZ_DATEIEN:
+        st = os.stat(os.path.join(verzeichnis, name))
+        signatur.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(signatur)
+
+def lade_referenztabellen(verzeichnis=None):
+    """
+    Lädt die Kalkbedarf-Tabellen aus verzeichnis (Standard: neben diesem
+    Modul) und bündelt sie mit df_full, _KAP_TABLE, bodentyp_to_bg und dem
+    kompilierten Kalk-Index. Das Ergebnis wird je Prozess zwischengespeichert
+    und nur neu geladen, wenn sich mtime oder Größe einer CSV ändert.
+    Die zurückgegebenen Tabellen dürfen nicht verändert werden.
+    """
+    verzeichnis = os.path.abspath(verzeichnis or _REFERENZ_VERZEICHNIS)
+    signatur = referenz_signatur(verzeichnis)
+    with _REFERENZ_LOCK:
+        treffer = _REFERENZ_CACHE.get(verzeichnis)
+        if treffer is not None and treffer[0] == signatur:
+            return treffer[1]
+
+        inhalt = hashlib.sha256()
+        for name in _REFERENZ_DATEIEN:
+            with open(os.path.join(verzeichnis, name), "rb") as f:
+                inhalt.update(f"{name}\n".encode() + f.read())
+        df_acker, df_gruen = (
+            pd.read_csv(os.path.join(verzeichnis, name)) for name in _REFERENZ_DATEIEN
+        )
+        tabellen = Referenztabellen(
+            df_acker=df_acker,
+            df_gruen=df_gruen,
+            df_full=df_full,
+            kap_tabelle=_KAP_TABLE,
+            bodentyp_to_bg=bodentyp_to_bg,
+            kalk_index=kalk_index(df_acker, df_gruen),
+            inhalts_hash=inhalt.hexdigest(),
+        )
+        _REFERENZ_CACHE[verzeichnis] = (signatur, tabellen)
+        return tabellen
+
+
+# ——————————————————————————————————————————
+# Batch-Auswertung vieler Bohrungen
+# ——————————————————————————————————————————
+def _je_bohrung(wert, ids):
+    """Skalar oder pd.Series (Index = Bohrungs-ID) auf ein Array je Bohrung bringen."""
+    if isinstance(wert, pd.Series):
+        return wert.reindex(ids).to_numpy()
+    return np.full(len(ids), wert, dtype=object)
+
+
+def auswertung_batch(horizonte, df_acker, df_gruen, nutzungsart="acker",
+                     phyto_tiefe=100, max_tiefe=100, id_spalte="bohrung"):
+    """
+    Wertet viele Bohrungen in einem Durchgang aus.
+    horizonte:   HorizontTabelle oder langes DataFrame, eine Zeile je Horizont
+                 mit den Spalten aus build_horizonte_list() und der
+                 Bohrungs-ID in id_spalte
+    nutzungsart, phyto_tiefe: Skalar oder pd.Series mit der Bohrungs-ID als Index
+    df_acker, df_gruen: die DataFrames aus den Kalkbedarf-CSVs
+    Gibt ein DataFrame mit einer Ergebniszeile je Bohrung zurück
+    (Reihenfolge wie das erste Auftreten in horizonte).
+    """
+    t = horizonte
+    if not isinstance(t, HorizontTabelle):
+        t = HorizontTabelle.aus_frame(horizonte, id_spalte)
+    ids = t.ids
+
+    # Nach Bohrung und z_top sortieren (stabil, NaN-Tiefen ans Ende)
+    order = t.sortierung()
+    starts = t.starts
+
+    def spalte(name):
+        return getattr(t, name)[order]
+
+    z_top_s = spalte("z_top")
+    phyto = _je_bohrung(phyto_tiefe, ids).astype(float)
+    nutzung = _je_bohrung(nutzungsart, ids)
+
+    # (1) Humusvorrat bis max_tiefe
+    with stufe("humus", horizonte=len(z_top_s), bohrungen=len(ids)):
+        _, humus_kg_m2 = _humus_kern(
+            z_top_s, spalte("z_bot"), spalte("bd"), spalte("humus"), starts, max_tiefe
+        )
+
+    # (2) nFK bis zur physiologischen Gründigkeit
+    with stufe("nfk", horizonte=len(z_top_s), bohrungen=len(ids)):
+        _, nfk_mm = _nfk_kern(
+            z_top_s, spalte("z_bot"), spalte("bd"), spalte("humus"),
+            spalte("skelett"), t.nfk_codes()[order], starts, phyto
+        )
+
+    # (3) Kalkbedarf aus dem obersten Horizont
+    with stufe("kalk", bohrungen=len(ids)):
+        bodenart_ob = (
+            pd.Series(_dekodieren(t.bodenart_codes[order[starts]], t.bodenart_kategorien), dtype=object).str.strip().fillna("").to_numpy(dtype=object)
+        )
+        bg = np.array([bodentyp_to_bg.get(b) for b in bodenart_ob], dtype=object)
+        ph_ob = spalte("pH")[starts]
+        humus_ob = spalte("humus")[starts]
+        kalk, status = kalkbedarf_bulk(bg, ph_ob, humus_ob, nutzung, df_acker, df_gruen)
+        meldungen = np.full(len(ids), None, dtype=object)
+        meldungen[status == KALK_KEIN_PH] = "Kein pH-Wert im Oberboden angegeben."
+        kat = _humuskategorien(humus_ob, _ist_gruenland(nutzung))
+        for i in np.flatnonzero(status == KALK_KEIN_TREFFER):
+            meldungen[i] = f"Kein Kalkbedarf für bg={bg[i]}, Humus={kat[i]}, pH={ph_ob[i]} gefunden."
+        # Unbekannte Bodenart geht wie in der Einzelauswertung allen anderen Gründen vor
+        for i in np.flatnonzero(pd.isna(bg)):
+            meldungen[i] = f"Unbekannter Bodentyp '{bodenart_ob[i]}'."
+
+    # (4) Kapillar-Aufstiegsrate aus dem ersten Gr-Horizont (Eingabereihenfolge)
+    with stufe("kapillar", horizonte=len(z_top_s), bohrungen=len(ids)):
+        gr_pos = np.flatnonzero(t.ist_gr())
+        gr_bohrung, gr_erste = np.unique(
+            np.searchsorted(t.offsets, gr_pos, side="right") - 1, return_index=True
+        )
+        gr_erste = gr_pos[gr_erste]
+        kap = np.full(len(ids), np.nan)
+        kap_untergrenze = np.zeros(len(ids), dtype=bool)
+        if len(gr_erste):
+            gr_bod = pd.Series(_dekodieren(t.bodenart_codes[gr_erste], t.bodenart_kategorien), dtype=object)
+            kap[gr_bohrung], kap_untergrenze[gr_bohrung] = _kap_kern(
+                t.z_top[gr_erste], gr_bod.astype(str).to_numpy(dtype=object), phyto[gr_bohrung]
+            )
+
+    return pd.DataFrame({
+        id_spalte:            ids,
+        "nutzungsart":        nutzung,
+        "phyto_tiefe":        phyto,
+        "bodenart_ob":        bodenart_ob,
+        "bg":                 bg,
+        "pH_ob":              ph_ob,
+        "humus_ob":           humus_ob,
+        "humusvorrat_kg_m2":  humus_kg_m2,
+        "humusvorrat_Mg_ha":  humus_kg_m2 * 10,
+        "nfk_mm":             nfk_mm,
+        "kalkbedarf":         kalk,
+        "kalk_meldung":       meldungen,
+        "kap_rate":           np.where(kap_untergrenze, np.nan, kap),
+        "kap_rate_groesser":  np.where(kap_untergrenze, kap, np.nan),
+    })
+
+
+def rechenweg_batch(horizonte, phyto_tiefe=100, max_tiefe=100, id_spalte="bohrung"):
+    """
+    Zwischenschritte von auswertung_batch() als Tabellen für den Export:
+    "humus" und "nfk" mit einer Zeile je Horizont (nach Bohrung und z_top
+    sortiert), "kapillar" mit einer Zeile je Bohrung (erster Gr-Horizont).
+    Parameter wie auswertung_batch().
+    """
+    t = horizonte
+    if not isinstance(t, HorizontTabelle):
+        t = HorizontTabelle.aus_frame(horizonte, id_spalte)
+    ids = t.ids
+    order = t.sortierung()
+    starts = t.starts
+    phyto = _je_bohrung(phyto_tiefe, ids).astype(float)
+
+    def spalte(name):
+        return getattr(t, name)[order]
+
+    kopf = {
+        id_spalte: np.repeat(ids, t.laengen),
+        "hz":      _dekodieren(t.hz_codes[order], t.hz_kategorien),
+        "z_top":   spalte("z_top"),
+        "z_bot":   spalte("z_bot"),
+    }
+
+    humus_spalten, _ = _humus_kern(
+        kopf["z_top"], kopf["z_bot"], spalte("bd"), spalte("humus"), starts, max_tiefe
+    )
+    humus = pd.DataFrame({**kopf, "bd": spalte("bd"), "humus": spalte("humus"), **humus_spalten})
+
+    codes = t.nfk_codes()[order]
+    nfk_spalten = (kopf["z_top"], kopf["z_bot"], spalte("bd"), spalte("humus"), spalte("skelett"), codes)
+    beitrag, _ = _nfk_kern(*nfk_spalten, starts, phyto)
+    nfk = pd.DataFrame({
+        **kopf,
+        "Bodenart": _dekodieren(t.bodenart_codes[order], t.bodenart_kategorien),
+        **_nfk_rechenweg(*nfk_spalten, starts, phyto, beitrag),
+    })
+
+    # Kapillaraufstieg wie in auswertung_batch(): erster Gr-Horizont je Bohrung
+    gr_pos = np.flatnonzero(t.ist_gr())
+    gr_bohrung, gr_erste = np.unique(
+        np.searchsorted(t.offsets, gr_pos, side="right") - 1, return_index=True
+    )
+    gr_erste = gr_pos[gr_erste]
+    gr_hz = np.full(len(ids), None, dtype=object)
+    gr_hz[gr_bohrung] = _dekodieren(t.hz_codes[gr_erste], t.hz_kategorien)
+    gr_top = np.full(len(ids), np.nan)
+    gr_top[gr_bohrung] = t.z_top[gr_erste]
+    gr_bod = np.full(len(ids), None, dtype=object)
+    gr_bod[gr_bohrung] = _dekodieren(t.bodenart_codes[gr_erste], t.bodenart_kategorien)
+    rate = np.full(len(ids), np.nan)
+    untergrenze = np.zeros(len(ids), dtype=bool)
+    if len(gr_erste):
+        rate[gr_bohrung], untergrenze[gr_bohrung] = _kap_kern(
+            gr_top[gr_bohrung], pd.Series(gr_bod[gr_bohrung], dtype=object).astype(str).to_numpy(dtype=object),
+            phyto[gr_bohrung]
+        )
+    kapillar = _kap_rechenweg(gr_hz, gr_top, gr_bod, phyto, rate, untergrenze)
+    kapillar.insert(0, id_spalte, ids)
+    return {"humus": humus, "nfk": nfk, "kapillar": kapillar}
+
+
+def _kalk_stichproben(bg, acker, gruen, pH, humus, df_acker, df_gruen):
+    """
+    Kalkbedarf für Stichproben-Matrizen pH, humus (Stichprobe × Bohrung);
+    bg, acker, gruen gelten je Bohrung. Ohne Treffer oder pH bleibt NaN.
+    """
+    index = kalk_index(df_acker, df_gruen)
+    cao = np.full(pH.shape, np.nan)
+    gruppen = pd.DataFrame({"acker": acker, "gruen": gruen, "bg": bg}).groupby(
+        ["acker", "gruen", "bg"], sort=False
+    ).indices
+    for (ist_acker, ist_gruen, b), spalten in gruppen.items():
+        ph_g = pH[:, spalten]
+        kat = _humuskategorie_codes(humus[:, spalten], ist_gruen)
+        teil = np.full(ph_g.shape, np.nan)
+        for j, label in enumerate(_HUMUS_KAT_GRUEN if ist_gruen else _HUMUS_KAT_ACKER):
+            eintrag = index.get((ist_acker, b, label))
+            maske = kat == j
+            if eintrag is None or not maske.any():
+                continue
+            werte, gefunden = _kalk_suche(eintrag, ph_g[maske])
+            teil[maske] = np.where(gefunden, werte, np.nan)
+        cao[:, spalten] = teil
+    return cao
+
+
+def unsicherheit_batch(horizonte, df_acker, df_gruen, stichproben=1000,
+                       perzentile=(5, 50, 95), nutzungsart="acker", phyto_tiefe=100,
+                       max_tiefe=100, id_spalte="bohrung", seed=None, block=1_000_000):
+    """
+    Monte-Carlo-Auswertung für Eingaben mit Bereichen ("2-4", "<1").
+    horizonte: HorizontTabelle oder DataFrame aus build_horizonte_frame(
+    bereiche=True). Für jedes Feld mit Grenzen (bd, humus, pH, skelett) werden
+    je Horizont stichproben Werte gleichverteilt zwischen unten und oben
+    gezogen, Felder ohne Grenzen bleiben beim Punktwert. Humusvorrat, nFK
+    und Kalkbedarf werden für alle Stichproben zugleich berechnet, jeweils
+    für so viele Bohrungen, dass Stichproben × Horizonte ≤ block bleibt.
+    Gibt je Bohrung die Perzentile zurück (NaN-Stichproben zählen nicht),
+    dazu den Anteil der Stichproben mit Kalkbedarf-Treffer.
+    """
+    t = horizonte
+    if not isinstance(t, HorizontTabelle):
+        t = HorizontTabelle.aus_frame(horizonte, id_spalte)
+    rng = np.random.default_rng(seed)
+    order = t.sortierung()
+    perzentile = list(perzentile)
+    ids = t.ids
+
+    phyto = _je_bohrung(phyto_tiefe, ids).astype(float)
+    nutzung = _je_bohrung(nutzungsart, ids)
+    acker = nutzung == "acker"
+    gruen = _ist_gruenland(nutzung)
+    bodenart_ob = pd.Series(
+        _dekodieren(t.bodenart_codes[order[t.starts]], t.bodenart_kategorien), dtype=object
+    ).str.strip().fillna("")
+    bg = pd.to_numeric(bodenart_ob.map(bodentyp_to_bg), errors="coerce").to_numpy(dtype=float)
+    codes = t.nfk_codes()[order]
+
+    ergebnis = {
+        name: np.full((len(ids), len(perzentile)), np.nan)
+        for name in ("humusvorrat_Mg_ha", "nfk_mm", "kalkbedarf")
+    }
+    kalk_anteil = np.full(len(ids), np.nan)
+
+    def ziehen(name, zeilen):
+        """Stichproben-Matrix (Stichprobe × Horizont) eines Feldes."""
+        werte = np.repeat(getattr(t, name)[zeilen][None, :], stichproben, axis=0)
+        if name in t.bereiche:
+            unten, oben = (grenze[zeilen] for grenze in t.bereiche[name])
+            # nur Horizonte mit echtem Bereich bekommen Zufallswerte
+            spalten = np.flatnonzero(oben != unten)
+            breite = oben[spalten] - unten[spalten]
+            werte[:, spalten] = unten[spalten] + breite * rng.random((stichproben, len(spalten)))
+        return werte
+
+    # Bohrungen blockweise, damit Stichproben × Horizonte ≤ block bleibt
+    je_block = max(block // max(stichproben, 1), 1)
+    b0 = 0
+    while b0 < len(ids):
+        b1 = max(np.searchsorted(t.offsets, t.offsets[b0] + je_block, side="right") - 1, b0 + 1)
+        a, e = t.offsets[b0], t.offsets[b1]
+        zeilen = order[a:e]
+        n_h = e - a
+        starts = t.starts[b0:b1] - a
+
+        bd, humus, skelett = (ziehen(name, zeilen) for name in ("bd", "humus", "skelett"))
+        # pH zählt nur im Oberboden
+        pH_ob = ziehen("pH", zeilen[starts])
+
+        # Tiefen sind für alle Stichproben gleich: effektive Dicken einmal je Horizont
+        z_top, z_bot = t.z_top[zeilen], t.z_bot[zeilen]
+        eins = np.ones(n_h)
+        eff_humus = _humus_kern(z_top, z_bot, eins, eins, starts, max_tiefe)[0]["eff_dicke_cm"]
+        eff_nfk = _nfk_dicken(z_top, z_bot, starts, phyto[b0:b1])
+
+        humus_kg_m2 = humus / 100 * bd * eff_humus * 10
+        humus_kg_m2 = np.add.reduceat(
+            np.where((eff_humus > 0) & ~np.isnan(humus_kg_m2), humus_kg_m2, 0.0), starts, axis=1
+        )
+        wert, _ = _nfk_wert(bd, humus, skelett, codes[a:e])
+        nfk_mm = np.add.reduceat(
+            np.where(eff_nfk > 0, wert * eff_nfk / 100 * 10, 0.0), starts, axis=1
+        )
+
+        kalk = _kalk_stichproben(
+            bg[b0:b1], acker[b0:b1], gruen[b0:b1], pH_ob, humus[:, starts], df_acker, df_gruen
+        )
+        kalk_anteil[b0:b1] = (~np.isnan(kalk)).mean(axis=0)
+
+        with warnings.catch_warnings():
+            # Bohrungen ganz ohne Wert (z. B. unbekannte Bodenart) ergeben NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for name, werte in (
+                ("humusvorrat_Mg_ha", humus_kg_m2 * 10),
+                ("nfk_mm", nfk_mm),
+                ("kalkbedarf", kalk),
+            ):
+                ergebnis[name][b0:b1] = np.nanpercentile(werte, perzentile, axis=0).T
+        b0 = b1
+
+    frame = pd.DataFrame({id_spalte: ids})
+    for name, werte in ergebnis.items():
+        for j, p in enumerate(perzentile):
+            frame[f"{name}_p{p:g}"] = werte[:, j]
+    frame["kalk_treffer_anteil"] = kalk_anteil
+    return frame
+
+
+if __name__ == "__main__":
+    # Die Kommandozeile liegt in dateiauswertung.py (mit Export, Speicher, Raster …)
+    import sys
+    from dateiauswertung import main
+    sys.exit(main())
@@ -0,0 +1,601 @@
+"""
+Auswertung ganzer Eingabedateien (Excel/CSV) und Kommandozeile.
+
+Liest und parst Eingabedateien, übernimmt Parameter je Bohrung aus den
+Spalten der Eingabe und wertet sie mit den Batch-Kernen aus
+bodenauswertung.py aus; CSV-Dateien mit Bohrungs-Spalte werden dabei
+blockweise gestreamt. Dazu kommen Ergebnisspeicher, Eingabe-Cache,
+Export, Raster und Ordnerbeobachtung; die Rechen-Engine selbst bleibt
+frei von diesen Abhängigkeiten.
+
+    python dateiauswertung.py feld/*.xlsx -o ergebnis.xlsx --rechenweg
+"""
+import argparse
+import collections
+import contextlib
+import csv
+import functools
+import glob
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from beobachtung import Manifest, inhalts_hash
+from bodenauswertung import (
+    PARSER_VERSION,
+    HorizontTabelle,
+    _find_col,
+    _nutzungsart_normalisieren,
+    auswertung_batch,
+    build_horizonte_frame,
+    iter_csv_bloecke,
+    lade_referenztabellen,
+    rechenweg_batch,
+)
+from eingabecache import Eingabecache
+from ergebnisexport import Exportziel, ausgabedateien, exportieren
+from ergebnisspeicher import ERGEBNIS_VERSION, Ergebnisspeicher
+from messung import Messung, gemessen, messen, stufe
+from raumindex import ascii_grid_schreiben, raster_aus_ergebnissen
+from wasserhaushalt import bilanz_aus_ergebnissen, wetter_lesen
+
+# ——————————————————————————————————————————
+_EINGABE_ENDUNGEN = (".xlsx", ".xls", ".csv")
+
+def _eingabedateien(angaben, ausgabe=None):
+    """Dateien, Verzeichnisse und Glob-Muster → sortierte Liste von Eingabedateien."""
+    dateien = []
+    for angabe in angaben:
+        if os.path.isdir(angabe):
+            treffer = [os.path.join(angabe, f) for f in os.listdir(angabe)]
+        elif glob.has_magic(angabe):
+            treffer = glob.glob(angabe, recursive=True)
+        else:
+            treffer = [angabe]
+        dateien.extend(
+            f for f in sorted(treffer)
+            if f.lower().endswith(_EINGABE_ENDUNGEN) and os.path.basename(f)[:2] != "~$"
+        )
+    if ausgabe:
+        dateien = [f for f in dateien if os.path.abspath(f) != os.path.abspath(ausgabe)]
+    return list(dict.fromkeys(dateien))
+
+@gemessen("datei_lesen")
+def _datei_lesen(pfad, inhalt=None):
+    quelle = pfad if inhalt is None else io.BytesIO(inhalt)
+    if pfad.lower().endswith((".xls", ".xlsx")):
+        return pd.read_excel(quelle)
+    return pd.read_csv(quelle, sep=None, engine="python")
+
+# Zeilen je Block beim Streamen von CSV-Eingaben (siehe _auftraege())
+CSV_BLOCK = 100_000
+
+def _csv_optionen(pfad):
+    """
+    read_csv-Optionen für pfad: Trennzeichen und Anführungszeichen aus der
+    Kopfzeile wie bei sep=None, damit die schnelle C-Engine blockweise lesen kann.
+    """
+    with open(pfad, encoding="utf-8", errors="replace") as f:
+        dialekt = csv.Sniffer().sniff(f.readline())
+    return {"sep": dialekt.delimiter, "quotechar": dialekt.quotechar}
+
+def _auftraege(dateien, blockgroesse=CSV_BLOCK):
+    """
+    Paare (pfad, daten) für datei_teile(): CSV-Dateien mit einer Spalte
+    "Bohr…" blockweise aus iter_csv_bloecke() (daten = Rohzeilen
+    vollständiger Bohrungen), so dass große Exporte nie ganz im Speicher
+    liegen; alle übrigen Dateien als Ganzes (daten = None). Scheitert das
+    Lesen mitten in der Datei, ist daten die Ausnahme. Jede Datei liefert
+    mindestens ein Paar.
+    """
+    for pfad in dateien:
+        if not pfad.lower().endswith(".csv"):
+            yield pfad, None
+            continue
+        bloecke = 0
+        try:
+            optionen = _csv_optionen(pfad)
+            id_spalte = _find_col(pd.read_csv(pfad, nrows=0, **optionen).columns.tolist(), "bohr")
+            for block in iter_csv_bloecke(pfad, id_spalte, blockgroesse, **optionen):
+                yield pfad, block
+                bloecke += 1
+        except Exception as e:
+            if bloecke:
+                yield pfad, e
+                continue
+        # Ohne Bohrungs-Spalte, ohne Zeilen oder bei Fehlern vor dem ersten
+        # Block: die ganze Datei wie bisher (meldet auch dieselben Fehler)
+        if not bloecke:
+            yield pfad, None
+
+def _geordnet(auswerten, auftraege, pool=None, fenster=1):
+    """
+    auswerten(pfad, daten=daten) je Auftrag aus _auftraege(); liefert
+    (pfad, Ergebnis) in der Reihenfolge der Aufträge. Mit pool sind höchstens
+    fenster Aufträge gleichzeitig unterwegs, damit nicht alle Blöcke auf
+    einmal gelesen werden.
+    """
+    if pool is None:
+        for pfad, daten in auftraege:
+            yield pfad, auswerten(pfad, daten=daten)
+        return
+    unterwegs = collections.deque()
+    for pfad, daten in auftraege:
+        unterwegs.append((pfad, pool.submit(auswerten, pfad, daten=daten)))
+        if len(unterwegs) >= fenster:
+            pfad, zukunft = unterwegs.popleft()
+            yield pfad, zukunft.result()
+    while unterwegs:
+        pfad, zukunft = unterwegs.popleft()
+        yield pfad, zukunft.result()
+
+# Parameter je Bohrung, die aus Spalten der Eingabe übernommen werden
+EINGABE_PARAMETER = ("nutzung", "gründig", "bodenform", "rechtswert", "hochwert")
+
+def _eingabe_parameter(df, bohrung, ids):
+    """
+    Erster gefüllter Wert je Bohrung für jeden Eintrag aus EINGABE_PARAMETER,
+    dessen Spalte vorhanden ist, als Text (fehlend: None), Index ids.
+    """
+    spalten = df.columns.tolist()
+    parameter = pd.DataFrame(index=pd.Index(ids, dtype=object))
+    for name in EINGABE_PARAMETER:
+        try:
+            spalte = _find_col(spalten, name)
+        except KeyError:
+            continue
+        werte = df[spalte].groupby(bohrung, sort=False).first().reindex(parameter.index)
+        parameter[name] = werte.map(str).where(werte.notna(), None).astype(object)
+    return parameter
+
+def _parameter(parameter, name, standard):
+    """Parameter je Bohrung aus _eingabe_parameter(), sonst der Wert aus den Optionen."""
+    if name not in parameter:
+        return standard
+    werte = parameter[name].astype(object)
+    return werte.where(werte.notna(), standard)
+
+def _eingabe_parsen(pfad, inhalt=None, daten=None):
+    """
+    Liest und parst eine Eingabedatei → (HorizontTabelle, Parameter je Bohrung).
+    daten: bereits gelesene Rohzeilen statt der Datei (ein Block aus _auftraege()).
+    """
+    df = _datei_lesen(pfad, inhalt) if daten is None else daten
+    try:
+        id_spalte = _find_col(df.columns.tolist(), "bohr")
+    except KeyError:
+        id_spalte = None
+    with stufe("horizonte_parsen") as s:
+        horizonte = build_horizonte_frame(df, id_spalte=id_spalte)
+        s.zaehlen(horizonte=len(horizonte))
+    if id_spalte is None:
+        horizonte.insert(0, "bohrung", os.path.splitext(os.path.basename(pfad))[0])
+    tabelle = HorizontTabelle.aus_frame(horizonte, "bohrung")
+    return tabelle, _eingabe_parameter(df, horizonte["bohrung"].to_numpy(), tabelle.ids)
+
+def _eingabe_lesen(pfad, inhalt=None, cache=None, daten=None):
+    """
+    Wie _eingabe_parsen(), mit cache (Verzeichnis des Eingabe-Caches) über
+    den Inhalts-Hash: ein Treffer wird per mmap abgebildet statt die Datei
+    erneut zu lesen und zu parsen. Blöcke (daten) gehen nicht in den Cache.
+    """
+    if not cache or daten is not None:
+        return _eingabe_parsen(pfad, inhalt, daten)
+    zwischenspeicher = Eingabecache(cache, PARSER_VERSION)
+    kennung = hashlib.sha256(inhalt).hexdigest() if inhalt is not None else inhalts_hash(pfad)
+    # Der Dateiname geht bei Einzelbohrungen in die Bohrungs-ID ein
+    kennung = hashlib.sha256(f"{kennung}\n{os.path.basename(pfad)}".encode()).hexdigest()
+    with stufe("cache_laden"):
+        eintrag = zwischenspeicher.laden(kennung)
+    if eintrag is not None:
+        spalten, bohrungen, meta = eintrag
+        ids = bohrungen.pop("bohrung").to_numpy(dtype=object)
+        tabelle = HorizontTabelle.aus_spalten(ids, bohrungen.pop("laenge").to_numpy(), spalten, meta)
+        bohrungen.index = pd.Index(tabelle.ids, dtype=object)
+        return tabelle, bohrungen.astype(object)
+
+    tabelle, parameter = _eingabe_parsen(pfad, inhalt)
+    spalten, kategorien = tabelle.als_spalten()
+    bohrungen = pd.DataFrame({"bohrung": tabelle.ids, "laenge": tabelle.laengen})
+    for name in parameter.columns:
+        bohrungen[name] = parameter[name].to_numpy()
+    with stufe("cache_speichern", horizonte=len(tabelle)):
+        zwischenspeicher.speichern(kennung, spalten, bohrungen, kategorien)
+    return tabelle, parameter
+
+def _metadaten(pfad, ids, form, koordinaten):
+    """Datei, Bohrung, Koordinaten und Bodenform je Bohrung in der Reihenfolge ids."""
+    je_bohrung = lambda w: w.reindex(ids).to_numpy() if isinstance(w, pd.Series) else w
+    return pd.DataFrame({
+        "Datei":      pfad,
+        "Bohrung":    ids,
+        "Rechtswert": pd.to_numeric(je_bohrung(koordinaten["Rechtswert"]), errors="coerce"),
+        "Hochwert":   pd.to_numeric(je_bohrung(koordinaten["Hochwert"]), errors="coerce"),
+        "Bodenform":  pd.Series(je_bohrung(form), index=range(len(ids))).astype(str),
+    })
+
+def _ergebnis_zeilen(pfad, erg, form, koordinaten):
+    """Ergebnis von auswertung_batch() → Zeilen mit den Spalten des Ergebnisspeichers."""
+    meta = _metadaten(pfad, erg["bohrung"].to_numpy(), form, koordinaten)
+    return pd.DataFrame({
+        "Datei":                           meta["Datei"],
+        "Bohrung":                         meta["Bohrung"],
+        "Rechtswert":                      meta["Rechtswert"],
+        "Hochwert":                        meta["Hochwert"],
+        "Nutzungsart":                     erg["nutzungsart"].to_numpy(),
+        "Bodentyp":                        erg["bodenart_ob"].to_numpy(),
+        "Bodenform":                       meta["Bodenform"],
+        "Physiologische Gründigkeit (cm)": erg["phyto_tiefe"].to_numpy(),
+        "Humusvorrat bis 1 m (Mg/ha)":     erg["humusvorrat_Mg_ha"].to_numpy(),
+        "pH Oberboden":                    erg["pH_ob"].to_numpy(),
+        "Kalkbedarf (dt CaO/ha)":          erg["kalkbedarf"].to_numpy(),
+        "nFK (mm)":                        erg["nfk_mm"].to_numpy(),
+        "Kapillar-Rate (mm/d)":            erg["kap_rate"].to_numpy(),
+        "Kapillar-Rate mindestens (mm/d)": erg["kap_rate_groesser"].to_numpy(),
+        "Meldung":                         erg["kalk_meldung"].to_numpy(),
+    })
+
+def _speicher_abgleichen(speicher, pfad, tabelle, nutzung, phyto, form, koordinaten):
+    """
+    Bohrungen, deren Eingaben schon im Ergebnisspeicher liegen, werden von
+    dort übernommen (Metadaten aus der aktuellen Datei), die übrigen
+    ausgewertet; alle Zeilen werden anschließend gespeichert.
+    """
+    horizonte = tabelle.to_frame(mit_id=True)
+    tabellen = lade_referenztabellen()
+    schluessel = pd.Series(tabelle.fingerabdruecke(
+        nutzung, phyto, tabellen.inhalts_hash, ERGEBNIS_VERSION
+    ), index=tabelle.ids)
+    with Ergebnisspeicher(speicher) as sp:
+        with stufe("speicher", bohrungen=len(schluessel)):
+            vorhanden = sp.vorhandene(schluessel)
+        neu = ~schluessel.isin(vorhanden)
+        teile = []
+        if neu.any():
+            erg = auswertung_batch(
+                horizonte[horizonte["bohrung"].isin(schluessel.index[neu])],
+                tabellen.df_acker, tabellen.df_gruen, nutzungsart=nutzung, phyto_tiefe=phyto
+            )
+            frisch = _ergebnis_zeilen(pfad, erg, form, koordinaten)
+            frisch["Schlüssel"] = schluessel.reindex(erg["bohrung"]).to_numpy()
+            teile.append(frisch)
+        if vorhanden:
+            with stufe("speicher", bohrungen=len(vorhanden)):
+                alt = sp.ergebnisse(schluessel[~neu]).drop(columns="Gespeichert")
+            # Gespeicherte IDs sind Text; die IDs der Eingabe über den Schlüssel zurückholen
+            ids = pd.Series(schluessel.index, index=schluessel.to_numpy())
+            alt["Bohrung"] = ids.reindex(alt["Schlüssel"]).to_numpy()
+            meta = _metadaten(pfad, alt["Bohrung"].to_numpy(), form, koordinaten)
+            for name in meta.columns:
+                alt[name] = meta[name].to_numpy()
+            teile.append(alt)
+        zeilen = pd.concat(teile, ignore_index=True).set_index("Schlüssel", drop=False)
+        zeilen = zeilen.reindex(schluessel.to_numpy()).reset_index(drop=True)
+
+        neue_horizonte = horizonte
+        neue_horizonte.insert(0, "Schlüssel", schluessel.reindex(neue_horizonte.pop("bohrung")).to_numpy())
+        with stufe("speicher", horizonte=len(neue_horizonte), bohrungen=len(zeilen)):
+            sp.speichern(zeilen, neue_horizonte[neue_horizonte["Schlüssel"].isin(schluessel[neu])])
+    return zeilen
+
+# Spalten und Typen der Ergebnistabelle (auch für Fehlerzeilen)
+ERGEBNIS_SPALTEN = {
+    "Datei":                           object,
+    "Bohrung":                         object,
+    "Rechtswert":                      float,
+    "Hochwert":                        float,
+    "Nutzungsart":                     object,
+    "Bodentyp, Bodenform":             object,
+    "Physiologische Gründigkeit (cm)": float,
+    "Humusvorrat bis 1 m (Mg/ha)":     float,
+    "pH Oberboden":                    float,
+    "Kalkbedarf (dt CaO/ha)":          float,
+    "nFK (mm)":                        float,
+    "Kapillar-Rate (mm/d)":            float,
+    "Kapillar-Rate mindestens (mm/d)": float,
+    "Meldung":                         object,
+    "Fehler":                          object,
+}
+
+def datei_auswerten(pfad, nutzungsart="acker", phyto_tiefe=100, bodenform="", speicher=None):
+    """
+    Wertet eine Eingabedatei aus (eine Bohrung je Datei oder mehrere mit
+    einer Spalte "Bohr…") und gibt eine Ergebniszeile je Bohrung zurück.
+    Nutzungsart, physiologische Gründigkeit, Bodenform sowie Rechts- und
+    Hochwert werden aus gleichnamigen Spalten übernommen, falls vorhanden.
+    Mit speicher (Pfad einer SQLite-Datei) werden bereits gespeicherte
+    Bohrungen übersprungen und neue Ergebnisse dort abgelegt.
+    Fehler werden als Zeile mit der Spalte "Fehler" zurückgegeben.
+    """
+    return datei_teile(pfad, nutzungsart, phyto_tiefe, bodenform, speicher)["ergebnisse"]
+
+def datei_teile(pfad, nutzungsart="acker", phyto_tiefe=100, bodenform="", speicher=None,
+                rechenweg=False, wetter=None, inhalt=None, cache=None, daten=None):
+    """
+    Wie datei_auswerten(), gibt aber {Blatt: DataFrame} für den Export
+    zurück: "ergebnisse" und mit rechenweg=True zusätzlich die Tabellen aus
+    rechenweg_batch() ("humus", "nfk", "kapillar") mit Spalten Datei und Bohrung.
+    Mit einer Wetterreihe (wetter_lesen()) kommt "wasserhaushalt" hinzu,
+    die Saisonbilanz je Bohrung aus bilanz_aus_ergebnissen().
+    inhalt: Dateiinhalt als Bytes (z. B. ein Upload); pfad ist dann nur der Name.
+    cache: Verzeichnis des Eingabe-Caches (eingabecache.py, benötigt pyarrow).
+    daten: ein Block aus _auftraege() statt der ganzen Datei, oder die
+    Ausnahme beim Lesen (wird als Fehlerzeile zurückgegeben).
+    """
+    try:
+        if isinstance(daten, Exception):
+            raise daten
+        horizonte, parameter = _eingabe_lesen(pfad, inhalt, cache, daten)
+
+        nutzung = _parameter(parameter, "nutzung", nutzungsart)
+        if isinstance(nutzung, pd.Series):
+            nutzung = nutzung.map(lambda w: _nutzungsart_normalisieren(w, nutzungsart))
+        phyto = _parameter(parameter, "gründig", phyto_tiefe)
+        if isinstance(phyto, pd.Series):
+            phyto = pd.to_numeric(phyto, errors="coerce").fillna(phyto_tiefe)
+        form = _parameter(parameter, "bodenform", bodenform)
+        koordinaten = {
+            name: _parameter(parameter, name.lower(), np.nan)
+            for name in ("Rechtswert", "Hochwert")
+        }
+
+        if speicher:
+            zeilen = _speicher_abgleichen(speicher, pfad, horizonte, nutzung, phyto, form, koordinaten)
+        else:
+            tabellen = lade_referenztabellen()
+            erg = auswertung_batch(
+                horizonte, tabellen.df_acker, tabellen.df_gruen,
+                nutzungsart=nutzung, phyto_tiefe=phyto
+            )
+            zeilen = _ergebnis_zeilen(pfad, erg, form, koordinaten)
+        bodentyp_form = zeilen.pop("Bodentyp") + ", " + zeilen.pop("Bodenform")
+        zeilen.insert(zeilen.columns.get_loc("Nutzungsart") + 1, "Bodentyp, Bodenform", bodentyp_form)
+        zeilen["Fehler"] = None
+        teile = {"ergebnisse": zeilen.reindex(columns=list(ERGEBNIS_SPALTEN)).astype(ERGEBNIS_SPALTEN)}
+        if rechenweg:
+            with stufe("rechenweg", horizonte=len(horizonte)):
+                wege = rechenweg_batch(horizonte, phyto_tiefe=phyto)
+            for blatt, frame in wege.items():
+                frame.insert(0, "Datei", pfad)
+                teile[blatt] = frame.rename(columns={"bohrung": "Bohrung"})
+        if wetter is not None:
+            with stufe("wasserhaushalt", bohrungen=len(zeilen)):
+                teile["wasserhaushalt"] = bilanz_aus_ergebnissen(teile["ergebnisse"], wetter)
+        return teile
+    except Exception as e:
+        fehler = pd.DataFrame([{"Datei": pfad, "Fehler": f"{type(e).__name__}: {e}"}])
+        return {"ergebnisse": fehler.reindex(columns=list(ERGEBNIS_SPALTEN)).astype(ERGEBNIS_SPALTEN)}
+
+def ergebnis_schreiben(df, ausgabe):
+    """Schreibt df als .xlsx, .csv oder .parquet (siehe ergebnisexport)."""
+    return exportieren(ausgabe, [{"ergebnisse": df}])
+
+def _datei_gemessen(auswerten, pfad, daten=None):
+    """auswerten(pfad) mit Zeitmessung; gibt (Teile, Messpunkte) zurück (auch im Worker-Prozess)."""
+    with messen() as messung:
+        teil = auswerten(pfad, daten=daten)
+    return teil, messung.eintraege
+
+def _ausgabe_stand(pfade):
+    """{absoluter Pfad: Größe in Bytes} der Ausgabedateien (fehlende: 0)."""
+    return {os.path.abspath(p): os.path.getsize(p) if os.path.exists(p) else 0 for p in pfade}
+
+def _ausgabe_zuruecksetzen(stand):
+    """Kürzt die Ausgabedateien auf stand (_ausgabe_stand()); leer gewordene werden gelöscht."""
+    for pfad, groesse in stand.items():
+        if not os.path.exists(pfad) or os.path.getsize(pfad) <= groesse:
+            continue
+        if groesse:
+            with open(pfad, "r+b") as f:
+                f.truncate(groesse)
+        else:
+            os.remove(pfad)
+
+def _ausgabe_sichern(pfade):
+    """Geschriebene Ausgabedateien auf die Platte bringen, bevor das Manifest sie als fertig führt."""
+    for pfad in pfade:
+        if os.path.exists(pfad):
+            with open(pfad, "r+b") as f:
+                os.fsync(f.fileno())
+
+def _ordner_beobachten(eingaben, ausgabe, auswerten, manifest_pfad, intervall=10.0, jobs=1):
+    """
+    Wertet nur neue oder geänderte Dateien aus eingaben aus (siehe Manifest)
+    und hängt die Ergebnisse an ausgabe (.csv) an. Mit intervall > 0 wird
+    der Ordner wiederholt geprüft, bis Strg+C. Vor jeder Datei wird der
+    Stand der Ausgabe im Manifest vermerkt: eine abgebrochene Datei wird
+    beim nächsten Start zurückgenommen und wiederholt, eine Datei mit
+    Fehlern gleich zurückgenommen und nicht als fertig geführt.
+    """
+    manifest = Manifest(manifest_pfad)
+    ausgaben = ausgabedateien(ausgabe)
+    eigene = {os.path.abspath(p) for p in ausgaben + [manifest_pfad]}
+    for pfad, eintrag in manifest.unterbrochene().items():
+        _ausgabe_zuruecksetzen(eintrag.pop("stand"))
+        manifest.eintragen(pfad, {**eintrag, "status": "abgebrochen"})
+        print(f"Unterbrochene Auswertung von '{pfad}' zurückgenommen.", flush=True)
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    print(f"Beobachte {', '.join(eingaben)} ({len(manifest)} Dateien bereits ausgewertet)", flush=True)
+    try:
+        while True:
+            dateien = [f for f in _eingabedateien(eingaben) if os.path.abspath(f) not in eigene]
+            neue = manifest.neue(dateien)
+            if neue:
+                kennungen = dict(neue)
+                teile = _geordnet(auswerten, _auftraege(kennungen), pool, 2 * jobs)
+                fehlerhaft = 0
+                # Blöcke einer Datei kommen nacheinander; die Datei ist fertig, wenn die nächste beginnt
+                for pfad, bloecke in itertools.groupby(teile, key=lambda paar: paar[0]):
+                    stand = _ausgabe_stand(ausgaben)
+                    manifest.beginnen(pfad, kennungen[pfad], stand)
+                    bohrungen, meldungen = 0, []
+                    with Exportziel(ausgabe, spalten={"ergebnisse": list(ERGEBNIS_SPALTEN)}, fortsetzen=True) as export:
+                        for _, teil in bloecke:
+                            fehler = teil["ergebnisse"]["Fehler"].dropna().tolist()
+                            bohrungen += len(teil["ergebnisse"]) - len(fehler)
+                            meldungen += fehler
+                            export.schreiben(teil)
+                    if meldungen:
+                        _ausgabe_zuruecksetzen(stand)
+                        manifest.eintragen(pfad, kennungen[pfad], status="fehler",
+                                           fehler=len(meldungen), meldung=meldungen[0])
+                        print(f"  Fehler in '{pfad}': {meldungen[0]}", flush=True)
+                        fehlerhaft += 1
+                    else:
+                        _ausgabe_sichern(ausgaben)
+                        manifest.eintragen(pfad, kennungen[pfad], bohrungen=bohrungen)
+                print(f"→ {len(neue) - fehlerhaft} neue oder geänderte Dateien an '{ausgabe}' angehängt "
+                      f"({fehlerhaft} mit Fehlern zurückgestellt, {len(manifest)} Dateien im Manifest).", flush=True)
+            if intervall <= 0:
+                return 0
+            time.sleep(intervall)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bohrstock-Auswertung für viele Eingabedateien (Excel/CSV)."
+    )
+    parser.add_argument("eingaben", nargs="+",
+                        help="Dateien, Verzeichnisse oder Glob-Muster (z. B. 'feld/**/*.xlsx')")
+    parser.add_argument("-o", "--ausgabe", default="ergebnis.xlsx",
+                        help="Ergebnisdatei (.xlsx, .csv oder .parquet), Standard: ergebnis.xlsx")
+    parser.add_argument("--rechenweg", action="store_true",
+                        help="Rechenweg für Humusvorrat, nFK und Kapillaraufstieg mit ausgeben "
+                             "(Excel: eigene Blätter, CSV/Parquet: eigene Dateien)")
+    parser.add_argument("--nutzungsart", default="acker",
+                        type=_nutzungsart_normalisieren,
+                        help="acker oder gruenland, falls keine Spalte 'Nutzungsart' vorhanden ist")
+    parser.add_argument("--phyto", type=float, default=100,
+                        help="physiologische Gründigkeit in cm, falls keine Spalte 'Gründigkeit' vorhanden ist")
+    parser.add_argument("--bodenform", default="",
+                        help="Bodenform, falls keine Spalte 'Bodenform' vorhanden ist")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Anzahl paralleler Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--raster", metavar="VERZEICHNIS",
+                        help="IDW-Raster für Kalkbedarf, Humusvorrat und nFK als ESRI-ASCII-Grids "
+                             "in VERZEICHNIS schreiben (braucht Spalten Rechtswert/Hochwert)")
+    parser.add_argument("--aufloesung", type=float, default=1.0,
+                        help="Rasterweite in m für --raster (Standard: 1)")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("XMIN", "YMIN", "XMAX", "YMAX"),
+                        help="Ausschnitt für --raster (Standard: Ausdehnung der Bohrpunkte)")
+    parser.add_argument("--speicher", metavar="DATEI",
+                        help="SQLite-Ergebnisspeicher: bereits ausgewertete Bohrungen überspringen, "
+                             "neue Ergebnisse dort ablegen")
+    parser.add_argument("--wetter", metavar="CSV",
+                        help="Tägliche Wetterreihe (Spalten Datum, Niederschlag, ET in mm/d): "
+                             "Saison-Wasserbilanz je Bohrung als eigenes Blatt ausgeben")
+    parser.add_argument("--cache", metavar="VERZEICHNIS",
+                        help="Geparste Eingaben als Arrow-Dateien zwischenspeichern (benötigt pyarrow); "
+                             "unveränderte Dateien werden beim nächsten Lauf nicht erneut gelesen "
+                             "(CSV-Dateien mit Bohrungs-Spalte werden stattdessen blockweise gestreamt)")
+    parser.add_argument("--beobachten", action="store_true",
+                        help="Eingabeordner beobachten: nur neue oder geänderte Dateien auswerten und "
+                             "an die Ausgabe (.csv) anhängen; Stand im Manifest, fortsetzbar nach Abbruch")
+    parser.add_argument("--intervall", type=float, default=10.0,
+                        help="Sekunden zwischen zwei Prüfungen bei --beobachten (0 = einmal prüfen)")
+    parser.add_argument("--manifest", metavar="DATEI",
+                        help="Manifest für --beobachten (Standard: <Ausgabe>.manifest.jsonl)")
+    parser.add_argument("--messung", metavar="DATEI",
+                        help="Laufzeit je Stufe und Datei als JSON-Zeilen nach DATEI schreiben ('-' = stderr)")
+    parser.add_argument("--profil", metavar="DATEI",
+                        help="cProfile-Profil des Hauptprozesses nach DATEI schreiben "
+                             "(mit -j 1 vollständig, sonst ohne die Worker)")
+    args = parser.parse_args(argv)
+
+    if args.beobachten:
+        if not args.ausgabe.lower().endswith(".csv"):
+            parser.error("--beobachten hängt an eine CSV-Ausgabe an, z. B. -o ergebnis.csv")
+        if args.raster or args.messung or args.profil:
+            parser.error("--beobachten lässt sich nicht mit --raster, --messung oder --profil kombinieren")
+        dateien = []
+    else:
+        dateien = _eingabedateien(args.eingaben, args.ausgabe)
+        if not dateien:
+            parser.error("keine Eingabedateien gefunden")
+    if args.cache:
+        try:
+            Eingabecache(args.cache, PARSER_VERSION)
+        except (ImportError, OSError) as e:
+            parser.error(f"--cache: {e}")
+    wetter = None
+    if args.wetter:
+        try:
+            wetter = wetter_lesen(args.wetter)
+        except (OSError, KeyError, ValueError) as e:
+            parser.error(f"Wetterdaten '{args.wetter}': {e}")
+
+    auswerten = functools.partial(
+        datei_teile,
+        nutzungsart=args.nutzungsart, phyto_tiefe=args.phyto, bodenform=args.bodenform,
+        speicher=args.speicher, rechenweg=args.rechenweg, wetter=wetter, cache=args.cache
+    )
+    if args.beobachten:
+        return _ordner_beobachten(args.eingaben, args.ausgabe, auswerten,
+                                  args.manifest or f"{args.ausgabe}.manifest.jsonl",
+                                  args.intervall, args.jobs)
+
+    # Mit --messung misst jeder Worker seine Datei selbst und liefert die Messpunkte mit
+    messen_an = bool(args.messung or args.profil)
+    if messen_an:
+        auswerten = functools.partial(_datei_gemessen, auswerten)
+
+    # Ergebnisse je Datei direkt in die Ausgabe schreiben, sobald sie vorliegen
+    fehler = 0
+    fuer_raster = []
+    pool = None
+    # CSV-Dateien werden blockweise verteilt, eine große Datei kann alle Prozesse nutzen
+    csv_eingabe = any(f.lower().endswith(".csv") for f in dateien)
+    jobs = args.jobs if csv_eingabe else min(args.jobs, len(dateien))
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+    start = time.perf_counter()
+    with messen(profil=bool(args.profil)) if messen_an else contextlib.nullcontext(Messung()) as messung, \
+            Exportziel(args.ausgabe, spalten={"ergebnisse": list(ERGEBNIS_SPALTEN)}) as export, \
+            pool or contextlib.nullcontext():
+        for pfad, teil in _geordnet(auswerten, _auftraege(dateien), pool, 2 * jobs):
+            if messen_an:
+                teil, eintraege = teil
+                messung.uebernehmen(eintraege, datei=pfad)
+            fehler += int(teil["ergebnisse"]["Fehler"].notna().sum())
+            export.schreiben(teil)
+            if args.raster:
+                fuer_raster.append(teil["ergebnisse"])
+    dauer = time.perf_counter() - start
+    bohrungen = export.zeilen.get("ergebnisse", 0) - fehler
+    print(f"→ '{export.pfad}' wurde erzeugt ({len(dateien)} Dateien, {bohrungen} Bohrungen, {fehler} Fehler).")
+
+    if args.messung:
+        gesamt = {"stufe": "gesamt", "sekunden": round(dauer, 6), "dateien": len(dateien),
+                  "bohrungen": bohrungen, "fehler": fehler, "jobs": max(jobs, 1)}
+        zeilen = [*messung.json_zeilen(), json.dumps(gesamt, ensure_ascii=False)]
+        if args.messung == "-":
+            print("\n".join(zeilen), file=sys.stderr)
+        else:
+            with open(args.messung, "w", encoding="utf-8") as f:
+                f.write("\n".join(zeilen) + "\n")
+    if args.profil:
+        messung.profil_schreiben(args.profil)
+        print(f"→ Profil '{args.profil}' (python -m pstats {args.profil})")
+
+    if args.raster:
+        bbox, raster = raster_aus_ergebnissen(pd.concat(fuer_raster, ignore_index=True), args.bbox, args.aufloesung)
+        os.makedirs(args.raster, exist_ok=True)
+        for name, werte in raster.items():
+            pfad = ascii_grid_schreiben(os.path.join(args.raster, f"{name}.asc"), werte, bbox, args.aufloesung)
+            print(f"→ Raster '{pfad}' ({werte.shape[1]} × {werte.shape[0]} Zellen)")
+    return 1 if fehler else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""
+Lokaler HTTP/JSON-Dienst für die Bohrstock-Auswertung (nur Standardbibliothek).
+
+Einzelne Profile, die gleichzeitig eintreffen, werden kurz gesammelt und
+gemeinsam mit auswertung_batch() ausgewertet (Micro-Batching); die
+Referenztabellen bleiben im Speicher. Schlägt der gemeinsame Durchgang
+fehl, werden die Profile des Stapels einzeln ausgewertet, so dass nur das
+fehlerhafte Profil eine Fehlerantwort (422) erhält.
+
+Die Ergebnisse sind die von auswertung_batch(), nicht die der
+Einzelfunktionen: eine unbekannte Bodenart ergibt nfk_mm = null (statt
+KeyError in gesamt_nfk()), eine unbekannte Bodenart im Oberboden die
+kalk_meldung "Unbekannter Bodentyp …".
+
+Aufruf:
+    python dienst.py --port 8765
+
+    POST /auswerten   {"bohrung": "B1", "nutzungsart": "acker", "phyto_tiefe": 100,
+                       "zeilen": [{"Horizont": "Ap", "Tiefe (cm)": "0-30", ...}, ...]}
+                      oder {"profile": [{...}, {...}]} für mehrere Profile
+    GET  /statistik   Latenz (p50/p99), Durchsatz und Stapelgrößen
+    GET  /gesund      {"ok": true}
+
+Die Zeilen haben die Spalten der Feldblätter (wie für build_horizonte_list()).
+"""
+import argparse
+import collections
+import json
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from bodenauswertung import (
+    _nutzungsart_normalisieren,
+    auswertung_batch,
+    build_horizonte_frame,
+    lade_referenztabellen,
+)
+
+# Felder der Antwort je Profil (Spalte aus auswertung_batch → JSON-Name)
+ANTWORT_FELDER = {
+    "bodenart_ob":       "bodenart_oberboden",
+    "pH_ob":             "ph_oberboden",
+    "humusvorrat_Mg_ha": "humusvorrat_Mg_ha",
+    "nfk_mm":            "nfk_mm",
+    "kalkbedarf":        "kalkbedarf_dt_CaO_ha",
+    "kalk_meldung":      "kalk_meldung",
+    "kap_rate":          "kap_rate_mm_d",
+    "kap_rate_groesser": "kap_rate_groesser_mm_d",
+}
+
+
+def _json_wert(wert):
+    """NaN/±inf/None → null, NumPy-Skalare → Python-Werte."""
+    if wert is None or (isinstance(wert, float) and not math.isfinite(wert)):
+        return None
+    if isinstance(wert, np.generic):
+        return _json_wert(wert.item())
+    return wert
+
+
+def _keine_konstante(name):
+    """Für json.loads(parse_constant=…): NaN und ±Infinity sind in Anfragen ungültig."""
+    raise ValueError(f"{name} ist kein gültiger Zahlenwert")
+
+
+class Statistik:
+    """Latenzen der letzten fenster Anfragen, Zähler und Stapelgrößen (threadsicher)."""
+
+    def __init__(self, fenster=10_000):
+        self._lock = threading.Lock()
+        self.start = time.time()
+        self.latenzen = collections.deque(maxlen=fenster)
+        self.zeitpunkte = collections.deque(maxlen=fenster)
+        self.profile = 0
+        self.fehler = 0
+        self.stapel = 0
+        self.stapel_max = 0
+
+    def anfrage(self, sekunden, fehler=False):
+        with self._lock:
+            self.latenzen.append(sekunden)
+            self.zeitpunkte.append(time.time())
+            self.profile += 1
+            self.fehler += fehler
+
+    def stapel_fertig(self, groesse):
+        with self._lock:
+            self.stapel += 1
+            self.stapel_max = max(self.stapel_max, groesse)
+
+    def bericht(self):
+        with self._lock:
+            latenzen = np.array(self.latenzen)
+            zeitpunkte = np.array(self.zeitpunkte)
+            profile, fehler, stapel, stapel_max = self.profile, self.fehler, self.stapel, self.stapel_max
+        laufzeit = time.time() - self.start
+        bericht = {
+            "laufzeit_s": round(laufzeit, 1),
+            "profile": profile,
+            "fehler": fehler,
+            "stapel": stapel,
+            "stapel_mittel": round(profile / stapel, 2) if stapel else None,
+            "stapel_max": stapel_max,
+            "durchsatz_profile_pro_s": round(profile / laufzeit, 2) if laufzeit > 0 else None,
+        }
+        if len(latenzen):
+            p50, p99 = np.percentile(latenzen, [50, 99]) * 1000
+            bericht.update(latenz_p50_ms=round(p50, 2), latenz_p99_ms=round(p99, 2),
+                           latenz_max_ms=round(latenzen.max() * 1000, 2))
+            # Durchsatz über das Fenster der letzten Anfragen
+            dauer = zeitpunkte[-1] - zeitpunkte[0]
+            if dauer > 0:
+                bericht["durchsatz_fenster_pro_s"] = round((len(zeitpunkte) - 1) / dauer, 2)
+        return bericht
+
+
+class Stapelauswerter:
+    """
+    Sammelt Profile aus beliebigen Threads und wertet sie in einem
+    Hintergrund-Thread stapelweise aus: nach dem ersten Profil wird höchstens
+    wartezeit Sekunden auf weitere gewartet, höchstens max_stapel je Stapel.
+    einreichen() gibt ein Future mit dem Ergebnis (dict) zurück, auswerten()
+    wartet darauf.
+    """
+
+    def __init__(self, max_stapel=256, wartezeit=0.005, statistik=None):
+        self.max_stapel = max_stapel
+        self.wartezeit = wartezeit
+        self.statistik = statistik or Statistik()
+        self._warteschlange = queue.Queue()
+        lade_referenztabellen()
+        self._thread = threading.Thread(target=self._schleife, name="stapelauswerter", daemon=True)
+        self._thread.start()
+
+    def einreichen(self, profil):
+        start = time.perf_counter()
+        zukunft = Future()
+        zukunft.add_done_callback(lambda z: self.statistik.anfrage(
+            time.perf_counter() - start, fehler=z.exception() is not None
+        ))
+        self._warteschlange.put((profil, zukunft))
+        return zukunft
+
+    def auswerten(self, profil, timeout=60.0):
+        return self.einreichen(profil).result(timeout)
+
+    def _schleife(self):
+        while True:
+            stapel = [self._warteschlange.get()]
+            frist = time.perf_counter() + self.wartezeit
+            while len(stapel) < self.max_stapel:
+                rest = frist - time.perf_counter()
+                try:
+                    stapel.append(self._warteschlange.get(timeout=rest) if rest > 0
+                                  else self._warteschlange.get_nowait())
+                except queue.Empty:
+                    break
+            fehler = RuntimeError("Kein Ergebnis für das Profil")
+            try:
+                self._stapel_auswerten(stapel)
+            except Exception as e:
+                fehler = e
+            # Nichts darf unbeantwortet bleiben, sonst wartet der Aufrufer bis zum Timeout
+            for _, zukunft in stapel:
+                if not zukunft.done():
+                    zukunft.set_exception(fehler)
+            self.statistik.stapel_fertig(len(stapel))
+
+    def _stapel_auswerten(self, stapel):
+        # Profile mit gleichen Spalten gemeinsam parsen, dann alle in einem Durchgang auswerten
+        gruppen = collections.defaultdict(list)
+        for nr, (profil, zukunft) in enumerate(stapel):
+            try:
+                zeilen = pd.DataFrame(profil["zeilen"])
+                if zeilen.empty:
+                    raise ValueError("Profil ohne Zeilen")
+                gruppen[tuple(zeilen.columns)].append((nr, zeilen))
+            except Exception as e:
+                zukunft.set_exception(e)
+
+        horizonte = []
+        for gruppe in gruppen.values():
+            rahmen = pd.concat(
+                [zeilen.assign(_nr=nr) for nr, zeilen in gruppe], ignore_index=True
+            )
+            try:
+                horizonte.append(build_horizonte_frame(rahmen, id_spalte="_nr"))
+            except Exception:
+                # Einzeln parsen, damit ein fehlerhaftes Profil die anderen nicht mitreißt
+                for nr, zeilen in gruppe:
+                    try:
+                        horizonte.append(build_horizonte_frame(zeilen.assign(_nr=nr), id_spalte="_nr"))
+                    except Exception as e:
+                        stapel[nr][1].set_exception(e)
+        if not horizonte:
+            return
+
+        horizonte = pd.concat(horizonte, ignore_index=True)
+        nummern = pd.unique(horizonte["bohrung"])
+        profile = {nr: stapel[nr][0] for nr in nummern}
+        nutzung = pd.Series({nr: _nutzungsart_normalisieren(p.get("nutzungsart", "acker"))
+                             for nr, p in profile.items()})
+        phyto = pd.Series({nr: pd.to_numeric(p.get("phyto_tiefe", 100), errors="coerce")
+                           for nr, p in profile.items()}).fillna(100.0)
+        tabellen = lade_referenztabellen()
+        try:
+            erg = auswertung_batch(horizonte, tabellen.df_acker, tabellen.df_gruen,
+                                   nutzungsart=nutzung, phyto_tiefe=phyto)
+        except Exception:
+            # Ein Profil bringt den Stapel zu Fall: einzeln auswerten, nur dieses erhält den Fehler
+            teile = []
+            for nr, teil in horizonte.groupby("bohrung", sort=False):
+                try:
+                    teile.append(auswertung_batch(teil, tabellen.df_acker, tabellen.df_gruen,
+                                                  nutzungsart=nutzung, phyto_tiefe=phyto))
+                except Exception as e:
+                    stapel[nr][1].set_exception(e)
+            if not teile:
+                return
+            erg = pd.concat(teile, ignore_index=True)
+
+        for zeile in erg.to_dict("records"):
+            profil = profile[zeile["bohrung"]]
+            antwort = {"bohrung": profil.get("bohrung"), "nutzungsart": zeile["nutzungsart"],
+                       "phyto_tiefe": _json_wert(zeile["phyto_tiefe"])}
+            antwort.update({name: _json_wert(zeile[spalte]) for spalte, name in ANTWORT_FELDER.items()})
+            stapel[zeile["bohrung"]][1].set_result(antwort)
+
+
+class _Anfrage(BaseHTTPRequestHandler):
+    server_version = "Bohrstock/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _antworten(self, status, daten):
+        koerper = json.dumps(daten, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(koerper)))
+        self.end_headers()
+        self.wfile.write(koerper)
+
+    def do_GET(self):
+        if self.path == "/statistik":
+            self._antworten(200, self.server.auswerter.statistik.bericht())
+        elif self.path == "/gesund":
+            self._antworten(200, {"ok": True})
+        else:
+            self._antworten(404, {"fehler": f"Unbekannter Pfad {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/auswerten":
+            self._antworten(404, {"fehler": f"Unbekannter Pfad {self.path}"})
+            return
+        try:
+            laenge = int(self.headers.get("Content-Length", 0))
+            anfrage = json.loads(self.rfile.read(laenge) or b"null", parse_constant=_keine_konstante)
+            profile = anfrage["profile"] if "profile" in anfrage else [anfrage]
+            if not all(isinstance(p, dict) and isinstance(p.get("zeilen"), list) for p in profile):
+                raise ValueError("Jedes Profil braucht eine Liste 'zeilen'")
+        except (ValueError, KeyError, TypeError) as e:
+            self._antworten(400, {"fehler": f"Ungültige Anfrage: {e}"})
+            return
+
+        # Alle Profile einer Anfrage zuerst einreichen, damit sie im selben Stapel landen
+        zukuenfte = [self.server.auswerter.einreichen(profil) for profil in profile]
+        ergebnisse = []
+        for profil, zukunft in zip(profile, zukuenfte):
+            try:
+                ergebnisse.append(zukunft.result(self.server.timeout_s))
+            except Exception as e:
+                ergebnisse.append({"bohrung": profil.get("bohrung"), "fehler": f"{type(e).__name__}: {e}"})
+        if "profile" in anfrage:
+            self._antworten(200, {"ergebnisse": ergebnisse})
+        else:
+            self._antworten(422 if "fehler" in ergebnisse[0] else 200, ergebnisse[0])
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Viele gleichzeitige Verbindungen sind gewollt (sie füllen die Stapel)
+    request_queue_size = 256
+
+
+def dienst_erstellen(host="127.0.0.1", port=8765, max_stapel=256, wartezeit=0.005):
+    """HTTP-Server mit Stapelauswerter; starten mit serve_forever()."""
+    server = _Server((host, port), _Anfrage)
+    server.auswerter = Stapelauswerter(max_stapel, wartezeit)
+    server.timeout_s = 60.0
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokaler HTTP/JSON-Dienst für die Bohrstock-Auswertung.")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse (Standard: nur lokal)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-stapel", type=int, default=256,
+                        help="höchstens so viele Profile je gemeinsamer Auswertung")
+    parser.add_argument("--wartezeit-ms", type=float, default=5.0,
+                        help="so lange wird nach dem ersten Profil auf weitere gewartet")
+    args = parser.parse_args(argv)
+
+    server = dienst_erstellen(args.host, args.port, args.max_stapel, args.wartezeit_ms / 1000)
+    print(f"Bohrstock-Dienst auf http://{args.host}:{server.server_port} (Strg+C beendet)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+"""
+Zwischenspeicher für geparste Eingabedateien als Arrow-IPC-Dateien (Feather v2).
+
+Das Einlesen großer Excel-Mappen mit openpyxl ist der langsamste Schritt.
+Das Ergebnis des Parsens (Horizont-Spalten je Zeile, Angaben je Bohrung)
+wird deshalb unter dem Inhalts-Hash der Datei und der Parser-Version
+abgelegt. Spätere Läufe bilden die Datei per mmap in den Speicher ab,
+statt die Mappe erneut zu lesen. Die Zahlen-Spalten sind dann NumPy-Sichten
+auf die abgebildete Datei (ohne Kopie), so dass sich mehrere Worker-Prozesse
+dieselben Seiten im Seiten-Cache des Betriebssystems teilen.
+
+Je Eintrag ein Verzeichnis <hash>-p<version> mit
+    zeilen.arrow     eine Zeile je Horizont (nur Zahlen, unkomprimiert)
+    bohrungen.arrow  eine Zeile je Bohrung, Metadaten als JSON im Schema
+
+Benötigt pyarrow; ohne pyarrow löst Eingabecache() einen ImportError aus.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+_META = b"bohrstock"
+
+
+class Eingabecache:
+    """Arrow-Cache in verzeichnis für Parser-Version version."""
+    __slots__ = ("verzeichnis", "version", "_pa")
+
+    def __init__(self, verzeichnis, version):
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Für den Eingabe-Cache wird pyarrow benötigt (pip install pyarrow).") from e
+        self._pa = pa
+        self.verzeichnis = verzeichnis
+        self.version = version
+        os.makedirs(verzeichnis, exist_ok=True)
+
+    def _pfad(self, kennung):
+        return os.path.join(self.verzeichnis, f"{kennung}-p{self.version}")
+
+    def laden(self, kennung):
+        """
+        (spalten, bohrungen, meta) oder None, wenn nichts abgelegt ist.
+        spalten: {Name: NumPy-Array}, schreibgeschützte Sichten auf die Datei.
+        """
+        pfad = self._pfad(kennung)
+        try:
+            zeilen = self._lesen(os.path.join(pfad, "zeilen.arrow"))
+            bohrungen = self._lesen(os.path.join(pfad, "bohrungen.arrow"))
+        except (OSError, self._pa.ArrowInvalid):
+            return None
+        spalten = {
+            name: zeilen.column(name).chunk(0).to_numpy(zero_copy_only=True)
+            if zeilen.column(name).num_chunks == 1 else zeilen.column(name).to_numpy()
+            for name in zeilen.column_names
+        }
+        meta = json.loads(bohrungen.schema.metadata[_META])
+        return spalten, bohrungen.to_pandas(), meta
+
+    def _lesen(self, pfad):
+        # Die Abbildung bleibt bestehen, solange die Tabelle (oder eine Sicht) lebt
+        return self._pa.ipc.open_file(self._pa.memory_map(pfad, "r")).read_all()
+
+    def speichern(self, kennung, spalten, bohrungen, meta):
+        """
+        Legt einen Eintrag ab. Gibt False zurück, wenn sich die Daten nicht
+        als Arrow darstellen lassen (z. B. gemischte Typen) – dann bleibt
+        die Datei eben ungecacht.
+        """
+        pa = self._pa
+        ziel = self._pfad(kennung)
+        if os.path.isdir(ziel):
+            return True
+        try:
+            # NaN als Wert (nicht als null) speichern, damit das Lesen ohne Kopie geht
+            zeilen = pa.table({name: pa.array(np.ascontiguousarray(werte)) for name, werte in spalten.items()})
+            tabelle = pa.Table.from_pandas(bohrungen, preserve_index=False)
+            tabelle = tabelle.replace_schema_metadata({_META: json.dumps(meta, ensure_ascii=False)})
+        except (TypeError, ValueError, pa.ArrowException):
+            return False
+
+        # Erst vollständig in ein temporäres Verzeichnis schreiben, dann umbenennen
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.verzeichnis)
+        try:
+            for name, tab in (("zeilen.arrow", zeilen), ("bohrungen.arrow", tabelle)):
+                with pa.OSFile(os.path.join(tmp, name), "wb") as senke, \
+                        pa.ipc.new_file(senke, tab.schema) as schreiber:
+                    schreiber.write_table(tab)
+            os.rename(tmp, ziel)
+        except OSError:
+            # Ein anderer Prozess war schneller (oder die Platte ist voll)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return os.path.isdir(ziel)
+        return True
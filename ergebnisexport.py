@@ -0,0 +1,173 @@
+"""
+Streamender Export von Ergebnissen und Rechenwegen in mehrere Blätter.
+
+Die Daten kommen stückweise als {Blatt: DataFrame} (z. B. je Eingabedatei)
+und werden sofort geschrieben, so dass nie alle Zeilen gleichzeitig im
+Speicher liegen:
+
+    .xlsx     openpyxl im write-only-Modus, ein Tabellenblatt je Blatt
+    .parquet  eine Parquet-Datei je Blatt (benötigt pyarrow)
+    .csv      eine CSV-Datei je Blatt
+
+Bei Parquet und CSV heißt die Datei des ersten Blatts wie das Ziel, die
+übrigen erhalten den Blattnamen als Suffix (ergebnis_humus.parquet, …).
+
+    with Exportziel("ergebnis.xlsx") as ziel:
+        for teil in teile:
+            ziel.schreiben(teil)
+"""
+import os
+
+import pandas as pd
+
+from messung import stufe
+
+# Anzeigenamen der Tabellenblätter in Excel
+BLATT_TITEL = {
+    "ergebnisse":     "Ergebnisse",
+    "humus":          "Humusvorrat",
+    "nfk":            "nFK",
+    "kapillar":       "Kapillaraufstieg",
+    "kalk":           "Kalkbedarf",
+    "wasserhaushalt": "Wasserhaushalt",
+}
+FORMATE = (".xlsx", ".parquet", ".csv")
+
+
+class _Excel:
+    def __init__(self, pfad):
+        from openpyxl import Workbook
+        self.pfad = pfad
+        self.mappe = Workbook(write_only=True)
+        self.blaetter = {}
+
+    def anhaengen(self, blatt, frame, spalten):
+        tabelle = self.blaetter.get(blatt)
+        if tabelle is None:
+            tabelle = self.blaetter[blatt] = self.mappe.create_sheet(BLATT_TITEL.get(blatt, blatt)[:31])
+            tabelle.append(list(spalten))
+        # Als Python-Objekte mit None statt NaN, dann zeilenweise anhängen
+        werte = frame.astype(object).where(frame.notna(), None).to_numpy().tolist()
+        for zeile in werte:
+            tabelle.append(zeile)
+
+    def schliessen(self):
+        if not self.blaetter:
+            self.mappe.create_sheet(BLATT_TITEL["ergebnisse"])
+        self.mappe.save(self.pfad)
+
+
+class _Csv:
+    def __init__(self, pfad, fortsetzen=False):
+        self.pfad = pfad
+        self.fortsetzen = fortsetzen
+        self.dateien = {}
+        self.kopf = {}
+
+    def anhaengen(self, blatt, frame, spalten):
+        neu = blatt not in self.dateien
+        if neu:
+            self.dateien[blatt] = _blattpfad(self.pfad, blatt, len(self.dateien))
+            # Beim Fortsetzen vorhandener Dateien keine zweite Kopfzeile
+            if self.fortsetzen and os.path.exists(self.dateien[blatt]) and os.path.getsize(self.dateien[blatt]):
+                neu = False
+                self.kopf[blatt] = pd.read_csv(self.dateien[blatt], nrows=0).columns.tolist()
+        # An die Spalten der vorhandenen Datei ausrichten (ältere Ausgaben ohne neue Spalten)
+        if blatt in self.kopf:
+            frame = frame.reindex(columns=self.kopf[blatt])
+        frame.to_csv(self.dateien[blatt], mode="w" if neu else "a", header=neu, index=False)
+
+    def schliessen(self):
+        pass
+
+
+class _Parquet:
+    def __init__(self, pfad):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Für den Parquet-Export wird pyarrow benötigt (pip install pyarrow).") from e
+        self.pa, self.pq = pa, pq
+        self.pfad = pfad
+        self.schreiber = {}
+
+    def anhaengen(self, blatt, frame, spalten):
+        # Text-Spalten einheitlich als string, damit leere erste Teile kein null-Schema festlegen
+        frame = frame.astype({s: "string" for s in frame.columns if frame[s].dtype == object})
+        eintrag = self.schreiber.get(blatt)
+        if eintrag is None:
+            tabelle = self.pa.Table.from_pandas(frame, preserve_index=False)
+            pfad = _blattpfad(self.pfad, blatt, len(self.schreiber))
+            eintrag = self.schreiber[blatt] = self.pq.ParquetWriter(pfad, tabelle.schema)
+        else:
+            tabelle = self.pa.Table.from_pandas(frame, schema=eintrag.schema, preserve_index=False)
+        eintrag.write_table(tabelle)
+
+    def schliessen(self):
+        for schreiber in self.schreiber.values():
+            schreiber.close()
+
+
+def _blattpfad(pfad, blatt, nr):
+    if nr == 0:
+        return pfad
+    stamm, endung = os.path.splitext(pfad)
+    return f"{stamm}_{blatt}{endung}"
+
+
+def ausgabedateien(pfad):
+    """Alle Dateien, die ein Export nach pfad anlegen kann (Ziel und Blatt-Dateien)."""
+    return [pfad] + [_blattpfad(pfad, blatt, 1) for blatt in BLATT_TITEL]
+
+
+class Exportziel:
+    """
+    Schreibt Teile {Blatt: DataFrame} nacheinander in ein Exportziel (Format
+    nach Endung, siehe FORMATE; sonst .xlsx). Die Spalten eines Blatts legt
+    der erste Teil fest oder spalten={Blatt: [...]}; spätere Teile werden
+    darauf ausgerichtet. Ein Pfad kann bei .xlsx auch ein Dateiobjekt sein.
+    Mit fortsetzen=True (nur .csv) werden vorhandene Dateien ergänzt statt
+    überschrieben; die Zeilen folgen dann deren Kopfzeile.
+    """
+    def __init__(self, ziel, spalten=None, format=None, fortsetzen=False):
+        if format is None:
+            endung = os.path.splitext(ziel)[1].lower() if isinstance(ziel, str) else ".xlsx"
+            format = endung if endung in FORMATE else ".xlsx"
+            if isinstance(ziel, str) and endung not in FORMATE + (".xls",):
+                ziel += ".xlsx"
+        self.pfad = ziel
+        self.spalten = dict(spalten or {})
+        self.zeilen = {}
+        if fortsetzen and format != ".csv":
+            raise ValueError(f"Fortsetzen einer Ausgabe geht nur mit .csv, nicht mit {format}.")
+        if fortsetzen:
+            self._schreiber = _Csv(ziel, fortsetzen=True)
+        else:
+            self._schreiber = {".xlsx": _Excel, ".csv": _Csv, ".parquet": _Parquet}[format](ziel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, *exc):
+        self.schliessen()
+
+    def schreiben(self, teil):
+        """Hängt die DataFrames in teil ({Blatt: DataFrame}) an die Blätter an."""
+        with stufe("export", bohrungen=len(teil.get("ergebnisse", ()))):
+            for blatt, frame in teil.items():
+                spalten = self.spalten.setdefault(blatt, list(frame.columns))
+                self._schreiber.anhaengen(blatt, frame.reindex(columns=spalten), spalten)
+                self.zeilen[blatt] = self.zeilen.get(blatt, 0) + len(frame)
+
+    def schliessen(self):
+        with stufe("export"):
+            self._schreiber.schliessen()
+
+
+def exportieren(ziel, teile, spalten=None):
+    """Schreibt alle Teile nach ziel und gibt den Pfad zurück (siehe Exportziel)."""
+    with Exportziel(ziel, spalten) as export:
+        for teil in teile:
+            export.schreiben(teil)
+    return export.pfad
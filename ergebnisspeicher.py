@@ -0,0 +1,235 @@
+"""
+Dauerhafter Ergebnisspeicher für ausgewertete Bohrungen (SQLite).
+
+Je Bohrung werden Metadaten (Bohrstock-Nr., Rechts-/Hochwert, Bodenform),
+die verarbeiteten Horizonte und die Ergebnisse unter einem Schlüssel
+abgelegt, der aus den Eingaben berechnet wird (siehe
+HorizontTabelle.fingerabdruecke). Gleiche Eingaben überschreiben den
+vorhandenen Eintrag, so dass wiederholtes Speichern nichts verdoppelt und
+bereits ausgewertete Bohrungen übersprungen werden können.
+
+    with Ergebnisspeicher("ergebnisse.sqlite") as speicher:
+        speicher.speichern(ergebnisse, horizonte)
+        speicher.suchen(bohrung="B12", bbox=(xmin, ymin, xmax, ymax))
+"""
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+# Spalten der Ergebnistabelle: Anzeigename → Name in der Datenbank
+SPALTEN = {
+    "Schlüssel":                       "schluessel",
+    "Datei":                           "datei",
+    "Bohrung":                         "bohrung",
+    "Rechtswert":                      "rechtswert",
+    "Hochwert":                        "hochwert",
+    "Bodenform":                       "bodenform",
+    "Nutzungsart":                     "nutzungsart",
+    "Bodentyp":                        "bodentyp",
+    "Physiologische Gründigkeit (cm)": "phyto_tiefe",
+    "Humusvorrat bis 1 m (Mg/ha)":     "humusvorrat",
+    "pH Oberboden":                    "ph_oberboden",
+    "Kalkbedarf (dt CaO/ha)":          "kalkbedarf",
+    "nFK (mm)":                        "nfk",
+    "Kapillar-Rate (mm/d)":            "kap_rate",
+    "Kapillar-Rate mindestens (mm/d)": "kap_rate_groesser",
+    "Meldung":                         "meldung",
+}
+_ZAHLEN_SPALTEN = ("rechtswert", "hochwert", "phyto_tiefe", "humusvorrat",
+                   "ph_oberboden", "kalkbedarf", "nfk", "kap_rate", "kap_rate_groesser")
+# Bei jeder Änderung an den gespeicherten Ergebnissen erhöhen und in die
+# Schlüssel (fingerabdruecke) aufnehmen, damit alte Einträge neu berechnet werden
+ERGEBNIS_VERSION = 2
+HORIZONT_SPALTEN = ("hz", "z_top", "z_bot", "bd", "humus", "pH", "Bodenart", "skelett")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ergebnisse (
+    schluessel   TEXT PRIMARY KEY,
+    datei        TEXT,
+    bohrung      TEXT,
+    rechtswert   REAL,
+    hochwert     REAL,
+    bodenform    TEXT,
+    nutzungsart  TEXT,
+    bodentyp     TEXT,
+    phyto_tiefe  REAL,
+    humusvorrat  REAL,
+    ph_oberboden REAL,
+    kalkbedarf   REAL,
+    nfk          REAL,
+    kap_rate     REAL,
+    kap_rate_groesser REAL,
+    meldung      TEXT,
+    gespeichert  REAL
+);
+CREATE INDEX IF NOT EXISTS ergebnisse_bohrung ON ergebnisse (bohrung);
+CREATE INDEX IF NOT EXISTS ergebnisse_lage ON ergebnisse (rechtswert, hochwert);
+CREATE TABLE IF NOT EXISTS horizonte (
+    schluessel TEXT NOT NULL REFERENCES ergebnisse (schluessel) ON DELETE CASCADE,
+    nr         INTEGER NOT NULL,
+    hz         TEXT,
+    z_top      REAL,
+    z_bot      REAL,
+    bd         REAL,
+    humus      REAL,
+    pH         REAL,
+    Bodenart   TEXT,
+    skelett    REAL,
+    PRIMARY KEY (schluessel, nr)
+) WITHOUT ROWID;
+"""
+
+# Spalten, die älteren Speichern fehlen können (ALTER TABLE beim Öffnen)
+_NACHTRAEGLICH = {"kap_rate_groesser": "REAL"}
+
+# SQLite begrenzt die Zahl der Parameter je Anweisung
+_IN_BLOCK = 900
+
+
+def _sql_wert(wert):
+    """NaN/NA → NULL, NumPy-Skalare → Python-Werte."""
+    if wert is None or (not isinstance(wert, str) and pd.isna(wert)):
+        return None
+    return wert.item() if isinstance(wert, np.generic) else wert
+
+
+def _zeilen(frame, spalten):
+    werte = frame[list(spalten)].astype(object).to_numpy()
+    return [tuple(_sql_wert(w) for w in zeile) for zeile in werte]
+
+
+class Ergebnisspeicher:
+    """
+    SQLite-Datei mit den Tabellen "ergebnisse" (eine Zeile je Schlüssel,
+    Indizes auf Bohrung und Koordinaten) und "horizonte". Mehrere Prozesse
+    dürfen gleichzeitig lesen und schreiben (WAL, Wartezeit timeout).
+    """
+    __slots__ = ("pfad", "_verbindung")
+
+    def __init__(self, pfad="ergebnisse.sqlite", timeout=60.0):
+        self.pfad = pfad
+        self._verbindung = sqlite3.connect(pfad, timeout=timeout, check_same_thread=False)
+        self._verbindung.execute("PRAGMA journal_mode=WAL")
+        self._verbindung.execute("PRAGMA synchronous=NORMAL")
+        self._verbindung.execute("PRAGMA foreign_keys=ON")
+        self._verbindung.executescript(_SCHEMA)
+        vorhanden = {z[1] for z in self._verbindung.execute("PRAGMA table_info(ergebnisse)")}
+        with self._verbindung:
+            for spalte, typ in _NACHTRAEGLICH.items():
+                if spalte not in vorhanden:
+                    self._verbindung.execute(f"ALTER TABLE ergebnisse ADD COLUMN {spalte} {typ}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._verbindung.execute("SELECT COUNT(*) FROM ergebnisse").fetchone()[0]
+
+    def __repr__(self):
+        return f"Ergebnisspeicher({self.pfad!r}, {len(self)} Bohrungen)"
+
+    def close(self):
+        self._verbindung.close()
+
+    def _in_bloecken(self, sql, schluessel):
+        """Führt sql mit "IN (...)" blockweise über schluessel aus."""
+        schluessel = list(dict.fromkeys(schluessel))
+        for i in range(0, len(schluessel), _IN_BLOCK):
+            teil = schluessel[i:i + _IN_BLOCK]
+            yield from self._verbindung.execute(
+                sql.format(",".join("?" * len(teil))), teil
+            )
+
+    def vorhandene(self, schluessel):
+        """Teilmenge von schluessel, die bereits gespeichert ist."""
+        return {z[0] for z in self._in_bloecken(
+            "SELECT schluessel FROM ergebnisse WHERE schluessel IN ({})", schluessel
+        )}
+
+    def speichern(self, ergebnisse, horizonte=None):
+        """
+        Fügt Ergebnisse (Spalten wie SPALTEN, mindestens "Schlüssel") in einer
+        Transaktion ein oder ersetzt vorhandene Einträge mit gleichem
+        Schlüssel. horizonte (optional) hat die Spalten "Schlüssel" und
+        HORIZONT_SPALTEN; die Horizonte dieser Schlüssel werden ersetzt.
+        Gibt die Zahl der gespeicherten Ergebnisse zurück.
+        """
+        ergebnisse = ergebnisse.reindex(columns=list(SPALTEN))
+        ergebnisse = ergebnisse[ergebnisse["Schlüssel"].notna()]
+        spalten = list(SPALTEN.values()) + ["gespeichert"]
+        zeilen = [z + (time.time(),) for z in _zeilen(ergebnisse, SPALTEN)]
+        aktualisieren = ", ".join(f"{s} = excluded.{s}" for s in spalten[1:])
+        with self._verbindung:
+            self._verbindung.executemany(
+                f"INSERT INTO ergebnisse ({', '.join(spalten)}) "
+                f"VALUES ({', '.join('?' * len(spalten))}) "
+                f"ON CONFLICT (schluessel) DO UPDATE SET {aktualisieren}",
+                zeilen,
+            )
+            if horizonte is not None:
+                horizonte = horizonte[horizonte["Schlüssel"].isin(ergebnisse["Schlüssel"])]
+                nr = horizonte.groupby("Schlüssel", sort=False).cumcount()
+                schluessel = horizonte["Schlüssel"].unique().tolist()
+                for i in range(0, len(schluessel), _IN_BLOCK):
+                    teil = schluessel[i:i + _IN_BLOCK]
+                    self._verbindung.execute(
+                        f"DELETE FROM horizonte WHERE schluessel IN ({','.join('?' * len(teil))})", teil
+                    )
+                self._verbindung.executemany(
+                    f"INSERT INTO horizonte VALUES ({', '.join('?' * (len(HORIZONT_SPALTEN) + 2))})",
+                    _zeilen(horizonte.assign(nr=nr), ("Schlüssel", "nr") + HORIZONT_SPALTEN),
+                )
+        return len(zeilen)
+
+    def _abfrage(self, bedingung="", parameter=(), grenze=None):
+        sql = f"SELECT {', '.join(SPALTEN.values())}, gespeichert FROM ergebnisse"
+        if bedingung:
+            sql += f" WHERE {bedingung}"
+        sql += " ORDER BY bohrung, gespeichert"
+        if grenze is not None:
+            sql += f" LIMIT {int(grenze)}"
+        frame = pd.read_sql_query(sql, self._verbindung, params=list(parameter))
+        for spalte in _ZAHLEN_SPALTEN:
+            frame[spalte] = pd.to_numeric(frame[spalte]).astype(float)
+        frame["gespeichert"] = pd.to_datetime(frame["gespeichert"], unit="s")
+        return frame.rename(columns={v: k for k, v in SPALTEN.items()} | {"gespeichert": "Gespeichert"})
+
+    def ergebnisse(self, schluessel):
+        """Gespeicherte Ergebnisse zu schluessel (Spalten wie SPALTEN)."""
+        schluessel = list(schluessel)
+        teile = [
+            self._abfrage(f"schluessel IN ({','.join('?' * len(schluessel[i:i + _IN_BLOCK]))})",
+                          schluessel[i:i + _IN_BLOCK])
+            for i in range(0, len(schluessel), _IN_BLOCK)
+        ]
+        return pd.concat(teile, ignore_index=True) if teile else self._abfrage("0")
+
+    def suchen(self, bohrung=None, bbox=None, grenze=None):
+        """
+        Ergebnisse nach Bohrstock-Nr. (genau, oder Muster mit * und ?) und/oder
+        innerhalb bbox = (xmin, ymin, xmax, ymax). Ohne Angaben: alle.
+        """
+        bedingungen, parameter = [], []
+        if bohrung:
+            if any(z in bohrung for z in "*?"):
+                bedingungen.append("bohrung GLOB ?")
+            else:
+                bedingungen.append("bohrung = ?")
+            parameter.append(str(bohrung))
+        if bbox is not None:
+            bedingungen.append("rechtswert BETWEEN ? AND ? AND hochwert BETWEEN ? AND ?")
+            xmin, ymin, xmax, ymax = bbox
+            parameter += [xmin, xmax, ymin, ymax]
+        return self._abfrage(" AND ".join(bedingungen), parameter, grenze)
+
+    def horizonte(self, schluessel):
+        """Gespeicherte Horizonte einer Bohrung als DataFrame wie build_horizonte_frame()."""
+        return pd.read_sql_query(
+            f"SELECT {', '.join(HORIZONT_SPALTEN)} FROM horizonte WHERE schluessel = ? ORDER BY nr",
+            self._verbindung, params=[schluessel],
+        )
@@ -0,0 +1,162 @@
+"""
+Zeitmessung je Verarbeitungsstufe (Einlesen, Horizonte, Humus, nFK, Kalk,
+Kapillaraufstieg, Export …) mit Zählern für Horizonte und Bohrungen.
+
+Gemessen wird nur innerhalb von messen(); sonst liefert stufe() ein
+wiederverwendetes Leerobjekt und kostet praktisch nichts:
+
+    with messen(profil=True) as messung:
+        with stufe("humus", horizonte=n, bohrungen=m):
+            ...
+    messung.als_frame()          # Summen je Stufe
+    messung.json_zeilen()        # eine JSON-Zeile je Messpunkt
+    messung.profil_schreiben("lauf.prof")
+"""
+import cProfile
+import contextlib
+import contextvars
+import functools
+import io
+import json
+import marshal
+import pstats
+import time
+
+import pandas as pd
+
+_AKTIV = contextvars.ContextVar("messung", default=None)
+
+
+class _Aus:
+    """Leere Stufe, wenn keine Messung aktiv ist."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def zaehlen(self, horizonte=0, bohrungen=0):
+        pass
+
+_AUS = _Aus()
+
+
+class _Stufe:
+    __slots__ = ("messung", "eintrag", "_start")
+
+    def __init__(self, messung, name, horizonte, bohrungen):
+        self.messung = messung
+        self.eintrag = {"stufe": name, "sekunden": 0.0, "horizonte": horizonte, "bohrungen": bohrungen}
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.eintrag["sekunden"] = time.perf_counter() - self._start
+        self.messung.eintraege.append(self.eintrag)
+        return False
+
+    def zaehlen(self, horizonte=0, bohrungen=0):
+        """Zähler nachträglich erhöhen, wenn die Mengen erst in der Stufe bekannt werden."""
+        self.eintrag["horizonte"] += horizonte
+        self.eintrag["bohrungen"] += bohrungen
+
+
+class Messung:
+    """
+    Gesammelte Messpunkte (dicts mit stufe, sekunden, horizonte, bohrungen)
+    und optional ein cProfile-Profil des gemessenen Laufs.
+    """
+    __slots__ = ("eintraege", "profil")
+
+    def __init__(self):
+        self.eintraege = []
+        self.profil = None
+
+    def __len__(self):
+        return len(self.eintraege)
+
+    def stufe(self, name, horizonte=0, bohrungen=0):
+        return _Stufe(self, name, horizonte, bohrungen)
+
+    def uebernehmen(self, eintraege, **zusatz):
+        """Messpunkte aus einem anderen Prozess anhängen (z. B. mit datei=…)."""
+        self.eintraege.extend({**e, **zusatz} for e in eintraege)
+
+    def als_frame(self):
+        """Summen je Stufe in der Reihenfolge des ersten Auftretens."""
+        spalten = ["stufe", "aufrufe", "sekunden", "horizonte", "bohrungen", "horizonte_pro_s"]
+        if not self.eintraege:
+            return pd.DataFrame(columns=spalten)
+        frame = pd.DataFrame(self.eintraege).groupby("stufe", sort=False).agg(
+            aufrufe=("sekunden", "size"), sekunden=("sekunden", "sum"),
+            horizonte=("horizonte", "sum"), bohrungen=("bohrungen", "sum"),
+        ).reset_index()
+        frame["horizonte_pro_s"] = (frame["horizonte"] / frame["sekunden"]).where(frame["horizonte"] > 0)
+        return frame[spalten]
+
+    def json_zeilen(self, **zusatz):
+        """Eine JSON-Zeile je Messpunkt, ergänzt um zusatz."""
+        for eintrag in self.eintraege:
+            yield json.dumps({**eintrag, **zusatz, "sekunden": round(eintrag["sekunden"], 6)},
+                             ensure_ascii=False)
+
+    def profil_text(self, anzahl=25, sortierung="cumulative"):
+        """Die teuersten Funktionen des Profils als Text (leer ohne Profil)."""
+        if self.profil is None:
+            return ""
+        puffer = io.StringIO()
+        pstats.Stats(self.profil, stream=puffer).sort_stats(sortierung).print_stats(anzahl)
+        return puffer.getvalue()
+
+    def profil_daten(self):
+        """Profil im pstats-Format als Bytes (z. B. für einen Download)."""
+        return marshal.dumps(pstats.Stats(self.profil).stats)
+
+    def profil_schreiben(self, pfad):
+        """Profil im pstats-Format schreiben (z. B. für snakeviz oder python -m pstats)."""
+        with open(pfad, "wb") as f:
+            f.write(self.profil_daten())
+        return pfad
+
+
+@contextlib.contextmanager
+def messen(profil=False, messung=None):
+    """Aktiviert eine Messung für den Block (im aktuellen Thread/Kontext)."""
+    messung = messung if messung is not None else Messung()
+    token = _AKTIV.set(messung)
+    profiler = cProfile.Profile() if profil else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield messung
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            messung.profil = profiler
+        _AKTIV.reset(token)
+
+
+def stufe(name, horizonte=0, bohrungen=0):
+    """Kontextmanager für eine Stufe; ohne aktive Messung ein Leerobjekt."""
+    messung = _AKTIV.get()
+    if messung is None:
+        return _AUS
+    return messung.stufe(name, horizonte, bohrungen)
+
+
+def gemessen(name):
+    """Dekorator: misst jeden Aufruf der Funktion als Stufe name."""
+    def dekorator(funktion):
+        @functools.wraps(funktion)
+        def wrapper(*args, **kwargs):
+            messung = _AKTIV.get()
+            if messung is None:
+                return funktion(*args, **kwargs)
+            with messung.stufe(name):
+                return funktion(*args, **kwargs)
+        return wrapper
+    return dekorator
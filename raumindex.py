@@ -0,0 +1,248 @@
+"""
+Räumlicher Index über ausgewertete Bohrungen (Rechtswert/Hochwert).
+
+Die Bohrpunkte werden in ein regelmäßiges Gitter einsortiert (Zellen als
+CSR-Struktur über die nach Zelle sortierten Punkte). Abfragen werden nach
+ihrer Gitterzelle gruppiert; je Zelle wird nur ein Block benachbarter
+Zellen geprüft und so lange vergrößert, bis das Ergebnis sicher ist.
+Das ergibt exakte Nächste-Nachbarn- und Umkreissuchen ohne Abstandsmatrix
+über alle Punktpaare und reicht für IDW-Raster mit 1 m Auflösung.
+"""
+import numpy as np
+import pandas as pd
+
+# Standard-Spalten für raster_aus_ergebnissen()
+RASTER_SPALTEN = {
+    "kalkbedarf": "Kalkbedarf (dt CaO/ha)",
+    "humusvorrat": "Humusvorrat bis 1 m (Mg/ha)",
+    "nfk": "nFK (mm)",
+}
+
+
+class Raumindex:
+    """
+    Gitterindex über Punkte (x = Rechtswert, y = Hochwert, in Metern).
+    Punkte ohne Koordinaten werden übergangen; alle zurückgegebenen
+    Indizes beziehen sich auf die Reihenfolge der Eingabe.
+    zellgroesse: Kantenlänge der Gitterzellen, Standard so, dass im Mittel
+    etwa punkte_je_zelle Punkte in eine Zelle fallen.
+    """
+    __slots__ = ("x", "y", "zellgroesse", "x0", "y0", "nx", "ny", "zell_start", "punkte")
+
+    def __init__(self, x, y, zellgroesse=None, punkte_je_zelle=8):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        gueltig = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        n = max(len(gueltig), 1)
+        self.x, self.y = x, y
+        self.x0, self.y0 = (x[gueltig].min(), y[gueltig].min()) if len(gueltig) else (0.0, 0.0)
+        breite = x[gueltig].max() - self.x0 if len(gueltig) else 0.0
+        hoehe = y[gueltig].max() - self.y0 if len(gueltig) else 0.0
+        if zellgroesse is None:
+            # bei Punkten auf einer Linie zählt die Länge statt der Fläche
+            flaeche = max(breite * hoehe, max(breite, hoehe, 1.0) ** 2 / n)
+            zellgroesse = np.sqrt(flaeche * punkte_je_zelle / n)
+        self.zellgroesse = float(zellgroesse)
+        self.nx = int(breite // self.zellgroesse) + 1
+        self.ny = int(hoehe // self.zellgroesse) + 1
+
+        # Punkte nach Zelle sortieren, zell_start[z] ist der erste Punkt der Zelle z
+        zelle = self._zellen(x[gueltig], y[gueltig])
+        zelle = zelle[1] * self.nx + zelle[0]
+        order = np.argsort(zelle, kind="stable")
+        self.punkte = gueltig[order]
+        self.zell_start = np.searchsorted(zelle[order], np.arange(self.nx * self.ny + 1))
+
+    def __len__(self):
+        return len(self.punkte)
+
+    def _zellen(self, qx, qy):
+        """Gitterspalte und -zeile (auch außerhalb des Gitters)."""
+        return (
+            np.floor((qx - self.x0) / self.zellgroesse).astype(np.int64),
+            np.floor((qy - self.y0) / self.zellgroesse).astype(np.int64),
+        )
+
+    def _block(self, cx, cy, r):
+        """Punkte aller Zellen im Quadrat mit Radius r (in Zellen) um (cx, cy)."""
+        x_von, x_bis = max(cx - r, 0), min(cx + r, self.nx - 1)
+        if x_von > x_bis:
+            return self.punkte[:0]
+        teile = [
+            self.punkte[self.zell_start[zy * self.nx + x_von]:self.zell_start[zy * self.nx + x_bis + 1]]
+            for zy in range(max(cy - r, 0), min(cy + r, self.ny - 1) + 1)
+        ]
+        return np.concatenate(teile) if teile else self.punkte[:0]
+
+    def _je_zelle(self, qx, qy):
+        """Gruppiert Abfragen nach Gitterzelle → (cx, cy, Positionen der Abfragen)."""
+        cx, cy = self._zellen(qx, qy)
+        schluessel = (cy - cy.min()) * (cx.max() - cx.min() + 1) + (cx - cx.min())
+        order = np.argsort(schluessel, kind="stable")
+        grenzen = np.flatnonzero(np.diff(schluessel[order])) + 1
+        for teil in np.split(order, grenzen):
+            yield int(cx[teil[0]]), int(cy[teil[0]]), teil
+
+    def _abstand_zum_gitter(self, cx, cy):
+        """Wie viele Zellen eine Zelle außerhalb des Gitters liegt (0 innerhalb)."""
+        return max(-cx, cx - (self.nx - 1), -cy, cy - (self.ny - 1), 0)
+
+    def _k_bloecke(self, qx, qy, k):
+        """
+        Je Abfragezelle (Positionen, Kandidaten, quadrierte Abstände, Grenze)
+        mit einem Block, der die k nächsten Punkte sicher enthält; Grenze ist
+        der quadrierte Abstand des k-ten Nachbarn (None ohne Punkte).
+        """
+        for cx, cy, pos in self._je_zelle(qx, qy):
+            # Block so lange vergrößern, bis der k-te Nachbar näher liegt als der Blockrand
+            r = self._abstand_zum_gitter(cx, cy) + 1
+            while True:
+                kandidaten = self._block(cx, cy, r)
+                d2 = (qx[pos, None] - self.x[kandidaten]) ** 2 + (qy[pos, None] - self.y[kandidaten]) ** 2
+                alles = (
+                    cx - r <= 0 and cx + r >= self.nx - 1 and cy - r <= 0 and cy + r >= self.ny - 1
+                )
+                m = min(k, len(kandidaten))
+                if m == k or alles:
+                    grenze = np.partition(d2, m - 1, axis=1)[:, m - 1] if m else None
+                    if alles or grenze.max() <= (r * self.zellgroesse) ** 2:
+                        yield pos, kandidaten, d2, grenze
+                        break
+                r += 1
+
+    def naechste(self, qx, qy, k=1):
+        """
+        Die k nächsten Punkte je Abfragepunkt.
+        Gibt (abstand, index) als Arrays der Form (Abfragen, k) zurück,
+        aufsteigend nach Abstand; fehlende Nachbarn haben inf bzw. -1.
+        """
+        qx = np.atleast_1d(np.asarray(qx, dtype=float))
+        qy = np.atleast_1d(np.asarray(qy, dtype=float))
+        abstand = np.full((len(qx), k), np.inf)
+        index = np.full((len(qx), k), -1, dtype=np.int64)
+        if not len(self.punkte):
+            return abstand, index
+
+        for pos, kandidaten, d2, grenze in self._k_bloecke(qx, qy, k):
+            m = min(k, len(kandidaten))
+            if not m:
+                continue
+            if len(kandidaten) > m:
+                wahl = np.argpartition(d2, m - 1, axis=1)[:, :m]
+            else:
+                wahl = np.broadcast_to(np.arange(m), (len(pos), m))
+            d_wahl = np.take_along_axis(d2, wahl, axis=1)
+            sortiert = np.argsort(d_wahl, axis=1, kind="stable")
+            abstand[pos, :m] = np.sqrt(np.take_along_axis(d_wahl, sortiert, axis=1))
+            index[pos, :m] = kandidaten[np.take_along_axis(wahl, sortiert, axis=1)]
+        return abstand, index
+
+    def im_umkreis(self, qx, qy, radius):
+        """Liste mit den Indizes aller Punkte im Abstand ≤ radius je Abfragepunkt."""
+        qx = np.atleast_1d(np.asarray(qx, dtype=float))
+        qy = np.atleast_1d(np.asarray(qy, dtype=float))
+        treffer = [self.punkte[:0]] * len(qx)
+        r = int(np.ceil(radius / self.zellgroesse))
+        for cx, cy, pos in self._je_zelle(qx, qy):
+            kandidaten = self._block(cx, cy, r)
+            if not len(kandidaten):
+                continue
+            d = np.hypot(qx[pos, None] - self.x[kandidaten], qy[pos, None] - self.y[kandidaten])
+            for i, zeile in zip(pos, d <= radius):
+                treffer[i] = np.sort(kandidaten[zeile])
+        return treffer
+
+
+def idw(index, werte, qx, qy, k=8, potenz=2.0, radius=None):
+    """
+    Inverse-Distanz-Gewichtung aus den k nächsten Punkten (optional nur
+    innerhalb von radius); bei gleichem Abstand zum k-ten Nachbarn zählen
+    alle gleich weit entfernten Punkte. Fällt ein Abfragepunkt auf
+    Bohrpunkte, gilt deren Mittel. Ohne Nachbarn ist das Ergebnis NaN.
+    index muss über die Punkte mit gültigem Wert aufgebaut sein.
+    """
+    werte = np.asarray(werte, dtype=float)
+    qx = np.atleast_1d(np.asarray(qx, dtype=float))
+    qy = np.atleast_1d(np.asarray(qy, dtype=float))
+    ergebnis = np.full(len(qx), np.nan)
+    if not len(index):
+        return ergebnis
+
+    for pos, kandidaten, d2, grenze in index._k_bloecke(qx, qy, k):
+        if grenze is None:
+            continue
+        maske = d2 <= grenze[:, None]
+        if radius is not None:
+            maske &= d2 <= radius ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gewicht = (np.reciprocal(d2) if potenz == 2 else d2 ** (-potenz / 2)) * maske
+            summe = gewicht.sum(axis=1)
+            wert = (gewicht @ werte[kandidaten]) / summe
+            # Abfragen direkt auf Bohrpunkten (Gewicht unendlich): Mittel dieser Punkte
+            genau = np.flatnonzero(np.isinf(summe))
+            if len(genau):
+                treffer = d2[genau] == 0
+                wert[genau] = (treffer @ werte[kandidaten]) / treffer.sum(axis=1)
+        ergebnis[pos] = np.where(summe > 0, wert, np.nan)
+    return ergebnis
+
+
+def raster_gitter(bbox, aufloesung=1.0):
+    """
+    Zellmittelpunkte eines Rasters über bbox = (xmin, ymin, xmax, ymax).
+    Zeile 0 liegt im Norden. Gibt (x_mitten, y_mitten) zurück.
+    """
+    xmin, ymin, xmax, ymax = bbox
+    nx = max(int(np.ceil((xmax - xmin) / aufloesung)), 1)
+    ny = max(int(np.ceil((ymax - ymin) / aufloesung)), 1)
+    return xmin + (np.arange(nx) + 0.5) * aufloesung, ymax - (np.arange(ny) + 0.5) * aufloesung
+
+
+def idw_raster(x, y, werte, bbox, aufloesung=1.0, k=8, potenz=2.0, radius=None):
+    """
+    IDW-Raster der Werte über bbox = (xmin, ymin, xmax, ymax) in Metern.
+    Punkte ohne Koordinaten oder Wert werden übergangen.
+    Gibt ein Array (Zeilen von Nord nach Süd × Spalten) zurück.
+    """
+    werte = np.asarray(werte, dtype=float)
+    x = np.where(np.isnan(werte), np.nan, np.asarray(x, dtype=float))
+    index = Raumindex(x, y)
+    xs, ys = raster_gitter(bbox, aufloesung)
+    gx, gy = np.meshgrid(xs, ys)
+    return idw(index, werte, gx.ravel(), gy.ravel(), k, potenz, radius).reshape(gx.shape)
+
+
+def raster_aus_ergebnissen(ergebnisse, bbox=None, aufloesung=1.0, spalten=None,
+                           x_spalte="Rechtswert", y_spalte="Hochwert", k=8, potenz=2.0):
+    """
+    IDW-Raster je Ergebnisspalte (Standard: Kalkbedarf, Humusvorrat, nFK)
+    aus einer Ergebnistabelle mit Koordinaten. bbox: Standard ist die
+    Ausdehnung der Bohrpunkte. Gibt (bbox, {Name: Raster}) zurück.
+    """
+    spalten = spalten or RASTER_SPALTEN
+    x = pd.to_numeric(ergebnisse[x_spalte], errors="coerce").to_numpy(dtype=float)
+    y = pd.to_numeric(ergebnisse[y_spalte], errors="coerce").to_numpy(dtype=float)
+    if bbox is None:
+        ok = np.isfinite(x) & np.isfinite(y)
+        if not ok.any():
+            raise ValueError(f"Keine Bohrung mit Koordinaten in {x_spalte!r}/{y_spalte!r}.")
+        bbox = (x[ok].min(), y[ok].min(), x[ok].max(), y[ok].max())
+    raster = {
+        name: idw_raster(
+            x, y, pd.to_numeric(ergebnisse[spalte], errors="coerce"), bbox, aufloesung, k, potenz
+        )
+        for name, spalte in spalten.items()
+    }
+    return bbox, raster
+
+
+def ascii_grid_schreiben(pfad, raster, bbox, aufloesung=1.0, nodata=-9999.0):
+    """Schreibt ein Raster als ESRI-ASCII-Grid (.asc), lesbar z. B. in QGIS."""
+    xmin, ymin, _, ymax = bbox
+    zeilen, spalten = raster.shape
+    with open(pfad, "w", encoding="ascii") as f:
+        f.write(f"ncols {spalten}\nnrows {zeilen}\n")
+        f.write(f"xllcorner {xmin}\nyllcorner {ymax - zeilen * aufloesung}\n")
+        f.write(f"cellsize {aufloesung}\nNODATA_value {nodata:g}\n")
+        np.savetxt(f, np.where(np.isnan(raster), nodata, raster), fmt="%.3f")
+    return pfad
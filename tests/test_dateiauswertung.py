@@ -0,0 +1,32 @@
+import pandas as pd
+
+from dateiauswertung import main
+
+
+def _eingabe(pfad):
+    pd.DataFrame({
+        "Bohrung":                  [1, 1, 2, 2, 3],
+        "Horizont":                 ["Ap", "Bv", "Ap", "Gr", "Ap"],
+        "Tiefe (cm)":               ["0-30", "30-100", "0-40", "40-100", "0-100"],
+        "Trockenrohdichte (g/cm³)": [1.3, 1.5, 1.25, 1.6, 1.4],
+        "Skelett (%)":              [5, 10, 0, 0, 2],
+        "Humus (%)":                [2.1, 0.5, 3.0, 0.4, 1.8],
+        "pH":                       [5.6, 6.0, 5.1, 6.2, 6.8],
+        "Bodenart":                 ["Ls2", "Ls3", "Ut3", "Tu3", "Su3"],
+    }).to_excel(pfad, index=False)
+
+
+def test_speicher_mit_numerischen_bohrungen(tmp_path):
+    eingabe = tmp_path / "feld.xlsx"
+    _eingabe(eingabe)
+    speicher = str(tmp_path / "ergebnisse.sqlite")
+    erster, zweiter = str(tmp_path / "erster.csv"), str(tmp_path / "zweiter.csv")
+
+    # Der zweite Lauf übernimmt alle Bohrungen aus dem Speicher
+    assert main([str(eingabe), "-o", erster, "--speicher", speicher, "-j", "1"]) == 0
+    assert main([str(eingabe), "-o", zweiter, "--speicher", speicher, "-j", "1"]) == 0
+
+    a, b = pd.read_csv(erster), pd.read_csv(zweiter)
+    assert a["Fehler"].isna().all()
+    assert a["Bohrung"].tolist() == [1, 2, 3]
+    pd.testing.assert_frame_equal(a, b)
@@ -0,0 +1,152 @@
+"""
+Tägliche Bodenwasserbilanz über eine Saison (Bucket-Modell) für viele
+Bohrungen gleichzeitig.
+
+Je Bohrung ist die nFK (mm) der Speicher und die Kapillar-Aufstiegsrate
+(mm/d) die tägliche Nachlieferung aus dem Grundwasser. Angetrieben wird das
+Modell von einer Wetterreihe (Niederschlag und Verdunstung in mm/d, z. B.
+aus einer CSV mit den Spalten Datum, Niederschlag, ET). Gerechnet wird Tag
+für Tag auf Arrays über alle Bohrungen, der Verlauf hat die Form
+Bohrungen × Tage:
+
+    wetter = wetter_lesen("wetter_2024.csv")
+    bilanz = bodenwasser_bilanz(nfk, kap_rate, wetter["Niederschlag"], wetter["ET"])
+    bilanz["defizit_tage"], bilanz["kapillar_mm"]
+"""
+import numpy as np
+import pandas as pd
+
+# Erkennung der Wetterspalten (Spaltenname klein, beginnt mit …; Datum nur
+# bei genauer Übereinstimmung, sonst träfe "tag" z. B. "Tagesniederschlag")
+WETTER_SPALTEN = {
+    "Datum":        ("datum", "date", "tag"),
+    "Niederschlag": ("niederschlag", "regen", "n_mm", "precip"),
+    "ET":           ("et", "verdunstung", "evapo"),
+}
+
+# Ergebnisspalten von bilanz_aus_ergebnissen()
+BILANZ_SPALTEN = {
+    "defizit_tage":   "Defizittage",
+    "defizit_mm":     "Defizit Saison (mm)",
+    "kapillar_mm":    "Kapillare Nachlieferung Saison (mm)",
+    "sickerung_mm":   "Sickerung Saison (mm)",
+    "speicher_ende":  "Bodenwasser Saisonende (mm)",
+}
+
+
+def _wetterspalte(spalten, name):
+    for muster in WETTER_SPALTEN[name]:
+        for spalte in spalten:
+            text = str(spalte).strip().lower()
+            if text == muster or (name != "Datum" and text.startswith(muster)):
+                return spalte
+    return None
+
+
+def wetter_lesen(quelle):
+    """
+    Liest eine Wetterreihe (CSV-Pfad, Dateiobjekt oder DataFrame) mit einer
+    Zeile je Tag. Gibt einen DataFrame mit Datum (falls vorhanden),
+    Niederschlag und ET in mm/d zurück; fehlende Tageswerte zählen als 0.
+    """
+    df = quelle if isinstance(quelle, pd.DataFrame) else pd.read_csv(quelle, sep=None, engine="python")
+    wetter = pd.DataFrame(index=range(len(df)))
+    for name in WETTER_SPALTEN:
+        spalte = _wetterspalte(df.columns, name)
+        if spalte is None:
+            if name == "Datum":
+                continue
+            raise KeyError(f"Wetterdaten: keine Spalte für {name} ({', '.join(WETTER_SPALTEN[name])}…)")
+        werte = df[spalte].to_numpy()
+        if name == "Datum":
+            wetter[name] = pd.to_datetime(werte, errors="coerce", dayfirst=True)
+        else:
+            werte = pd.Series(werte).astype(str).str.replace(",", ".", regex=False)
+            wetter[name] = pd.to_numeric(werte, errors="coerce").fillna(0.0).clip(lower=0.0).to_numpy()
+    return wetter
+
+
+def bodenwasser_bilanz(nfk, kap_rate, niederschlag, et, anfang=1.0, verlauf=False, kap_mindestens=None):
+    """
+    Bucket-Modell je Bohrung und Tag:
+
+        S' = S + Niederschlag − ET
+        kapillar = min(kap_rate, nFK − S')     (nur bei S' < nFK)
+        S' < 0   → Defizittag, Fehlmenge −S', S = 0
+        S' > nFK → Überschuss versickert, S = nFK
+
+    nfk, kap_rate: je Bohrung (mm bzw. mm/d; kap_rate NaN = kein Aufstieg).
+    kap_mindestens: je Bohrung die Untergrenze x bei Tabellenwerten ">x"
+    (mm/d); wo kap_rate NaN ist, wird konservativ mit x gerechnet.
+    niederschlag, et: je Tag (mm/d). anfang: Füllung am ersten Tag als
+    Anteil der nFK. Bohrungen ohne nFK ergeben NaN.
+    Gibt ein dict mit Arrays je Bohrung zurück (defizit_tage, defizit_mm,
+    kapillar_mm, sickerung_mm, speicher_ende) und mit verlauf=True
+    zusätzlich "speicher" (Bohrungen × Tage, Füllung am Tagesende).
+    """
+    nfk = np.asarray(nfk, dtype=float)
+    kap = np.asarray(kap_rate, dtype=float)
+    if kap_mindestens is not None:
+        kap = np.where(np.isnan(kap), np.asarray(kap_mindestens, dtype=float), kap)
+    kap = np.nan_to_num(kap, nan=0.0).clip(min=0.0)
+    netto = np.asarray(niederschlag, dtype=float) - np.asarray(et, dtype=float)
+    n, tage = len(nfk), len(netto)
+
+    gueltig = np.isfinite(nfk)
+    kapazitaet = np.where(gueltig, nfk, 0.0).clip(min=0.0)
+    speicher = kapazitaet * anfang
+    defizit_tage = np.zeros(n, dtype=np.int64)
+    defizit = np.zeros(n)
+    kapillar = np.zeros(n)
+    sickerung = np.zeros(n)
+    lauf = np.empty((n, tage)) if verlauf else None
+    luecke = np.empty(n)
+
+    # Die Tage hängen voneinander ab, die Bohrungen nicht: Schleife über Tage
+    for tag in range(tage):
+        speicher += netto[tag]
+        np.subtract(kapazitaet, speicher, out=luecke)
+        zufluss = np.minimum(kap, luecke.clip(min=0.0))
+        speicher += zufluss
+        kapillar += zufluss
+        trocken = speicher < 0
+        defizit_tage += trocken
+        defizit -= np.where(trocken, speicher, 0.0)
+        sickerung += (speicher - kapazitaet).clip(min=0.0)
+        np.clip(speicher, 0.0, kapazitaet, out=speicher)
+        if verlauf:
+            lauf[:, tag] = speicher
+
+    ergebnis = {
+        "defizit_tage":  np.where(gueltig, defizit_tage, np.nan),
+        "defizit_mm":    np.where(gueltig, defizit, np.nan),
+        "kapillar_mm":   np.where(gueltig, kapillar, np.nan),
+        "sickerung_mm":  np.where(gueltig, sickerung, np.nan),
+        "speicher_ende": np.where(gueltig, speicher, np.nan),
+    }
+    if verlauf:
+        lauf[~gueltig] = np.nan
+        ergebnis["speicher"] = lauf
+    return ergebnis
+
+
+def bilanz_aus_ergebnissen(ergebnisse, wetter, anfang=1.0,
+                           nfk_spalte="nFK (mm)", kap_spalte="Kapillar-Rate (mm/d)",
+                           kap_min_spalte="Kapillar-Rate mindestens (mm/d)"):
+    """
+    Saisonbilanz je Zeile einer Ergebnistabelle (z. B. aus datei_auswerten())
+    mit der Wetterreihe aus wetter_lesen(). Die Untergrenze aus
+    kap_min_spalte (falls vorhanden) ersetzt fehlende Kapillar-Raten.
+    Gibt Datei und Bohrung (falls vorhanden) und die Spalten aus
+    BILANZ_SPALTEN zurück.
+    """
+    kap_mindestens = None
+    if kap_min_spalte in ergebnisse:
+        kap_mindestens = pd.to_numeric(ergebnisse[kap_min_spalte], errors="coerce")
+    bilanz = bodenwasser_bilanz(
+        pd.to_numeric(ergebnisse[nfk_spalte], errors="coerce"),
+        pd.to_numeric(ergebnisse[kap_spalte], errors="coerce"),
+        wetter["Niederschlag"], wetter["ET"], anfang=anfang, kap_mindestens=kap_mindestens,
+    )
+    kopf = {s: ergebnisse[s].to_numpy() for s in ("Datei", "Bohrung") if s in ergebnisse}
+    return pd.DataFrame({**kopf, **{titel: bilanz[name] for name, titel in BILANZ_SPALTEN.items()}})